@@ -10,7 +10,7 @@
 
 import os
 import time
-from collections import OrderedDict, namedtuple
+from collections import OrderedDict
 
 try:
     import xml.etree.cElementTree as Xml
@@ -43,6 +43,8 @@ SPACE_MATRIX = Matrix((
     (0, 1, 0, 0),
     (0, 0, 0, 1)
 ))
+# the same conversion as SPACE_MATRIX, as the source axis and sign of each axis, used for flat data streams
+SPACE_AXES = ((0, 1), (2, 1), (1, 1))
 BONESPACE_MATRIX = Matrix((
     (0, 1, 0, 0),
     (-1, 0, 0, 0),
@@ -57,10 +59,6 @@ BONESPACE_MATRIX = Matrix((
 """
 
 
-def util_round(data, ndigits=0):
-    return data.__class__(round(x, ndigits) for x in data)
-
-
 def get_bmesh(mesh_data):
     """
         Returns a BMesh from existing mesh data
@@ -138,11 +136,12 @@ def get_material_textures(blender_material):
     return texture_dict
 
 
-def get_mesh_info(blender_obj, mat_index, skip_merge_vertices=False, round_data=False):
+def get_mesh_info(blender_obj, mat_index, skip_merge_vertices=False, round_data=False, weld_nearby=False):
     """
         Returns a dictionary of mesh information neccessary for the exporter.
         By default this merges vertices across triangles where normal and UV data is shared, otherwise each tri-vert is
-        exported separately!
+        exported separately! Optionally vertices which are only different within a small tolerance are also merged.
+        Also returns the source vertex id and the packed skin (or None) of the unique verts.
     """
     start = time.time()
     # get mesh and Bmesh data structures for this mesh
@@ -159,110 +158,95 @@ def get_mesh_info(blender_obj, mat_index, skip_merge_vertices=False, round_data=
     bm.faces.index_update()
     bm.verts.index_update()
 
-    # we will need to test vertices for equality based on their attributes
-    # critically: whether per-face vertices (sharing an object-relative vert id) share normals and uvs
-    UniqueVertex = namedtuple('UniqueVertex', ['id', 'p', 'n', 'uv'])
-
     # cache some mesh data
     uv_setnames = [uv_set.name for uv_set in mesh.uv_layers if len(uv_set.data)]
-    if uv_setnames:
-        mesh.calc_tangents(uv_setnames[0])
 
-    # build a blank dictionary of mesh information for the exporter
-    mesh_dict = {x: [] for x in ['p', 'n', 'ta', 'u0', 'u1', 'u2', 'u3', 'tri', 'min', 'max']}
-
-    # collect all unique verts in the order that we process them
-    unique_verts = []
+    # build a blank dictionary of tri-vertex information, these are merged into unique verts afterwards
+    tri_vert_dict = {x: [] for x in ['p', 'n', 'u0', 'u1', 'u2', 'u3']}
+    tri_vert_id_list = []
 
     for tri in bm.faces:  # all Bmesh faces were triangulated previously
         if tri.material_index != mat_index:
             continue  # skip this triangle if it has the wrong material index
 
-        dict_vert_idx = []
-
         for loop in tri.loops:
             vert = loop.vert
-            vert_id = vert.index
+            tri_vert_id_list.append(vert.index)
 
             # position
-            _position = vert.co
-            _position = list(swap_coord_space(_position))  # convert to Game space
-            if round_data:
-                _position = util_round(_position, PDX_DECIMALPTS)
+            tri_vert_dict['p'].extend(vert.co)
 
             # normal
             # FIXME? seems like custom normal per face-vertex is not available through bmesh
             # _normal = loop.calc_normal()
             _normal = mesh.loops[loop.index].normal  # assumes mesh-loop and bmesh-loop share indices
-            _normal = list(swap_coord_space(_normal))  # convert to Game space
-            if round_data:
-                _normal = util_round(_normal, PDX_DECIMALPTS)
+            tri_vert_dict['n'].extend(_normal)
 
             # uv
-            _uv_coords = {}
             for i, uv_set in enumerate(uv_setnames):
                 uv_layer = bm.loops.layers.uv[uv_set]
-                uv = loop[uv_layer].uv
-                uv = list(swap_coord_space(list(uv)))  # convert to Game space
-                if round_data:
-                    uv = util_round(uv, PDX_DECIMALPTS)
-                _uv_coords[i] = uv
-
-            # tangent (omitted if there were no UVs)
-            if uv_setnames:
-                # _tangent = loop.calc_tangent()
-                _tangent = mesh.loops[loop.index].tangent  # assumes mesh-loop and bmesh-loop share indices
-                _tangent = list(swap_coord_space(_tangent))  # convert to Game space
-                if round_data:
-                    _tangent = util_round(_tangent, PDX_DECIMALPTS)
-
-            # check if this tri vert is new and unique, or can just reference an existing vertex
-            new_vert = UniqueVertex(vert_id, _position, _normal, _uv_coords)
-
-            # test if we have already stored this vertex
-            try:
-                # no data needs to be added to the dict, the tri can just reference an existing vertex
-                i = unique_verts.index(new_vert)
-            except ValueError:
-                i = None
-
-            if i is None or skip_merge_vertices:
-                # new unique vertex, collect it and add the vert data to the dict
-                unique_verts.append(new_vert)
-                mesh_dict['p'].extend(_position)
-                mesh_dict['n'].extend(_normal)
-                for i, uv_set in enumerate(uv_setnames):
-                    mesh_dict['u' + str(i)].extend(_uv_coords[i])
-                if uv_setnames:
-                    mesh_dict['ta'].extend(_tangent)
-                    mesh_dict['ta'].append(1.0)
-                i = len(unique_verts) - 1  # the tri will reference the last added vertex
-
-            # store the tri vert reference
-            dict_vert_idx.append(i)
-
-        # tri-faces
-        mesh_dict['tri'].extend(
-            [dict_vert_idx[0], dict_vert_idx[2], dict_vert_idx[1]]  # convert handedness to Game space
+                tri_vert_dict['u' + str(i)].extend(loop[uv_layer].uv)
+
+    # convert each stream to Game space in a single pass
+    tri_vert_dict['p'] = pdx_data.convert_vectors(tri_vert_dict['p'], SPACE_AXES)
+    tri_vert_dict['n'] = pdx_data.convert_vectors(tri_vert_dict['n'], SPACE_AXES)
+    for i in range(len(uv_setnames)):
+        tri_vert_dict['u' + str(i)] = pdx_data.flip_uvs(tri_vert_dict['u' + str(i)])
+
+    # quantise all streams together before merging, so verts which only differ by float noise also merge
+    if round_data:
+        tri_vert_dict, rounded = pdx_data.quantize_streams(tri_vert_dict, PDX_DECIMALPTS, tri_vert_id_list)
+        print("[io_pdx_mesh] rounding merged {} vertices".format(rounded))
+
+    # merge tri-verts which share a vertex id, position, normal and uvs into unique verts
+    # critically: whether per-face vertices (sharing an object-relative vert id) share normals and uvs
+    mesh_dict, tri_vert_remap, vert_id_list = pdx_data.weld_vertices(
+        tri_vert_dict, vertex_ids=tri_vert_id_list, skip_merge=skip_merge_vertices
+    )
+
+    # pack the skin once, it is gathered again by vertex id as vertices are merged or split below
+    skin_info_dict = get_mesh_skin_info(blender_obj, vert_id_list)
+    skin_indices = dict((vert_id, i) for i, vert_id in enumerate(vert_id_list))
+
+    # optionally merge unique verts which only differ by float noise, eg from transforming to world space
+    if weld_nearby and not skip_merge_vertices:
+        vert_count = len(vert_id_list)
+        # vertices with different skin weights must stay separate, as the skin is gathered by the kept vertex ids
+        skin = (skin_info_dict['ix'], skin_info_dict['w']) if skin_info_dict else None
+        mesh_dict, nearby_remap, vert_id_list = pdx_data.weld_nearby_vertices(
+            mesh_dict, vertex_ids=vert_id_list, skin=skin
         )
+        tri_vert_remap = [nearby_remap[i] for i in tri_vert_remap]
+        saved = vert_count - len(vert_id_list)
+        print("[io_pdx_mesh] welded {} nearby vertices ({} bytes saved)".format(
+            saved, saved * pdx_data.get_vertex_size(mesh_dict)
+        ))
+
+    # tri-faces
+    mesh_dict['tri'] = pdx_data.flip_winding(tri_vert_remap)  # convert handedness to Game space
+
+    # tangents, with handedness for mirrored uvs (omitted if there were no UVs)
+    mesh_dict['ta'] = []
+    if mesh_dict['u0']:
+        # vertices shared by mirrored and unmirrored triangles are split, so each side of a seam has its handedness
+        mesh_dict, vert_order = pdx_data.split_mirrored_vertices(mesh_dict)
+        vert_id_list = [vert_id_list[i] for i in vert_order]  # so skin data is gathered for the split vertices
+        mesh_dict['ta'] = pdx_data.generate_tangents(mesh_dict['p'], mesh_dict['n'], mesh_dict['u0'], mesh_dict['tri'])
+        if round_data:
+            mesh_dict['ta'] = pdx_data.quantize_values(mesh_dict['ta'], PDX_DECIMALPTS)
 
     # calculate min and max bounds of mesh
-    x_VtxPos = set([mesh_dict['p'][i] for i in range(0, len(mesh_dict['p']), 3)])
-    y_VtxPos = set([mesh_dict['p'][i + 1] for i in range(0, len(mesh_dict['p']), 3)])
-    z_VtxPos = set([mesh_dict['p'][i + 2] for i in range(0, len(mesh_dict['p']), 3)])
-    mesh_dict['min'] = [min(x_VtxPos), min(y_VtxPos), min(z_VtxPos)]
-    mesh_dict['max'] = [max(x_VtxPos), max(y_VtxPos), max(z_VtxPos)]
+    mesh_dict['min'], mesh_dict['max'] = pdx_data.compute_aabb(mesh_dict['p'])
 
-    # create an ordered list of vertex ids that we have gathered into the mesh dict
-    vert_id_list = [vert.id for vert in unique_verts]
+    if skin_info_dict:
+        skin_info_dict = pdx_data.gather_skin(skin_info_dict, [skin_indices[vert_id] for vert_id in vert_id_list])
 
     # cleanup
     bm.free()
-    mesh.free_tangents()
     mesh.free_normals_split()
 
     print("[debug] {} ({})".format(blender_obj.name, time.time() - start))
-    return mesh_dict, vert_id_list
+    return mesh_dict, vert_id_list, skin_info_dict
 
 
 def get_mesh_skin_info(blender_obj, vertex_ids=None):
@@ -285,9 +269,8 @@ def get_mesh_skin_info(blender_obj, vertex_ids=None):
     # set number of joint influences per vert
     skin_dict['bones'].append(PDX_MAXSKININFS)
 
-    # find bone/vertex-group influences
-    # TODO: skip bone/group if bone has the PDX_IGNOREJOINT attribute
-    bone_names = [bone.name for bone in rig.data.bones]
+    # find bone/vertex-group influences, weights on ignored bones are moved to a parent when the skeleton is pruned
+    bone_indices = {bone.name: i for i, bone in enumerate(rig.data.bones)}
     group_names = [group.name for group in blender_obj.vertex_groups]
 
     # parse all verts in order if we didn't supply a subset of vert ids
@@ -295,40 +278,26 @@ def get_mesh_skin_info(blender_obj, vertex_ids=None):
     if vertex_ids is None:
         vertex_ids = range(len(mesh.vertices))
 
-    # iterate over influences to find weights, per vertex
-    vert_weights = {v: {} for v in vertex_ids}
-    for i, vtx in enumerate(mesh.vertices):
-        for vtx_group in vtx.groups:
+    # gather sparse influences of the exported verts
+    influences = []
+    for i in set(vertex_ids):
+        for vtx_group in mesh.vertices[i].groups:
             group_index = vtx_group.group
             # get bone index by group name lookup, as it's not guaranteed that group indices and bone indices line up
             try:
-                bone_idx = bone_names.index(group_names[group_index])
-            except ValueError:
+                bone_idx = bone_indices[group_names[group_index]]
+            except KeyError:
                 raise RuntimeError(
                     "Vertex is skinned to a group ({}) with no corresponding armature bone!".format(
                         group_names[group_index]
                     )
                 )
-            if group_index < len(blender_obj.vertex_groups):
-                weight = vtx_group.weight
-                if weight != 0.0:
-                    vert_weights[i][bone_idx] = vtx_group.weight
-
-    # collect data from the weights dict into the skin dict
-    for vtx in vertex_ids:
-        for influence, weight in vert_weights[vtx].items():
-            skin_dict['ix'].append(influence)
-            skin_dict['w'].append(weight)
-        if len(vert_weights[vtx]) <= PDX_MAXSKININFS:
-            # pad out with null data to fill the maximum influence count
-            padding = PDX_MAXSKININFS - len(vert_weights[vtx])
-            skin_dict['ix'].extend([-1] * padding)
-            skin_dict['w'].extend([0.0] * padding)
-        else:
-            raise RuntimeError(
-                "Vertex is skinned to more than {} groups! This is not supported. "
-                "Use 'Weight Tools > Limit Total' to reduce influence count.".format(PDX_MAXSKININFS)
-            )
+            influences.append((i, bone_idx, vtx_group.weight))
+
+    # pack the strongest influences per vertex into the skin dict
+    skin_dict['ix'], skin_dict['w'], issues = pdx_data.pack_skin_weights(influences, vertex_ids)
+    for issue in issues:
+        print("[io_pdx_mesh] {}".format(issue.message))
 
     return skin_dict
 
@@ -351,7 +320,10 @@ def get_mesh_skeleton_info(blender_obj):
     # build a list of bone information dictionaries for the exporter
     bone_list = [{'name': x.name} for x in bones]
     for i, bone in enumerate(bones):
-        # TODO: skip bone if it has the PDX_IGNOREJOINT attribute
+        # bones marked to be ignored are exported, then removed when the skeleton is pruned
+        if bone.get(PDX_IGNOREJOINT):
+            bone_list[i]['ignore'] = True
+
         # bone index
         bone_list[i]['ix'] = [i]
 
@@ -360,14 +332,15 @@ def get_mesh_skeleton_info(blender_obj):
             bone_list[i]['pa'] = [bones.index(bone.parent)]
 
         # bone inverse world-space transform
-        mat = swap_coord_space(rig.matrix_world * bone.matrix_local).inverted()  # convert to Game space
+        mat = (rig.matrix_world * bone.matrix_local).inverted()
         mat.transpose()
         mat = [i for vector in mat for i in vector]  # flatten matrix to list
-        bone_list[i]['tx'] = []
-        bone_list[i]['tx'].extend(mat[0:3])
-        bone_list[i]['tx'].extend(mat[4:7])
-        bone_list[i]['tx'].extend(mat[8:11])
-        bone_list[i]['tx'].extend(mat[12:15])
+        bone_list[i]['tx'] = mat[0:3] + mat[4:7] + mat[8:11] + mat[12:15]
+
+    # convert all bone transforms to Game space in a single pass
+    bone_tx = pdx_data.convert_transforms([v for bone in bone_list for v in bone['tx']], SPACE_AXES)
+    for i, bone in enumerate(bone_list):
+        bone['tx'] = bone_tx[i * 12 : (i + 1) * 12]
 
     return bone_list
 
@@ -681,16 +654,11 @@ def create_mesh(PDX_mesh, name=None):
             uv_Ch[i] = getattr(PDX_mesh, uv)  # flat list of 2d co-ordinates, u0[:1] = vtx[0]uv0
 
     # vertices
-    vertexArray = []  # array of points
-    for i in range(0, len(verts), 3):
-        v = swap_coord_space([verts[i], verts[i + 1], verts[i + 2]])  # convert to Blender space
-        vertexArray.append(v)
+    verts = pdx_data.convert_vectors(verts, SPACE_AXES)  # convert to Blender space
+    vertexArray = list(pdx_data.iter_vectors(verts, 3))  # array of points
 
     # faces
-    faceArray = []
-    for i in range(0, len(tris), 3):
-        f = [tris[i + 2], tris[i + 1], tris[i]]  # convert handedness to Blender space
-        faceArray.append(f)
+    faceArray = list(pdx_data.iter_vectors(pdx_data.flip_winding(tris), 3))  # convert handedness to Blender space
 
     # create the mesh datablock
     new_mesh = bpy.data.meshes.new(tmp_mesh_name)
@@ -708,10 +676,8 @@ def create_mesh(PDX_mesh, name=None):
 
     # apply the vertex normal data
     if norms:
-        normals = []
-        for i in range(0, len(norms), 3):
-            n = swap_coord_space([norms[i], norms[i + 1], norms[i + 2]])  # convert to Blender space
-            normals.append(n)
+        norms = pdx_data.convert_vectors(norms, SPACE_AXES)  # convert to Blender space
+        normals = list(pdx_data.iter_vectors(norms, 3))
 
         new_mesh.polygons.foreach_set('use_smooth', [True] * len(new_mesh.polygons))
         new_mesh.normals_split_custom_set_from_vertices(normals)
@@ -723,11 +689,7 @@ def create_mesh(PDX_mesh, name=None):
         uvSetName = 'map' + str(idx + 1)
         new_mesh.uv_textures.new(uvSetName)
 
-        uvArray = []
-        uv_data = uv_Ch[idx]
-        for i in range(0, len(uv_data), 2):
-            uv = [uv_data[i], 1 - uv_data[i + 1]]  # flip the UV coords in V!
-            uvArray.append(uv)
+        uvArray = list(pdx_data.iter_vectors(pdx_data.flip_uvs(uv_Ch[idx]), 2))  # flip the UV coords in V!
 
         bm = get_bmesh(new_mesh)
         uv_layer = bm.loops.layers.uv[uvSetName]
@@ -818,10 +780,8 @@ def create_anim_keys(armature, bone_name, key_dict, timestart, pose):
                 .to_matrix()
                 .to_4x4()
             )
-            _rotation = swap_coord_space(_rotation)  # convert to Blender space
         if 't' in key_dict:
             _translation = Matrix.Translation(key_dict['t'][k])
-            _translation = swap_coord_space(_translation)  # convert to Blender space
 
         # recompose
         offset_matrix = _translation * _rotation * _scale
@@ -908,7 +868,11 @@ def import_meshfile(meshpath, imp_mesh=True, imp_skel=True, imp_locs=True):
     print("[io_pdx_mesh] import finished! ({:.4f} sec)".format(time.time() - start))
 
 
-def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge_verts=True):
+def export_meshfile(
+    meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge_verts=True, weld_verts=False, optimize_mesh=False,
+    optimize_overdraw=False, merge_objects=False, split_bones=False, prune_bones=False,
+    shader_streams=None
+):
     start = time.time()
     print("[io_pdx_mesh] Exporting {}".format(meshpath))
 
@@ -920,6 +884,7 @@ def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge
     object_xml = Xml.SubElement(root_xml, 'object')
 
     # populate object data
+    ignored_bones = set()
     blender_meshes = [obj for obj in bpy.data.objects if type(obj.data) == bpy.types.Mesh and check_mesh_material(obj)]
     for obj in blender_meshes:
         print("[io_pdx_mesh] writing node - {}".format(obj.name))
@@ -935,7 +900,23 @@ def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge
                 meshnode_xml = Xml.SubElement(objnode_xml, 'mesh')
 
                 # get all necessary info about this set of faces and determine which unique verts they include
-                mesh_info_dict, vert_ids = get_mesh_info(obj, mat_idx, not merge_verts, True)
+                mesh_info_dict, vert_ids, skin_info_dict = get_mesh_info(
+                    obj, mat_idx, not merge_verts, True, weld_verts
+                )
+
+                # optionally reorder triangles for reuse of transformed vertices on the GPU, then vertices to match
+                if optimize_mesh or optimize_overdraw:
+                    if optimize_overdraw:
+                        # clusters of triangles likely to occlude others draw first, at some cost to cache reuse
+                        tri = pdx_data.optimize_overdraw(mesh_info_dict['p'], mesh_info_dict['tri'])
+                    else:
+                        tri = pdx_data.optimize_vertex_cache(mesh_info_dict['tri'])
+                    tri, vert_order = pdx_data.optimize_vertex_fetch(tri, len(vert_ids))
+                    mesh_info_dict = pdx_data.reorder_streams(mesh_info_dict, vert_order)
+                    mesh_info_dict['tri'] = tri
+                    vert_ids = [vert_ids[i] for i in vert_order]
+                    if skin_info_dict:
+                        skin_info_dict = pdx_data.gather_skin(skin_info_dict, vert_order)
 
                 # populate mesh attributes
                 for key in ['p', 'n', 'ta', 'u0', 'u1', 'u2', 'u3', 'tri']:
@@ -958,7 +939,6 @@ def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge
                     materialnode_xml.set(slot, [os.path.split(texture)[1]])
 
                 # create parent element for skin data, if the mesh is skinned
-                skin_info_dict = get_mesh_skin_info(obj, vert_ids)
                 if exp_skel and skin_info_dict:
                     print("[io_pdx_mesh] writing skinning data -")
                     skinnode_xml = Xml.SubElement(meshnode_xml, 'skin')
@@ -978,6 +958,8 @@ def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge
                 for key in ['ix', 'pa', 'tx']:
                     if key in bone_info_dict and bone_info_dict[key]:
                         bonenode_xml.set(key, bone_info_dict[key])
+                if bone_info_dict.get('ignore'):
+                    ignored_bones.add(bone_info_dict['name'])
 
     # create root element for locators
     locator_xml = Xml.SubElement(root_xml, 'locator')
@@ -995,6 +977,36 @@ def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge
             # if loc.getParent():   # we create parent constraints rather than parent empties directly
             #     locnode_xml.set('pa', [loc.getParent().name()])
 
+    # remove degenerate and duplicate triangles, and any vertices left unused
+    stats = pdx_data.clean_meshes(root_xml)
+    if any(stats):
+        print("[io_pdx_mesh] removed {} degenerate and {} duplicate triangles, {} vertices, {} meshes".format(*stats))
+
+    # drop vertex streams which the assigned shaders never read
+    if shader_streams:
+        stripped, merged = pdx_data.strip_unused_streams(root_xml, shader_streams)
+        print("[io_pdx_mesh] stripped unused streams from {} meshes, merged {} vertices".format(stripped, merged))
+
+    # optionally combine static meshes sharing a material, so they draw in a single call
+    if merge_objects:
+        before, after = pdx_data.merge_meshes(root_xml)
+        print("[io_pdx_mesh] merged meshes sharing materials, saved {} draw calls".format(before - after))
+
+    # remove ignored bones, and optionally bones without weights which no locator references
+    removed = pdx_data.prune_bones(root_xml, ignored_bones, prune_unused=prune_bones)
+    if removed:
+        print("[io_pdx_mesh] removed {} bones from skeletons".format(removed))
+
+    # optionally partition skinned meshes so each draw uses no more bones than skinned shaders support
+    if split_bones:
+        added = pdx_data.partition_skeletons(root_xml)
+        print("[io_pdx_mesh] added {} shapes to keep within {} bones".format(added, pdx_data.PDX_MAXBONES))
+
+    # split any mesh over the 16-bit index budget, as larger meshes break on some engine paths
+    split = pdx_data.split_meshes(root_xml)
+    if split:
+        print("[io_pdx_mesh] split {} meshes over {} vertices".format(split, pdx_data.PDX_MAXVERTICES))
+
     # write the binary file from our XML structure
     pdx_data.write_meshfile(meshpath, root_xml)
 
@@ -1096,6 +1108,13 @@ def import_animfile(animpath, timestart=1.0):
         for sample_type in bone.attrib['sa'][0]:
             key_data[sample_type] = []
 
+    # convert the sample streams to Blender space in a single pass each
+    sample_data = {
+        's': samples.attrib.get('s', []),
+        'q': pdx_data.convert_quaternions(samples.attrib.get('q', []), SPACE_AXES),
+        't': pdx_data.convert_vectors(samples.attrib.get('t', []), SPACE_AXES),
+    }
+
     # then traverse the samples data to store keys per bone
     s_index, q_index, t_index = 0, 0, 0
     for f in range(0, framecount):
@@ -1103,13 +1122,13 @@ def import_animfile(animpath, timestart=1.0):
             bone_key_data = all_bone_keyframes[bone_name]
 
             if 's' in bone_key_data:
-                bone_key_data['s'].append(samples.attrib['s'][s_index : s_index + 1])
+                bone_key_data['s'].append(sample_data['s'][s_index : s_index + 1])
                 s_index += 1
             if 'q' in bone_key_data:
-                bone_key_data['q'].append(samples.attrib['q'][q_index : q_index + 4])
+                bone_key_data['q'].append(sample_data['q'][q_index : q_index + 4])
                 q_index += 4
             if 't' in bone_key_data:
-                bone_key_data['t'].append(samples.attrib['t'][t_index : t_index + 3])
+                bone_key_data['t'].append(sample_data['t'][t_index : t_index + 3])
                 t_index += 3
 
     for bone_name in all_bone_keyframes:
@@ -13,7 +13,7 @@ from bpy.types import Operator, Panel
 from bpy.props import StringProperty, IntProperty, BoolProperty, EnumProperty
 from bpy_extras.io_utils import ImportHelper, ExportHelper
 
-from ..pdx_data import PDXData
+from ..pdx_data import PDXData, load_shader_streams
 
 try:
     from . import blender_import_export
@@ -294,6 +294,36 @@ class export_mesh(Operator, ExportHelper):
         description='Merge vertices',
         default=True,
     )
+    chk_weld = BoolProperty(
+        name='Weld nearby vertices',
+        description='Merge vertices within a small tolerance of each other',
+        default=False,
+    )
+    chk_optimize = BoolProperty(
+        name='Optimise for GPU',
+        description='Reorder triangles for vertex cache reuse',
+        default=False,
+    )
+    chk_overdraw = BoolProperty(
+        name='Optimise for overdraw',
+        description='Reorder triangles so those likely to hide others draw first, useful for alpha blended materials',
+        default=False,
+    )
+    chk_merge_obj = BoolProperty(
+        name='Merge objects',
+        description='Merge static meshes sharing a material, so they draw in a single call',
+        default=False,
+    )
+    chk_prune_bones = BoolProperty(
+        name='Prune unused bones',
+        description='Remove bones without skin weights which no locator references',
+        default=False,
+    )
+    chk_split_bones = BoolProperty(
+        name='Split by bone limit',
+        description='Partition skinned meshes into shapes using no more bones than skinned shaders support',
+        default=False,
+    )
 
     def execute(self, context):
         try:
@@ -302,7 +332,14 @@ class export_mesh(Operator, ExportHelper):
                 exp_mesh=self.chk_mesh,
                 exp_skel=self.chk_skel,
                 exp_locs=self.chk_locs,
-                merge_verts=self.chk_merge
+                merge_verts=self.chk_merge,
+                weld_verts=self.chk_weld,
+                optimize_mesh=self.chk_optimize,
+                optimize_overdraw=self.chk_overdraw,
+                merge_objects=self.chk_merge_obj,
+                split_bones=self.chk_split_bones,
+                prune_bones=self.chk_prune_bones,
+                shader_streams=load_shader_streams(context.scene.io_pdx_settings.setup_engine)
             )
             self.report({'INFO'}, '[io_pdx_mesh] Finsihed exporting {}'.format(self.filepath))
         except Exception as err:
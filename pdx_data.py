@@ -10,10 +10,18 @@
 
 from __future__ import print_function
 
+import io
 import os
 import sys
+import json
+import math
+import array
+import heapq
+import base64
 import struct
-from collections import OrderedDict
+import argparse
+import itertools
+from collections import OrderedDict, namedtuple
 
 try:
     import xml.etree.cElementTree as Xml
@@ -25,6 +33,99 @@ try:
     basestring
 except NameError:
     basestring = str
+try:
+    integer_types = (int, long)
+except NameError:
+    integer_types = (int,)
+
+
+""" ====================================================================================================================
+    Variables.
+========================================================================================================================
+"""
+
+PDX_BINARY_HEADER = b'@@b@'
+PDX_TEXT_HEADER = b'@@t@'
+
+# value parsers per data type, used when reading the text format
+TEXT_CONVERTERS = {'i': int, 'f': float, 's': json.loads}
+# values written per line when writing the text format, by property name (so each line is one vertex, triangle etc)
+TEXT_STRIDES = {
+    'p': 3, 'n': 3, 'ta': 4, 'u0': 2, 'u1': 2, 'u2': 2, 'u3': 2, 'tri': 3, 'min': 3, 'max': 3,
+    'ix': 4, 'w': 4, 'tx': 3, 'q': 4, 't': 3,
+}
+TEXT_INDENT = u'    '
+# order properties are written in when following the XML, as element attributes are unordered under Py2
+# (consistent with each object type, eg 'fps', 'sa', 'j' on animation info and 'ix', 'pa', 'tx' on bones)
+PDX_PROPERTY_ORDER = dict((prop, i) for i, prop in enumerate([
+    'pdxasset', 'fps', 'sa', 'j', 'i', 'shader', 'diff', 'p', 'n', 'spec', 'ta', 'u0', 'u1', 'u2', 'u3', 'tri',
+    'min', 'max', 'bones', 'ix', 't', 'q', 'pa', 'tx', 's', 'w',
+]))
+
+PDX_MAXSKININFS = 4
+# vertices addressable by a mesh using 16-bit indices
+PDX_MAXVERTICES = 0xFFFF
+# bones a skinned shader can use in one draw
+PDX_MAXBONES = 50
+
+# mesh data streams and their element size
+MESH_STREAMS = OrderedDict([
+    ('p', 3), ('n', 3), ('ta', 4), ('u0', 2), ('u1', 2), ('u2', 2), ('u3', 2), ('tri', 3)
+])
+
+# settings file with the material, animation and vertex stream presets of each engine
+SETTINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clausewitz.json')
+
+# default tolerances per stream when welding nearby vertices, 'p' must be given and non-zero
+WELD_TOLERANCES = {'p': 1e-4, 'n': 1e-3, 'u0': 1e-5, 'u1': 1e-5, 'u2': 1e-5, 'u3': 1e-5}
+
+# triangles whose height is below this fraction of their longest edge are treated as having no area
+DEGENERATE_RATIO = 1e-6
+
+# post-transform vertex cache size assumed when optimising and analysing triangle order
+VERTEX_CACHE_SIZE = 16
+# cluster ACMR below which overdraw ordering starts a new cluster, higher values trade cache reuse for less overdraw
+OVERDRAW_THRESHOLD = 0.75
+
+# animation frames sampled per .anim file when measuring skin influence reduction error
+SKIN_ERROR_FRAMES = 30
+
+# triangle ratios of generated levels of detail, and the weight of normal and uv changes and of open borders and
+# seams against the geometric error when simplifying
+LOD_RATIOS = (0.5, 0.25)
+SIMPLIFY_ATTRIBUTE_WEIGHT = 1.0
+SIMPLIFY_BORDER_WEIGHT = 10.0
+
+# shader of collision meshes, and the most vertices of each generated convex collision piece
+COLLISION_SHADER = 'Collision'
+COLLISION_MAX_VERTICES = 32
+
+# memory line size and count of the cache assumed when analysing vertex fetch efficiency
+VERTEX_FETCH_LINE = 64
+VERTEX_FETCH_LINES = 64
+# pixel grid size per view used when estimating overdraw
+OVERDRAW_RESOLUTION = 64
+
+# animation sample channels and their size, scale is stored as a single uniform value
+ANIM_CHANNELS = OrderedDict([('s', 1), ('q', 4), ('t', 3)])
+# largest change across frames of a sampled channel value for the channel to be stored as constant instead
+ANIM_CONSTANT_TOLERANCE = 1e-5
+
+# glTF constants
+GLTF_ROOT_NAME = 'pdx_root'
+GLTF_TRIANGLES = 4
+GLTF_ARRAY_BUFFER = 34962
+GLTF_ELEMENT_ARRAY_BUFFER = 34963
+GLTF_UNSIGNED_SHORT = 5123
+GLTF_UNSIGNED_INT = 5125
+GLTF_FLOAT = 5126
+GLTF_COMPONENT_TYPECODES = {5120: 'b', 5121: 'B', 5122: 'h', 5123: 'H', 5125: 'I', 5126: 'f'}
+GLTF_TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT4': 16}
+GLTF_CHANNEL_TYPES = {'s': 'VEC3', 'q': 'VEC4', 't': 'VEC3'}
+GLTF_CHANNEL_PATHS = {'s': 'scale', 'q': 'rotation', 't': 'translation'}
+GLTF_PATH_CHANNELS = dict((v, k) for k, v in GLTF_CHANNEL_PATHS.items())
+GLB_CHUNK_JSON = 0x4E4F534A
+GLB_CHUNK_BIN = 0x004E4942
 
 
 """ ====================================================================================================================
@@ -73,6 +174,249 @@ class PDXData(object):
         return '\n'.join(string)
 
 
+""" ====================================================================================================================
+    Helper functions for flat arrays and transforms.
+========================================================================================================================
+"""
+
+
+def iter_asset_files(path, extensions=('.mesh', '.anim')):
+    """
+        Generator over the asset file paths found at a path, either a single file or all files in a directory tree.
+    """
+    if os.path.isfile(path):
+        yield path
+        return
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in extensions:
+                yield os.path.join(dirpath, filename)
+
+
+def array_to_bytes(values, typecode):
+    """
+        Packs a flat list of values into little-endian bytes, as a single block.
+    """
+    arr = array.array(typecode, values)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tobytes() if hasattr(arr, 'tobytes') else arr.tostring()
+
+
+def array_from_bytes(data, typecode):
+    """
+        Unpacks little-endian bytes into a flat list of values, as a single block.
+    """
+    arr = array.array(typecode)
+    if hasattr(arr, 'frombytes'):
+        arr.frombytes(bytes(data))
+    else:
+        arr.fromstring(bytes(data))
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tolist()
+
+
+def restride(values, stride, new_stride, pad_value):
+    """
+        Re-packs a flat list of fixed size elements to a new element size, padding or truncating each element.
+    """
+    if stride == new_stride:
+        return list(values)
+    count = len(values) // stride if stride else 0
+    result = [pad_value] * (count * new_stride)
+    for i in range(min(stride, new_stride)):
+        result[i::new_stride] = values[i::stride]
+    return result
+
+
+def iter_vectors(values, size):
+    """
+        Returns an iterator over fixed size elements of a flat list, as tuples.
+    """
+    return zip(*[values[i::size] for i in range(size)])
+
+
+def vector_lengths(values, size=3, components=None):
+    """
+        Returns the length of each fixed size element of a flat list, using the first few components of each element.
+    """
+    components = [values[i::size] for i in range(components or size)]
+    return [math.sqrt(sum(c * c for c in vec)) for vec in zip(*components)]
+
+
+def count_non_finite(values):
+    """
+        Returns the number of NaN or Inf values in a flat list of floats.
+    """
+    # a single sum will only be finite when every value is, so most streams are checked without a Python loop
+    try:
+        total = math.fsum(values)
+    except (OverflowError, ValueError):
+        total = float('nan')
+    if not (math.isnan(total) or math.isinf(total)):
+        return 0
+    return sum(1 for v in values if math.isnan(v) or math.isinf(v))
+
+
+def tx_multiply(tx_a, tx_b):
+    """
+        Multiplies two 3*4 transforms in the bone 'tx' layout (row-vector convention, translation in the last row).
+    """
+    a, b = tx_a, tx_b
+    result = []
+    for row in range(4):
+        r = row * 3
+        for col in range(3):
+            result.append(a[r] * b[col] + a[r + 1] * b[3 + col] + a[r + 2] * b[6 + col])
+        if row == 3:
+            for col in range(3):
+                result[9 + col] += b[9 + col]
+    return result
+
+
+def tx_inverse(tx):
+    """
+        Inverts a 3*4 transform in the bone 'tx' layout.
+    """
+    a, b, c, d, e, f, g, h, i = tx[0:9]
+    det = a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g)
+    if det == 0.0:
+        raise ValueError("Transform is not invertible. {}".format(tx))
+    inv = [
+        (e * i - f * h) / det, (c * h - b * i) / det, (b * f - c * e) / det,
+        (f * g - d * i) / det, (a * i - c * g) / det, (c * d - a * f) / det,
+        (d * h - e * g) / det, (b * g - a * h) / det, (a * e - b * d) / det,
+    ]
+    x, y, z = tx[9:12]
+    inv.extend([
+        -(x * inv[0] + y * inv[3] + z * inv[6]),
+        -(x * inv[1] + y * inv[4] + z * inv[7]),
+        -(x * inv[2] + y * inv[5] + z * inv[8]),
+    ])
+    return inv
+
+
+def tx_decompose(tx):
+    """
+        Splits a 3*4 transform in the bone 'tx' layout into translation, rotation quaternion (x, y, z, w) and scale.
+    """
+    scale = [math.sqrt(sum(v * v for v in tx[r : r + 3])) for r in (0, 3, 6)]
+    rows = [[v / (scale[k] or 1.0) for v in tx[r : r + 3]] for k, r in enumerate((0, 3, 6))]
+    # rows of a row-vector matrix are the columns of the equivalent column-vector rotation matrix
+    m = [[rows[c][r] for c in range(3)] for r in range(3)]
+
+    trace = m[0][0] + m[1][1] + m[2][2]
+    if trace > 0.0:
+        s = 0.5 / math.sqrt(trace + 1.0)
+        quat = [(m[2][1] - m[1][2]) * s, (m[0][2] - m[2][0]) * s, (m[1][0] - m[0][1]) * s, 0.25 / s]
+    elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+        s = 2.0 * math.sqrt(1.0 + m[0][0] - m[1][1] - m[2][2])
+        quat = [0.25 * s, (m[0][1] + m[1][0]) / s, (m[0][2] + m[2][0]) / s, (m[2][1] - m[1][2]) / s]
+    elif m[1][1] > m[2][2]:
+        s = 2.0 * math.sqrt(1.0 + m[1][1] - m[0][0] - m[2][2])
+        quat = [(m[0][1] + m[1][0]) / s, 0.25 * s, (m[1][2] + m[2][1]) / s, (m[0][2] - m[2][0]) / s]
+    else:
+        s = 2.0 * math.sqrt(1.0 + m[2][2] - m[0][0] - m[1][1])
+        quat = [(m[0][2] + m[2][0]) / s, (m[1][2] + m[2][1]) / s, 0.25 * s, (m[1][0] - m[0][1]) / s]
+
+    return list(tx[9:12]), quat, scale
+
+
+def tx_compose(translation, rotation, scale):
+    """
+        Builds a 3*4 transform in the bone 'tx' layout from translation, rotation quaternion (x, y, z, w) and scale.
+    """
+    x, y, z, w = rotation
+    # column-vector rotation matrix, written out transposed as rows of the row-vector layout
+    m = [
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ]
+    tx = []
+    for r in range(3):
+        tx.extend(m[c][r] * scale[r] for c in range(3))
+    tx.extend(translation)
+    return tx
+
+
+""" ====================================================================================================================
+    Functions for converting data streams between coordinate spaces.
+========================================================================================================================
+"""
+
+
+def _axes_determinant(axes):
+    """
+        Returns the determinant (1 or -1) of the axis conversion described by a source axis and sign per axis.
+    """
+    order = [axis for axis, _ in axes]
+    # count the swaps needed to sort the axis permutation
+    swaps = sum(1 for i in range(3) for j in range(i + 1, 3) if order[i] > order[j])
+    det = -1 if swaps % 2 else 1
+    for _, sign in axes:
+        det *= sign
+    return det
+
+
+def convert_vectors(values, axes, size=3):
+    """
+        Converts a flat list of vectors (eg positions, normals or tangents) to another coordinate space, where axes
+        gives the source axis and sign of each axis, eg ((0, 1), (2, 1), (1, 1)) swaps Y and Z. Any components after
+        the first three, such as tangent handedness, are copied unchanged.
+    """
+    result = list(values)
+    for i, (axis, sign) in enumerate(axes):
+        source = values[axis::size]
+        result[i::size] = source if sign > 0 else [-v for v in source]
+    return result
+
+
+def convert_quaternions(values, axes):
+    """
+        Converts a flat list of (x, y, z, w) rotation quaternions to another coordinate space, as convert_vectors.
+    """
+    # the rotation axis converts as a vector, but mirroring the space also reverses the direction of rotation
+    det = _axes_determinant(axes)
+    return convert_vectors(values, [(axis, sign * det) for axis, sign in axes], size=4)
+
+
+def convert_transforms(values, axes):
+    """
+        Converts a flat list of 3*4 transforms in the bone 'tx' layout to another coordinate space, as convert_vectors.
+    """
+    result = list(values)
+    for i, (axis_i, sign_i) in enumerate(axes):
+        for j, (axis_j, sign_j) in enumerate(axes):
+            source = values[axis_i * 3 + axis_j::12]
+            result[i * 3 + j::12] = source if sign_i * sign_j > 0 else [-v for v in source]
+        # translation row
+        source = values[9 + axis_i::12]
+        result[9 + i::12] = source if sign_i > 0 else [-v for v in source]
+    return result
+
+
+def flip_uvs(values):
+    """
+        Flips a flat list of uv coordinates in V, the conversion between Game and DCC uv space in both directions.
+    """
+    result = list(values)
+    result[1::2] = [1.0 - v for v in values[1::2]]
+    return result
+
+
+def flip_winding(tri):
+    """
+        Reverses the winding order of a flat list of triangle indices, by swapping the last two corners.
+    """
+    result = list(tri)
+    result[1::3] = tri[2::3]
+    result[2::3] = tri[1::3]
+    return result
+
+
 """ ====================================================================================================================
     Functions for reading and parsing binary data.
 ========================================================================================================================
@@ -133,7 +477,6 @@ def parseString(bdata, pos, length):
 def parseData(bdata, pos):
     # determine the  data type
     datatype = struct.unpack_from('c', bdata, offset=pos)[0].decode()
-    # TODO: use an array here instead of list for memory efficiency?
     datavalues = []
 
     if datatype == 'i':
@@ -144,11 +487,9 @@ def parseData(bdata, pos):
         size = struct.unpack_from('i', bdata, offset=pos)[0]
         pos += 4
 
-        # values
-        for i in range(0, size):
-            val = struct.unpack_from('i', bdata, offset=pos)[0]
-            datavalues.append(val)
-            pos += 4
+        # values, unpacked as one block
+        datavalues = list(struct.unpack_from('{}i'.format(size), bdata, offset=pos))
+        pos += 4 * size
 
     elif datatype == 'f':
         # handle float data
@@ -158,11 +499,9 @@ def parseData(bdata, pos):
         size = struct.unpack_from('i', bdata, offset=pos)[0]
         pos += 4
 
-        # values
-        for i in range(0, size):
-            val = struct.unpack_from('f', bdata, offset=pos)[0]
-            datavalues.append(val)
-            pos += 4
+        # values, unpacked as one block
+        datavalues = list(struct.unpack_from('{}f'.format(size), bdata, offset=pos))
+        pos += 4 * size
 
     elif datatype == 's':
         # handle string data
@@ -188,40 +527,117 @@ def parseData(bdata, pos):
     return datavalues, pos
 
 
-def read_meshfile(filepath, to_stdout=False):
+def iter_binary_tokens(bdata, pos=4):
     """
-        Reads through a .mesh file and gathers all the data into hierarchical element structure.
-        The resulting XML is not natively writable to string as it contains Python data types.
+        Generator over the objects and properties of binary file data, following the '@@b@' header.
+        Yields tuples of ('object', name, depth) or ('property', name, values) in file order.
     """
-    # read the data
-    with open(filepath, 'rb') as fp:
-        fdata = fp.read()
+    eof = len(bdata)
 
-    # create an XML structure to store the object hierarchy
-    file_element = Xml.Element('File')
-    file_element.attrib = dict(name=os.path.split(filepath)[1], path=os.path.split(filepath)[0])
+    # parse through until EOF
+    while pos < eof:
+        token = struct.unpack_from('c', bdata, offset=pos)[0].decode()
+
+        # we have a property
+        if token == '!':
+            prop_name, prop_values, pos = parseProperty(bdata, pos)
+            yield 'property', prop_name, prop_values
+
+        # we have an object
+        elif token == '[':
+            obj_name, depth, pos = parseObject(bdata, pos)
+            yield 'object', obj_name, depth
+
+        # we have something that we can't parse
+        else:
+            raise NotImplementedError("Unknown object encountered.")
+
+
+def iter_text_tokens(lines):
+    """
+        Generator over the objects and properties of text file lines, following the '@@t@' header.
+        Yields tuples in the same form as iter_binary_tokens, reading only as many lines as each property needs.
+    """
+    lines = iter(lines)
+    for line in lines:
+        line = line.strip()
+        # skip blank lines and comments
+        if not line or line.startswith('#'):
+            continue
+
+        # we have a property, with values on the following lines
+        if line.startswith('!'):
+            prop_name, datatype, size = line[1:].split()
+            size = int(size)
+            if datatype not in TEXT_CONVERTERS:
+                raise NotImplementedError("Unknown data type encountered. {}".format(datatype))
 
-    # determine the file length and set initial file read position
-    eof = len(fdata)
-    pos = 0
+            prop_values = []
+            while len(prop_values) < size:
+                value_line = next(lines).strip()
+                if not value_line or value_line.startswith('#'):
+                    continue
+                if value_line.startswith('...'):
+                    raise ValueError("Truncated property '{}' cannot be parsed. {}".format(prop_name, value_line))
+                if datatype == 's':
+                    prop_values.append(TEXT_CONVERTERS[datatype](value_line))
+                else:
+                    prop_values.extend(TEXT_CONVERTERS[datatype](v) for v in value_line.split())
+            yield 'property', prop_name, prop_values
+
+        # we have an object
+        elif line.startswith('['):
+            obj_name = line.lstrip('[')
+            yield 'object', obj_name, len(line) - len(obj_name)
+
+        # we have something that we can't parse
+        else:
+            raise NotImplementedError("Unknown object encountered. {}".format(line))
+
+
+def iter_file_tokens(filepath):
+    """
+        Generator over the objects and properties of a .mesh or .anim file, in either binary or text format.
+    """
+    with open(filepath, 'rb') as fp:
+        header = fp.read(4)
 
     # read the file header '@@b@'
-    header = struct.unpack_from('c' * 4, fdata, pos)
-    if bytes(b''.join(header)) == b'@@b@':
-        pos = 4
+    if header == PDX_BINARY_HEADER:
+        with open(filepath, 'rb') as fp:
+            fdata = fp.read()
+        for token in iter_binary_tokens(fdata, len(header)):
+            yield token
+
+    # or the file header '@@t@', text files are streamed line by line
+    elif header == PDX_TEXT_HEADER:
+        with io.open(filepath, 'rt', encoding='utf-8') as fp:
+            fp.readline()
+            for token in iter_text_tokens(fp):
+                yield token
+
     else:
         raise NotImplementedError("Unknown file header. {}".format(header))
 
+
+def read_meshfile(filepath, to_stdout=False):
+    """
+        Reads through a .mesh file and gathers all the data into hierarchical element structure.
+        The resulting XML is not natively writable to string as it contains Python data types.
+    """
+    # create an XML structure to store the object hierarchy
+    file_element = Xml.Element('File')
+    file_element.attrib = dict(name=os.path.split(filepath)[1], path=os.path.split(filepath)[0])
+
     parent_element = file_element
     depth_list = [file_element]
     current_depth = 0
 
     # parse through until EOF
-    while pos < eof:
+    for token, name, data in iter_file_tokens(filepath):
         # we have a property
-        if struct.unpack_from('c', fdata, offset=pos)[0].decode() == '!':
-            # check the property type and values
-            prop_name, prop_values, pos = parseProperty(fdata, pos)
+        if token == 'property':
+            prop_name, prop_values = name, data
             if to_stdout:
                 print("  " * current_depth + "  ", prop_name, " (count", len(prop_values), ")")
 
@@ -229,9 +645,9 @@ def read_meshfile(filepath, to_stdout=False):
             parent_element.set(prop_name, prop_values)
 
         # we have an object
-        elif struct.unpack_from('c', fdata, offset=pos)[0].decode() == '[':
+        elif token == 'object':
             # check the object type and hierarchy depth
-            obj_name, depth, pos = parseObject(fdata, pos)
+            obj_name, depth = name, data
             if to_stdout:
                 print("  " * depth, obj_name, depth)
 
@@ -250,10 +666,6 @@ def read_meshfile(filepath, to_stdout=False):
             depth_list.append(parent_element)
             current_depth = depth
 
-        # we have something that we can't parse
-        else:
-            raise NotImplementedError("Unknown object encountered.")
-
     return file_element
 
 
@@ -263,7 +675,7 @@ def read_meshfile(filepath, to_stdout=False):
 """
 
 
-def writeProperty(prop_name, prop_data):
+def writeProperty(prop_name, prop_data, datatype=None):
     datastring = b''
 
     # write starting '!'
@@ -277,7 +689,7 @@ def writeProperty(prop_name, prop_data):
     datastring += writeString(prop_name)
 
     # write property data
-    datastring += writeData(prop_data)
+    datastring += writeData(prop_data, datatype)
 
     return datastring
 
@@ -289,8 +701,8 @@ def writeObject(obj_xml, obj_depth):
     for x in range(obj_depth):
         datastring += struct.pack('c', '['.encode())
 
-    # write object name as string
-    obj_name = obj_xml.tag
+    # write object name as string (accepts an element or just the element name)
+    obj_name = getattr(obj_xml, 'tag', obj_xml)
     datastring += writeString(obj_name)
     # write zero-byte ending
     datastring += struct.pack('x')
@@ -309,19 +721,34 @@ def writeString(string):
     return datastring
 
 
-def writeData(data_array):
-    datastring = b''
+def get_datatype(data_array):
+    """
+        Returns the file data type character ('i', 'f' or 's') for a list of values.
+    """
+    if all(isinstance(d, integer_types) for d in data_array):
+        return 'i'
+    elif all(isinstance(d, float) for d in data_array):
+        return 'f'
+    elif all(isinstance(d, basestring) for d in data_array):
+        return 's'
 
-    # determine the data type in the array
+    # determine the data types in the array
     types = set([type(d) for d in data_array])
-    if len(types) == 1:
-        datatype = types.pop()
-    elif len(types) < 1:
-        return datastring
-    else:
+    if len(types) > 1:
         raise NotImplementedError("Mixed data type encountered. {} - {}".format(types, data_array))
+    raise NotImplementedError("Unknown data type encountered. {}".format(types.pop()))
+
+
+def writeData(data_array, datatype=None):
+    datastring = b''
 
-    if all(isinstance(d, int) for d in data_array):
+    # determine the data type in the array, empty arrays are only written when their type is given
+    if datatype is None:
+        if len(data_array) < 1:
+            return datastring
+        datatype = get_datatype(data_array)
+
+    if datatype == 'i':
         # write integer data
         datastring += struct.pack('c', 'i'.encode())
 
@@ -332,7 +759,7 @@ def writeData(data_array):
         # write the data values
         datastring += struct.pack('i' * size, *data_array)
 
-    elif all(isinstance(d, float) for d in data_array):
+    elif datatype == 'f':
         # write float data
         datastring += struct.pack('c', 'f'.encode())
 
@@ -343,7 +770,7 @@ def writeData(data_array):
         # values
         datastring += struct.pack('f' * size, *data_array)
 
-    elif all(isinstance(d, basestring) for d in data_array):
+    elif datatype == 's':
         # write string data
         datastring += struct.pack('c', 's'.encode())
 
@@ -404,7 +831,7 @@ def write_meshfile(filepath, root_xml):
                 if child_xml.tag == 'mesh':
                     mesh_xml = child_xml
                     # write mesh properties
-                    for prop in ['p', 'n', 'ta', 'u0', 'u1', 'tri']:
+                    for prop in ['p', 'n', 'ta', 'u0', 'u1', 'u2', 'u3', 'tri']:
                         if mesh_xml.get(prop) is not None:
                             datastring += writeProperty(prop, mesh_xml.get(prop))
 
@@ -463,37 +890,3707 @@ def write_meshfile(filepath, root_xml):
         fp.write(datastring)
 
 
+def write_animfile(filepath, root_xml):
+    """
+        Iterates over an XML element and writes the hierarchical element structure back into a binary file.
+        Unlike write_meshfile, objects and properties are written in the order they appear in the XML.
+    """
+    if root_xml.tag != 'File':
+        raise NotImplementedError("Unknown XML root encountered. {}".format(root_xml.tag))
+
+    with open(filepath, 'wb') as fp:
+        write_binary_tokens(fp, iter_tree_tokens(root_xml))
+
+
 """ ====================================================================================================================
-    Main.
+    Functions for streaming data to and from the text format.
 ========================================================================================================================
 """
 
 
-if __name__ == '__main__':
+def iter_tree_tokens(root_xml):
+    """
+        Generator over the objects and properties of an XML element hierarchy, in the same form as iter_binary_tokens.
+        Objects follow the XML order, properties of each object are in PDX_PROPERTY_ORDER.
+    """
+    def _iter_element(element, depth):
+        # properties are stored as lists, skip any other attributes (eg file name and path on the root)
+        properties = [(name, values) for name, values in element.items() if isinstance(values, (list, tuple))]
+        # known properties in a fixed order, any others after them as they are stored
+        properties.sort(key=lambda prop: PDX_PROPERTY_ORDER.get(prop[0], len(PDX_PROPERTY_ORDER)))
+        for prop_name, prop_values in properties:
+            yield 'property', prop_name, prop_values
+        for child in element:
+            yield 'object', child.tag, depth + 1
+            for token in _iter_element(child, depth + 1):
+                yield token
+
+    return _iter_element(root_xml, 0)
+
+
+def format_text_value(value, datatype):
+    if datatype == 'f':
+        # 9 significant digits will always round-trip a 32-bit float exactly
+        return u'{:.9g}'.format(value)
+    elif datatype == 's':
+        return u'{}'.format(json.dumps(value))
+    return u'{}'.format(value)
+
+
+def write_text_tokens(fp, tokens, max_values=None, summary=False):
+    """
+        Writes objects and properties to an open text stream in the '@@t@' format, one property at a time.
+        Setting max_values truncates long property arrays and summary adds a comment line with the value range of each
+        property, both are for inspection only as the truncated output can not be parsed back.
+    """
+    fp.write(PDX_TEXT_HEADER.decode() + u'\n')
+
+    current_depth = 0
+    for token, name, data in tokens:
+        # objects are written as in the binary format, with a '[' character per level of depth
+        if token == 'object':
+            current_depth = data
+            fp.write(u'{}{}{}\n'.format(TEXT_INDENT * (current_depth - 1), u'[' * current_depth, name))
+
+        # properties are written with their type and count, followed by lines of values
+        elif token == 'property':
+            indent = TEXT_INDENT * current_depth
+            datatype = get_datatype(data)
+            fp.write(u'{}!{} {} {}\n'.format(indent, name, datatype, len(data)))
+
+            if summary and data and datatype != 's':
+                fp.write(u'{}# min {} max {} mean {}\n'.format(
+                    indent + TEXT_INDENT,
+                    format_text_value(min(data), datatype),
+                    format_text_value(max(data), datatype),
+                    format_text_value(float(sum(data)) / len(data), 'f'),
+                ))
+
+            values = data if max_values is None else data[:max_values]
+            stride = 1 if datatype == 's' else TEXT_STRIDES.get(name, 8)
+            for i in range(0, len(values), stride):
+                fp.write(indent + TEXT_INDENT)
+                fp.write(u' '.join(format_text_value(v, datatype) for v in values[i : i + stride]))
+                fp.write(u'\n')
+            if len(values) < len(data):
+                fp.write(u'{}... {} more\n'.format(indent + TEXT_INDENT, len(data) - len(values)))
+
+
+def write_binary_tokens(fp, tokens):
+    """
+        Writes objects and properties to an open binary stream in the '@@b@' format, one property at a time.
+    """
+    fp.write(PDX_BINARY_HEADER)
+
+    for token, name, data in tokens:
+        if token == 'object':
+            fp.write(writeObject(name, data))
+        elif token == 'property':
+            # empty arrays have no type to infer, so default to integer
+            fp.write(writeProperty(name, data, None if data else 'i'))
+
+
+def write_meshfile_text(filepath, root_xml, max_values=None, summary=False):
+    """
+        Writes an XML element hierarchy to a file in the '@@t@' text format.
+    """
+    with io.open(filepath, 'wt', encoding='utf-8') as fp:
+        write_text_tokens(fp, iter_tree_tokens(root_xml), max_values, summary)
+
+
+def convert_meshfile(src_filepath, dst_filepath, to_text=True):
     """
-       When called from the command line we just print the structure and contents of the .mesh or .anim file to stdout
+        Converts a .mesh or .anim file between the binary and text formats without building the XML hierarchy.
+        Properties are streamed in file order, so converting back and forth gives an identical binary file.
     """
-    clear = lambda: os.system('cls')
-    clear()
+    tokens = iter_file_tokens(src_filepath)
+    if to_text:
+        with io.open(dst_filepath, 'wt', encoding='utf-8') as fp:
+            write_text_tokens(fp, tokens)
+    else:
+        with open(dst_filepath, 'wb') as fp:
+            write_binary_tokens(fp, tokens)
 
-    if len(sys.argv) > 1:
-        a_file = sys.argv[1]
-        a_data = read_meshfile(a_file)
 
-        for elem in a_data.iter():
-            print('object', elem.tag)
-            for k, v in elem.items():
-                print('    property', k, '({})'.format(len(v)))
-                print(v)
-            print()
+def dump_meshfile(filepath, stream=None, max_values=None, summary=False):
+    """
+        Writes the structure and contents of a .mesh or .anim file as text, to stdout by default.
+    """
+    write_text_tokens(stream or sys.stdout, iter_file_tokens(filepath), max_values, summary)
 
 
+""" ====================================================================================================================
+    Functions for converting to and from glTF 2.0.
+========================================================================================================================
 """
-General binary format is:
-    data description
-    data type
-    depth of data
-    data content
+
+
+def _gltf_add_buffer_data(gltf, buffer, data, target=None):
+    # all buffer views start 4 byte aligned
+    buffer.extend(b'\x00' * (-len(buffer) % 4))
+    view = dict(buffer=0, byteOffset=len(buffer), byteLength=len(data))
+    if target is not None:
+        view['target'] = target
+    buffer.extend(data)
+    gltf['bufferViews'].append(view)
+    return len(gltf['bufferViews']) - 1
+
+
+def _gltf_add_accessor(gltf, buffer, values, accessor_type, component_type, target=None, bounds=False):
+    count = len(values) // GLTF_TYPE_SIZES[accessor_type]
+    typecode = GLTF_COMPONENT_TYPECODES[component_type]
+    view = _gltf_add_buffer_data(gltf, buffer, array_to_bytes(values, typecode), target)
+
+    accessor = dict(bufferView=view, componentType=component_type, count=count, type=accessor_type)
+    if bounds and count:
+        size = GLTF_TYPE_SIZES[accessor_type]
+        accessor['min'] = [min(values[i::size]) for i in range(size)]
+        accessor['max'] = [max(values[i::size]) for i in range(size)]
+    gltf['accessors'].append(accessor)
+    return len(gltf['accessors']) - 1
+
+
+def _gltf_read_accessor(gltf, buffer, index):
+    accessor = gltf['accessors'][index]
+    size = GLTF_TYPE_SIZES[accessor['type']]
+    component_type = accessor['componentType']
+    typecode = GLTF_COMPONENT_TYPECODES[component_type]
+    item_size = array.array(typecode).itemsize
+    count = accessor['count']
+
+    if 'bufferView' not in accessor:
+        return [0] * (count * size)
+
+    view = gltf['bufferViews'][accessor['bufferView']]
+    offset = view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+    stride = view.get('byteStride', size * item_size)
+
+    if stride == size * item_size:
+        # tightly packed, copy the whole block
+        values = array_from_bytes(buffer[offset : offset + count * stride], typecode)
+    else:
+        # interleaved, copy each element
+        values = []
+        for i in range(count):
+            start = offset + i * stride
+            values.extend(array_from_bytes(buffer[start : start + size * item_size], typecode))
+
+    if accessor.get('normalized') and component_type != GLTF_FLOAT:
+        max_value = float(2 ** (8 * item_size) - 1)
+        values = [v / max_value for v in values]
+    return values
+
+
+def read_gltf(filepath):
+    """
+        Reads a .glb or .gltf file, returning the glTF json dictionary and the binary buffer data.
+    """
+    with open(filepath, 'rb') as fp:
+        fdata = fp.read()
+
+    # binary glTF, json chunk followed by an optional binary chunk
+    if fdata[0:4] == b'glTF':
+        length = struct.unpack_from('<I', fdata, 8)[0]
+        pos = 12
+        gltf, buffer = None, bytearray()
+        while pos < length:
+            chunk_length, chunk_type = struct.unpack_from('<II', fdata, pos)
+            chunk = fdata[pos + 8 : pos + 8 + chunk_length]
+            if chunk_type == GLB_CHUNK_JSON:
+                gltf = json.loads(chunk.decode('utf-8'))
+            elif chunk_type == GLB_CHUNK_BIN:
+                buffer = bytearray(chunk)
+            pos += 8 + chunk_length
+        return gltf, buffer
+
+    # text glTF, with an external or embedded buffer
+    gltf = json.loads(fdata.decode('utf-8'))
+    buffer = bytearray()
+    if gltf.get('buffers'):
+        uri = gltf['buffers'][0].get('uri', '')
+        if uri.startswith('data:'):
+            buffer = bytearray(base64.b64decode(uri.split(',', 1)[1]))
+        else:
+            with open(os.path.join(os.path.dirname(filepath), uri), 'rb') as fp:
+                buffer = bytearray(fp.read())
+    return gltf, buffer
+
+
+def write_gltf(filepath, gltf, buffer):
+    """
+        Writes the glTF json dictionary and binary buffer data, as a single .glb file or a .gltf file with a .bin file.
+    """
+    buffer = bytes(buffer) + b'\x00' * (-len(buffer) % 4)
+    gltf['buffers'] = [dict(byteLength=len(buffer))] if buffer else []
+
+    if os.path.splitext(filepath)[1].lower() == '.gltf':
+        if buffer:
+            bin_filepath = os.path.splitext(filepath)[0] + '.bin'
+            gltf['buffers'][0]['uri'] = os.path.basename(bin_filepath)
+            with open(bin_filepath, 'wb') as fp:
+                fp.write(buffer)
+        with io.open(filepath, 'wt', encoding='utf-8') as fp:
+            fp.write(u'{}'.format(json.dumps(gltf, indent=2, sort_keys=True)))
+        return
+
+    json_chunk = json.dumps(gltf, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    json_chunk += b' ' * (-len(json_chunk) % 4)
+    length = 12 + 8 + len(json_chunk) + (8 + len(buffer) if buffer else 0)
+
+    with open(filepath, 'wb') as fp:
+        fp.write(b'glTF' + struct.pack('<II', 2, length))
+        fp.write(struct.pack('<II', len(json_chunk), GLB_CHUNK_JSON) + json_chunk)
+        if buffer:
+            fp.write(struct.pack('<II', len(buffer), GLB_CHUNK_BIN) + buffer)
+
+
+def _gltf_add_node(gltf, name, parent=None, **properties):
+    node = dict(name=name, **properties)
+    gltf['nodes'].append(node)
+    index = len(gltf['nodes']) - 1
+    if parent is not None:
+        gltf['nodes'][parent].setdefault('children', []).append(index)
+    return index
+
+
+def meshfile_to_gltf(mesh_xml=None, anim_xmls=None):
+    """
+        Converts a .mesh XML hierarchy, and optionally a list of (name, .anim XML hierarchy) pairs, to glTF.
+        Vertex streams are copied directly into the binary buffer, the conversion from the games left-handed space is
+        done by a root node which mirrors the Z axis. Returns the glTF json dictionary and the binary buffer data.
+    """
+    gltf = dict(
+        asset=dict(version='2.0', generator='io_pdx_mesh'),
+        scene=0, scenes=[dict(nodes=[0])],
+        nodes=[], meshes=[], materials=[], skins=[], accessors=[], bufferViews=[], animations=[],
+    )
+    buffer = bytearray()
+    root = _gltf_add_node(gltf, GLTF_ROOT_NAME, scale=[1.0, 1.0, -1.0], extras=dict(pdx_root=True))
+
+    # nodes by name, bones are shared between shapes with the same skeleton
+    joint_nodes = dict()
+    materials = []
+
+    shapes = mesh_xml.find('object') if mesh_xml is not None else None
+    for shape_xml in (shapes if shapes is not None else []):
+        # create joint nodes from the bind pose, bones are indexed by their 'ix' property
+        skin_index = None
+        skeleton_xml = shape_xml.find('skeleton')
+        if skeleton_xml is not None and len(skeleton_xml):
+            bones = sorted(skeleton_xml, key=lambda b: b.get('ix')[0])
+            bone_names = [b.tag for b in bones]
+            for bone_xml in bones:
+                if bone_xml.tag in joint_nodes:
+                    continue
+                parent = bone_xml.get('pa')
+                parent_node = joint_nodes.get(bone_names[parent[0]], root) if parent else root
+                # local transform relative to the parent, from the inverse bind transforms
+                local = tx_inverse(bone_xml.get('tx'))
+                if parent:
+                    local = tx_multiply(local, bones[parent[0]].get('tx'))
+                translation, rotation, scale = tx_decompose(local)
+                joint_nodes[bone_xml.tag] = _gltf_add_node(
+                    gltf, bone_xml.tag, parent_node, translation=translation, rotation=rotation, scale=scale,
+                )
+
+            inverse_binds = []
+            for bone_xml in bones:
+                tx = bone_xml.get('tx')
+                inverse_binds.extend(tx[0:3] + [0.0] + tx[3:6] + [0.0] + tx[6:9] + [0.0] + tx[9:12] + [1.0])
+            gltf['skins'].append(dict(
+                joints=[joint_nodes[name] for name in bone_names],
+                inverseBindMatrices=_gltf_add_accessor(gltf, buffer, inverse_binds, 'MAT4', GLTF_FLOAT),
+            ))
+            skin_index = len(gltf['skins']) - 1
+
+        primitives = []
+        for mesh_xml_node in shape_xml.findall('mesh'):
+            attributes = dict()
+            p = mesh_xml_node.get('p')
+            attributes['POSITION'] = _gltf_add_accessor(
+                gltf, buffer, p, 'VEC3', GLTF_FLOAT, GLTF_ARRAY_BUFFER, bounds=True
+            )
+            if mesh_xml_node.get('n'):
+                attributes['NORMAL'] = _gltf_add_accessor(
+                    gltf, buffer, mesh_xml_node.get('n'), 'VEC3', GLTF_FLOAT, GLTF_ARRAY_BUFFER
+                )
+            if mesh_xml_node.get('ta'):
+                attributes['TANGENT'] = _gltf_add_accessor(
+                    gltf, buffer, mesh_xml_node.get('ta'), 'VEC4', GLTF_FLOAT, GLTF_ARRAY_BUFFER
+                )
+            for i in range(4):
+                uv = mesh_xml_node.get('u{}'.format(i))
+                if uv:
+                    attributes['TEXCOORD_{}'.format(i)] = _gltf_add_accessor(
+                        gltf, buffer, uv, 'VEC2', GLTF_FLOAT, GLTF_ARRAY_BUFFER
+                    )
+
+            primitive = dict(attributes=attributes, mode=GLTF_TRIANGLES, extras=dict())
+            primitive['indices'] = _gltf_add_accessor(
+                gltf, buffer, mesh_xml_node.get('tri'), 'SCALAR', GLTF_UNSIGNED_INT, GLTF_ELEMENT_ARRAY_BUFFER
+            )
+
+            # skin influences, unused slots are stored as -1 so need remapping to a valid joint with zero weight
+            skin_xml = mesh_xml_node.find('skin')
+            if skin_xml is not None and skin_index is not None:
+                vert_count = len(p) // 3
+                stride = len(skin_xml.get('ix')) // vert_count if vert_count else PDX_MAXSKININFS
+                joints = restride(skin_xml.get('ix'), stride, 4, -1)
+                weights = restride(skin_xml.get('w'), stride, 4, 0.0)
+                attributes['JOINTS_0'] = _gltf_add_accessor(
+                    gltf, buffer, [j if j >= 0 else 0 for j in joints], 'VEC4', GLTF_UNSIGNED_SHORT, GLTF_ARRAY_BUFFER
+                )
+                attributes['WEIGHTS_0'] = _gltf_add_accessor(
+                    gltf, buffer, weights, 'VEC4', GLTF_FLOAT, GLTF_ARRAY_BUFFER
+                )
+                primitive['extras']['pdx_bones'] = skin_xml.get('bones')[0]
+
+            # materials are shared between primitives with identical properties
+            material_xml = mesh_xml_node.find('material')
+            if material_xml is not None:
+                pdx_material = dict((k, v[0]) for k, v in material_xml.items())
+                if pdx_material not in materials:
+                    materials.append(pdx_material)
+                    gltf['materials'].append(dict(
+                        name=pdx_material.get('shader', 'material'), extras=dict(pdx_material=pdx_material)
+                    ))
+                primitive['material'] = materials.index(pdx_material)
+
+            primitives.append(primitive)
+
+        shape_properties = dict()
+        if primitives:
+            gltf['meshes'].append(dict(name=shape_xml.tag, primitives=primitives))
+            shape_properties['mesh'] = len(gltf['meshes']) - 1
+        if skin_index is not None and primitives:
+            shape_properties['skin'] = skin_index
+        _gltf_add_node(gltf, shape_xml.tag, root, extras=dict(pdx_shape=True), **shape_properties)
+
+    # locators are parented to their bone, or the root
+    locators = mesh_xml.find('locator') if mesh_xml is not None else None
+    for locator_xml in (locators if locators is not None else []):
+        parent = locator_xml.get('pa')
+        parent_node = joint_nodes.get(parent[0], root) if parent else root
+        extras = dict(pdx_locator=True)
+        if parent and parent[0] not in joint_nodes:
+            extras['pdx_parent'] = parent[0]
+        _gltf_add_node(
+            gltf, locator_xml.tag, parent_node,
+            translation=list(locator_xml.get('p') or [0.0, 0.0, 0.0]),
+            rotation=list(locator_xml.get('q') or [0.0, 0.0, 0.0, 1.0]),
+            extras=extras,
+        )
+
+    for anim_name, anim_xml in (anim_xmls or []):
+        _animfile_to_gltf(gltf, buffer, anim_name, anim_xml, joint_nodes, root)
+
+    # drop empty top level lists, which are not valid glTF
+    for key in ['meshes', 'materials', 'skins', 'accessors', 'bufferViews', 'animations']:
+        if not gltf[key]:
+            del gltf[key]
+
+    return gltf, buffer
+
+
+def iter_anim_samples(anim_xml):
+    """
+        Generator over the sample data of an .anim XML hierarchy, de-interleaving the per frame samples.
+        Yields tuples of (bone name, channel, values) with the flat list of values for all frames of that channel.
+    """
+    info = anim_xml.find('info')
+    samples = anim_xml.find('samples')
+    framecount = info.get('sa')[0]
+
+    # samples are stored per frame, for each bone in order, for each animated channel
+    channel_bones = dict((channel, [b for b in info if channel in b.get('sa')[0]]) for channel in ANIM_CHANNELS)
+    for channel, size in ANIM_CHANNELS.items():
+        bones = channel_bones[channel]
+        data = samples.get(channel) if samples is not None else None
+        if not bones or data is None:
+            continue
+        frame_stride = len(bones) * size
+        if len(data) != frame_stride * framecount:
+            raise ValueError("Sample count mismatch for channel '{}'. {} != {}".format(
+                channel, len(data), frame_stride * framecount
+            ))
+        for k, bone in enumerate(bones):
+            values = [0.0] * (framecount * size)
+            for c in range(size):
+                values[c::size] = data[k * size + c :: frame_stride]
+            yield bone.tag, channel, values
+
+
+def interleave_anim_samples(info_xml, framecount, bone_samples):
+    """
+        Interleaves per bone sample data, in the form given by iter_anim_samples, back into per channel sample arrays.
+        bone_samples is a dictionary of {(bone name, channel): values}.
+    """
+    samples = OrderedDict()
+    for channel, size in ANIM_CHANNELS.items():
+        bones = [b.tag for b in info_xml if channel in b.get('sa')[0]]
+        if not bones:
+            continue
+        frame_stride = len(bones) * size
+        data = [0.0] * (frame_stride * framecount)
+        for k, bone_name in enumerate(bones):
+            values = bone_samples[(bone_name, channel)]
+            for c in range(size):
+                data[k * size + c :: frame_stride] = values[c::size]
+        samples[channel] = data
+    return samples
+
+
+def _animfile_to_gltf(gltf, buffer, anim_name, anim_xml, joint_nodes, root):
+    info = anim_xml.find('info')
+    framecount = info.get('sa')[0]
+    fps = float(info.get('fps')[0])
+
+    # bones missing from the skeleton are created from their initial transform
+    for bone_xml in info:
+        if bone_xml.tag not in joint_nodes:
+            joint_nodes[bone_xml.tag] = _gltf_add_node(
+                gltf, bone_xml.tag, root,
+                translation=list(bone_xml.get('t')), rotation=list(bone_xml.get('q')), scale=[bone_xml.get('s')[0]] * 3,
+            )
+
+    times = [f / fps for f in range(framecount)]
+    time_accessor = _gltf_add_accessor(gltf, buffer, times, 'SCALAR', GLTF_FLOAT, bounds=True)
+
+    samplers, channels = [], []
+    for bone_name, channel, values in iter_anim_samples(anim_xml):
+        if channel == 's':
+            # uniform scale is stored as a single value
+            scale = [0.0] * (len(values) * 3)
+            scale[0::3] = scale[1::3] = scale[2::3] = values
+            values = scale
+        output = _gltf_add_accessor(gltf, buffer, values, GLTF_CHANNEL_TYPES[channel], GLTF_FLOAT)
+        samplers.append(dict(input=time_accessor, output=output, interpolation='LINEAR'))
+        channels.append(dict(
+            sampler=len(samplers) - 1, target=dict(node=joint_nodes[bone_name], path=GLTF_CHANNEL_PATHS[channel])
+        ))
+
+    # keep the initial transforms, so that bones without samples can be written back out
+    # (as lists of pairs rather than dictionaries, so that bone and property order survive)
+    pdx_info = [[bone_xml.tag, [[k, v] for k, v in bone_xml.items()]] for bone_xml in info]
+    samples = anim_xml.find('samples')
+    gltf['animations'].append(dict(
+        name=anim_name, samplers=samplers, channels=channels,
+        extras=dict(
+            pdx_fps=fps, pdx_frames=framecount, pdx_info=pdx_info,
+            pdx_info_keys=list(info.keys()), pdx_channels=list(samples.keys()) if samples is not None else [],
+        ),
+    ))
+
+
+def _gltf_node_parents(gltf):
+    parents = dict()
+    for i, node in enumerate(gltf.get('nodes', [])):
+        for child in node.get('children', []):
+            parents[child] = i
+    return parents
+
+
+def _gltf_node_transform(node):
+    if 'matrix' in node:
+        m = node['matrix']
+        return tx_decompose(m[0:3] + m[4:7] + m[8:11] + m[12:15])
+    return (
+        list(node.get('translation', [0.0, 0.0, 0.0])),
+        list(node.get('rotation', [0.0, 0.0, 0.0, 1.0])),
+        list(node.get('scale', [1.0, 1.0, 1.0])),
+    )
+
+
+def gltf_to_meshfile(gltf, buffer):
+    """
+        Converts glTF data to a .mesh XML hierarchy.
+        Files written by meshfile_to_gltf are copied back directly, other files are assumed to be in right-handed glTF
+        space and are mirrored in Z. Node transforms of meshes are not applied.
+    """
+    nodes = gltf.get('nodes', [])
+    parents = _gltf_node_parents(gltf)
+    mirror = not any(node.get('extras', {}).get('pdx_root') for node in nodes)
+
+    root_xml = Xml.Element('File')
+    root_xml.set('pdxasset', [1, 0])
+    object_xml = Xml.SubElement(root_xml, 'object')
+    locator_xml = Xml.SubElement(root_xml, 'locator')
+
+    joint_names = set()
+    for skin in gltf.get('skins', []):
+        joint_names.update(nodes[j]['name'] for j in skin['joints'])
+
+    for node_index, node in enumerate(nodes):
+        extras = node.get('extras', {})
+        if extras.get('pdx_root'):
+            continue
+
+        # locators, for files from other tools any empty leaf node which is not a joint is treated as a locator
+        is_locator = extras.get('pdx_locator', False)
+        if mirror:
+            is_locator = 'mesh' not in node and not node.get('children') and node.get('name') not in joint_names
+        if is_locator:
+            locnode_xml = Xml.SubElement(locator_xml, node.get('name', 'locator{}'.format(node_index)))
+            translation, rotation, _ = _gltf_node_transform(node)
+            if mirror:
+                translation = [translation[0], translation[1], -translation[2]]
+                rotation = [-rotation[0], -rotation[1], rotation[2], rotation[3]]
+            locnode_xml.set('p', translation)
+            locnode_xml.set('q', rotation)
+            parent = parents.get(node_index)
+            if parent is not None and nodes[parent].get('name') in joint_names:
+                locnode_xml.set('pa', [nodes[parent]['name']])
+            elif extras.get('pdx_parent'):
+                locnode_xml.set('pa', [extras['pdx_parent']])
+            continue
+
+        if 'mesh' not in node and not extras.get('pdx_shape'):
+            continue
+
+        shapenode_xml = Xml.SubElement(object_xml, node.get('name', 'shape{}'.format(node_index)))
+        mesh = gltf['meshes'][node['mesh']] if 'mesh' in node else dict(primitives=[])
+        for primitive in mesh['primitives']:
+            if primitive.get('mode', GLTF_TRIANGLES) != GLTF_TRIANGLES:
+                continue
+            attributes = primitive['attributes']
+            meshnode_xml = Xml.SubElement(shapenode_xml, 'mesh')
+
+            streams = OrderedDict()
+            streams['p'] = _gltf_read_accessor(gltf, buffer, attributes['POSITION'])
+            vert_count = len(streams['p']) // 3
+            if 'NORMAL' in attributes:
+                streams['n'] = _gltf_read_accessor(gltf, buffer, attributes['NORMAL'])
+            if 'TANGENT' in attributes:
+                streams['ta'] = _gltf_read_accessor(gltf, buffer, attributes['TANGENT'])
+            for i in range(4):
+                if 'TEXCOORD_{}'.format(i) in attributes:
+                    streams['u{}'.format(i)] = _gltf_read_accessor(gltf, buffer, attributes['TEXCOORD_{}'.format(i)])
+            if 'indices' in primitive:
+                streams['tri'] = _gltf_read_accessor(gltf, buffer, primitive['indices'])
+            else:
+                streams['tri'] = list(range(vert_count))
+
+            if mirror:
+                for key, size in [('p', 3), ('n', 3), ('ta', 4)]:
+                    if key in streams:
+                        streams[key][2::size] = [-v for v in streams[key][2::size]]
+                if 'ta' in streams:
+                    streams['ta'][3::4] = [-v for v in streams['ta'][3::4]]
+                tri = streams['tri']
+                tri[1::3], tri[2::3] = tri[2::3], tri[1::3]
+
+            for key, values in streams.items():
+                meshnode_xml.set(key, values)
+
+            aabbnode_xml = Xml.SubElement(meshnode_xml, 'aabb')
+            aabb_min, aabb_max = compute_aabb(streams['p'])
+            aabbnode_xml.set('min', aabb_min)
+            aabbnode_xml.set('max', aabb_max)
+
+            materialnode_xml = Xml.SubElement(meshnode_xml, 'material')
+            material = gltf['materials'][primitive['material']] if 'material' in primitive else dict()
+            pdx_material = material.get('extras', {}).get('pdx_material', dict(shader=material.get('name', '')))
+            for key in ['shader', 'diff', 'n', 'spec']:
+                if key in pdx_material:
+                    materialnode_xml.set(key, [pdx_material[key]])
+
+            if 'JOINTS_0' in attributes and 'WEIGHTS_0' in attributes:
+                joints = _gltf_read_accessor(gltf, buffer, attributes['JOINTS_0'])
+                weights = _gltf_read_accessor(gltf, buffer, attributes['WEIGHTS_0'])
+                bones = primitive.get('extras', {}).get('pdx_bones')
+                if bones is None:
+                    bones = max([sum(1 for w in weights[v : v + 4] if w) for v in range(0, len(weights), 4)] or [0])
+                skinnode_xml = Xml.SubElement(meshnode_xml, 'skin')
+                skinnode_xml.set('bones', [bones])
+                # unused slots were written as joint 0 with zero weight
+                skinnode_xml.set('ix', [j if (j or w) else -1 for j, w in zip(joints, weights)])
+                skinnode_xml.set('w', weights)
+
+        # skeleton from the skin joints and inverse bind matrices
+        if 'skin' in node:
+            skin = gltf['skins'][node['skin']]
+            joints = skin['joints']
+            if 'inverseBindMatrices' in skin:
+                inverse_binds = _gltf_read_accessor(gltf, buffer, skin['inverseBindMatrices'])
+            else:
+                inverse_binds = [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+                inverse_binds = inverse_binds * len(joints)
+            skeletonnode_xml = Xml.SubElement(shapenode_xml, 'skeleton')
+            for i, joint in enumerate(joints):
+                bonenode_xml = Xml.SubElement(skeletonnode_xml, nodes[joint].get('name', 'bone{}'.format(i)))
+                bonenode_xml.set('ix', [i])
+                if parents.get(joint) in joints:
+                    bonenode_xml.set('pa', [joints.index(parents[joint])])
+                m = inverse_binds[i * 16 : i * 16 + 16]
+                tx = m[0:3] + m[4:7] + m[8:11] + m[12:15]
+                if mirror:
+                    # conjugate by the Z mirror, negating the Z row and column except the diagonal
+                    for k in (2, 5, 6, 7, 11):
+                        tx[k] = -tx[k]
+                bonenode_xml.set('tx', tx)
+
+    return root_xml
+
+
+def gltf_to_animfile(gltf, buffer, animation_index=0):
+    """
+        Converts an animation from glTF data to an .anim XML hierarchy.
+        All sampled channels must share the same keyframe times, one per frame.
+    """
+    nodes = gltf.get('nodes', [])
+    animation = gltf['animations'][animation_index]
+    extras = animation.get('extras', {})
+
+    # collect the sample data per bone and channel
+    bone_samples = OrderedDict()
+    framecount = extras.get('pdx_frames')
+    fps = extras.get('pdx_fps')
+    for channel in animation['channels']:
+        path = channel['target']['path']
+        if path not in GLTF_PATH_CHANNELS or 'node' not in channel['target']:
+            continue
+        node_name = nodes[channel['target']['node']].get('name')
+        sampler = animation['samplers'][channel['sampler']]
+        times = _gltf_read_accessor(gltf, buffer, sampler['input'])
+        values = _gltf_read_accessor(gltf, buffer, sampler['output'])
+        if path == 'scale':
+            values = values[0::3]
+        if framecount is None:
+            framecount = len(times)
+        if fps is None:
+            fps = 1.0 / (times[1] - times[0]) if len(times) > 1 else 15.0
+        if len(times) != framecount:
+            raise ValueError("Animation channels must have one keyframe per frame. {}".format(node_name))
+        bone_samples[(node_name, GLTF_PATH_CHANNELS[path])] = values
+
+    # bone info from the stored initial transforms, or from the animated nodes
+    if 'pdx_info' in extras:
+        pdx_info = OrderedDict((bone_name, OrderedDict(bone_info)) for bone_name, bone_info in extras['pdx_info'])
+    else:
+        pdx_info = OrderedDict()
+        for bone_name, channel in bone_samples:
+            pdx_info.setdefault(bone_name, OrderedDict(sa=['']))
+            pdx_info[bone_name]['sa'] = [pdx_info[bone_name]['sa'][0] + channel]
+        for node in nodes:
+            if node.get('name') in pdx_info:
+                translation, rotation, scale = _gltf_node_transform(node)
+                pdx_info[node['name']].update([('t', translation), ('q', rotation), ('s', [scale[0]])])
+
+    root_xml = Xml.Element('File')
+    root_xml.set('pdxasset', [1, 0])
+    info_xml = Xml.SubElement(root_xml, 'info')
+    info_values = dict(fps=[float(fps or 15.0)], sa=[framecount or 0], j=[len(pdx_info)])
+    for key in extras.get('pdx_info_keys', ['fps', 'sa', 'j']):
+        info_xml.set(key, info_values[key])
+    for bone_name, bone_info in pdx_info.items():
+        bonenode_xml = Xml.SubElement(info_xml, bone_name)
+        for key, value in bone_info.items():
+            bonenode_xml.set(key, list(value))
+
+    samples_xml = Xml.SubElement(root_xml, 'samples')
+    samples = interleave_anim_samples(info_xml, framecount or 0, bone_samples)
+    for channel in extras.get('pdx_channels', list(samples.keys())):
+        if channel in samples:
+            samples_xml.set(channel, samples[channel])
+
+    return root_xml
+
+
+def convert_to_gltf(mesh_filepath, gltf_filepath, anim_filepaths=None):
+    """
+        Converts a .mesh file, and optionally a list of .anim files, to a .glb or .gltf file.
+    """
+    mesh_xml = read_meshfile(mesh_filepath) if mesh_filepath else None
+    anim_xmls = [(os.path.splitext(os.path.basename(a))[0], read_meshfile(a)) for a in (anim_filepaths or [])]
+    gltf, buffer = meshfile_to_gltf(mesh_xml, anim_xmls)
+    write_gltf(gltf_filepath, gltf, buffer)
+
+
+def convert_from_gltf(gltf_filepath, mesh_filepath=None, anim_filepath=None, animation_index=0):
+    """
+        Converts a .glb or .gltf file to a .mesh file, and optionally one of its animations to an .anim file.
+    """
+    gltf, buffer = read_gltf(gltf_filepath)
+    if mesh_filepath:
+        write_meshfile(mesh_filepath, gltf_to_meshfile(gltf, buffer))
+    if anim_filepath:
+        write_animfile(anim_filepath, gltf_to_animfile(gltf, buffer, animation_index))
+
+
+""" ====================================================================================================================
+    Functions for processing mesh data streams.
+========================================================================================================================
+"""
+
+
+def gather_vectors(values, size, indices):
+    """
+        Returns a new flat list built from the fixed size elements of a flat list at the given element indices.
+    """
+    if not values:
+        return []
+    if size == 1:
+        return [values[i] for i in indices]
+    elements = list(iter_vectors(values, size))
+    return [v for i in indices for v in elements[i]]
+
+
+def _vertex_keys(streams, key_streams, vertex_ids):
+    """
+        Returns an iterator over hashable per vertex keys, built from the vertex ids (if given) and elements of the key
+        streams.
+    """
+    vectors = [iter_vectors(streams[key], MESH_STREAMS[key]) for key in key_streams]
+    if vertex_ids is None:
+        return zip(*vectors)
+    return zip(vertex_ids, *vectors)
+
+
+def weld_vertices(streams, key_streams=None, vertex_ids=None, skip_merge=False):
+    """
+        Merges identical vertices from a set of flat per tri-vertex streams, eg {'p': [...], 'n': [...], 'u0': [...]}.
+        Vertices are compared with hashable keys built from the key streams, by default all streams except tangents.
+        If vertex_ids are given they are also part of the key, so only split vertices of the same source vertex merge.
+
+        Returns a dictionary of the welded streams, the remap list from each tri-vertex to its welded vertex and the
+        list of source vertex ids for the welded vertices. Welded vertices are ordered by first use.
+    """
+    sizes = dict((key, MESH_STREAMS[key]) for key in streams)
+    count = max([len(values) // sizes[key] for key, values in streams.items() if values] or [0])
+
+    if key_streams is None:
+        key_streams = [key for key in streams if key != 'ta']
+    key_streams = [key for key in key_streams if streams.get(key)]
+
+    if skip_merge:
+        unique = list(range(count))
+        remap = list(range(count))
+    else:
+        # hash each vertex once, keeping the first tri-vertex seen for each key
+        keys = _vertex_keys(streams, key_streams, vertex_ids)
+        lookup = dict()
+        unique = []
+        remap = []
+        for i, key in enumerate(keys):
+            index = lookup.get(key)
+            if index is None:
+                index = lookup[key] = len(unique)
+                unique.append(i)
+            remap.append(index)
+
+    welded = dict((key, gather_vectors(values, sizes[key], unique)) for key, values in streams.items())
+    welded_ids = unique if vertex_ids is None else [vertex_ids[i] for i in unique]
+
+    return welded, remap, welded_ids
+
+
+def count_unique_vertices(streams, key_streams=None, vertex_ids=None):
+    """
+        Returns the number of vertices weld_vertices would keep from a set of flat per tri-vertex streams.
+    """
+    if key_streams is None:
+        key_streams = [key for key in streams if key != 'ta']
+    key_streams = [key for key in key_streams if streams.get(key)]
+    return len(set(_vertex_keys(streams, key_streams, vertex_ids)))
+
+
+def quantize_values(values, ndigits):
+    """
+        Returns a flat list of floats rounded to a number of decimal places.
+    """
+    return [round(v, ndigits) for v in values]
+
+
+def quantize_streams(streams, precision, vertex_ids=None):
+    """
+        Rounds a set of flat per tri-vertex streams to a number of decimal places, given either as one precision for all
+        streams or as a dictionary of precision per stream (streams without one are left unchanged). Quantising before
+        welding lets vertices which only differ by float noise merge.
+
+        Returns the rounded streams and the number of vertices which will merge as a result of rounding.
+    """
+    if not isinstance(precision, dict):
+        precision = dict((key, precision) for key in streams)
+    quantized = dict(
+        (key, quantize_values(values, precision[key]) if key in precision else values)
+        for key, values in streams.items()
+    )
+    merged = count_unique_vertices(streams, vertex_ids=vertex_ids)
+    merged -= count_unique_vertices(quantized, vertex_ids=vertex_ids)
+    return quantized, merged
+
+
+def weld_nearby_vertices(streams, tolerances=None, vertex_ids=None, skin=None):
+    """
+        Merges vertices whose position, normal and uvs all differ by less than a tolerance per stream (by default
+        WELD_TOLERANCES), eg where float noise from transforms prevents exact welding. Streams without a tolerance, such
+        as tangents, are not compared and the first vertex of a merged group keeps its own values (and vertex id).
+        If the skin is given, as a pair of flat 'ix' and 'w' lists per vertex, only vertices with the same influences
+        merge, so seams between differently skinned pieces stay split.
+
+        Positions are hashed into a grid of cells twice the position tolerance in size, so each vertex only needs to be
+        compared against those in the 8 cells nearest to it, the position tolerance must be positive.
+        Returns the same results as weld_vertices.
+    """
+    if tolerances is None:
+        tolerances = WELD_TOLERANCES
+    sizes = dict((key, MESH_STREAMS[key]) for key in streams)
+    count = len(streams['p']) // 3
+    if vertex_ids is None:
+        vertex_ids = range(count)
+
+    position_tol = tolerances['p']
+    if not position_tol > 0.0:
+        raise ValueError("Position weld tolerance must be positive. {}".format(position_tol))
+    cell_size = 2.0 * position_tol
+    compare = [
+        (list(iter_vectors(streams[key], sizes[key])), tolerances[key])
+        for key in streams if key in tolerances and streams[key]
+    ]
+    skin_keys = None
+    if skin is not None:
+        skin_keys = list(zip(iter_vectors(skin[0], PDX_MAXSKININFS), iter_vectors(skin[1], PDX_MAXSKININFS)))
+
+    grid = dict()
+    unique = []
+    remap = []
+    for i, position in enumerate(iter_vectors(streams['p'], 3)):
+        # each axis checks its own cell and the neighbour on the side the vertex is closest to
+        axis_cells = []
+        for v in position:
+            scaled = v / cell_size
+            cell = int(math.floor(scaled))
+            axis_cells.append((cell, cell - 1 if scaled - cell < 0.5 else cell + 1))
+        home_cell = (axis_cells[0][0], axis_cells[1][0], axis_cells[2][0])
+
+        index = None
+        for cell in itertools.product(*axis_cells):
+            for candidate in grid.get(cell, ()):
+                j = unique[candidate]
+                if skin_keys is not None and skin_keys[i] != skin_keys[j]:
+                    continue
+                if all(
+                    all(abs(a - b) <= tol for a, b in zip(elements[i], elements[j])) for elements, tol in compare
+                ):
+                    index = candidate
+                    break
+            if index is not None:
+                break
+
+        if index is None:
+            index = len(unique)
+            unique.append(i)
+            grid.setdefault(home_cell, []).append(index)
+        remap.append(index)
+
+    welded = dict((key, gather_vectors(values, sizes[key], unique)) for key, values in streams.items())
+    welded_ids = [vertex_ids[i] for i in unique]
+
+    return welded, remap, welded_ids
+
+
+def get_vertex_size(streams):
+    """
+        Returns the size in bytes of a single vertex, for the vertex streams present in a mesh dictionary or element.
+    """
+    return sum(
+        4 * size for key, size in MESH_STREAMS.items() if key != 'tri' and streams.get(key)
+    )
+
+
+def _uv_directions(positions, coords, i0, i1, i2):
+    """
+        Returns the directions of increasing u and v across a triangle surface, or None if its uvs are degenerate.
+    """
+    (x0, y0, z0), (x1, y1, z1), (x2, y2, z2) = positions[i0], positions[i1], positions[i2]
+    (s0, t0), (s1, t1), (s2, t2) = coords[i0], coords[i1], coords[i2]
+    e1x, e1y, e1z = x1 - x0, y1 - y0, z1 - z0
+    e2x, e2y, e2z = x2 - x0, y2 - y0, z2 - z0
+    ds1, dt1, ds2, dt2 = s1 - s0, t1 - t0, s2 - s0, t2 - t0
+
+    det = ds1 * dt2 - ds2 * dt1
+    if det == 0.0:
+        return None
+    r = 1.0 / det
+    sdir = ((e1x * dt2 - e2x * dt1) * r, (e1y * dt2 - e2y * dt1) * r, (e1z * dt2 - e2z * dt1) * r)
+    tdir = ((e2x * ds1 - e1x * ds2) * r, (e2y * ds1 - e1y * ds2) * r, (e2z * ds1 - e1z * ds2) * r)
+    return sdir, tdir
+
+
+def _handedness(normal, tangent, bitangent):
+    """
+        Returns -1.0 if a bitangent lies on the negative side of the normal-tangent plane, else 1.0.
+    """
+    (nx, ny, nz), (tx, ty, tz), (bx, by, bz) = normal, tangent, bitangent
+    cx, cy, cz = ny * tz - nz * ty, nz * tx - nx * tz, nx * ty - ny * tx
+    return -1.0 if (cx * bx + cy * by + cz * bz) < 0.0 else 1.0
+
+
+def split_mirrored_vertices(streams, uv_set='u0'):
+    """
+        Splits vertices of a dictionary of flat mesh streams, including 'tri', which are shared by triangles with
+        opposite uv handedness, eg along a mirrored uv seam, so every vertex has a single tangent handedness.
+        Returns the streams with 'tri' remapped, and the old index of each new vertex as used by reorder_streams.
+    """
+    p, n, uv, tri = [streams.get(key) for key in ('p', 'n', uv_set, 'tri')]
+    count = len(p) // 3 if p else 0
+    order = list(range(count))
+    if not (p and n and uv and tri):
+        return streams, order
+    positions = list(iter_vectors(p, 3))
+    normals = list(iter_vectors(n, 3))
+    coords = list(iter_vectors(uv, 2))
+
+    # each vertex takes the handedness of its first triangle with defined uvs, any opposite corners use a copy of it
+    vertex_signs = [0.0] * count
+    mirrored = {}
+    split_tri = []
+    for i0, i1, i2 in iter_vectors(tri, 3):
+        directions = _uv_directions(positions, coords, i0, i1, i2)
+        for i in (i0, i1, i2):
+            sign = _handedness(normals[i], directions[0], directions[1]) if directions else 0.0
+            if not sign or vertex_signs[i] in (0.0, sign):
+                vertex_signs[i] = vertex_signs[i] or sign
+                split_tri.append(i)
+            else:
+                if i not in mirrored:
+                    mirrored[i] = len(order)
+                    order.append(i)
+                split_tri.append(mirrored[i])
+    if not mirrored:
+        return streams, order
+
+    split = reorder_streams(streams, order)
+    split['tri'] = split_tri
+    return split, order
+
+
+def generate_tangents(p, n, uv, tri):
+    """
+        Returns a flat list of tangents (x, y, z, w) per vertex, built from the positions, normals, uvs and triangles of
+        a mesh. The w component stores the handedness of the tangent frame, which is -1.0 where uvs are mirrored.
+        Vertices shared by triangles of both handedness should be split first, see split_mirrored_vertices.
+
+        Each triangle adds the directions of increasing u and v across its surface to its vertices, the summed tangent
+        is then orthogonalised against the vertex normal.
+    """
+    count = len(p) // 3
+    positions = list(iter_vectors(p, 3))
+    coords = list(iter_vectors(uv, 2))
+    tan = [[0.0, 0.0, 0.0] for _ in range(count)]
+    bitan = [[0.0, 0.0, 0.0] for _ in range(count)]
+
+    for i0, i1, i2 in iter_vectors(tri, 3):
+        directions = _uv_directions(positions, coords, i0, i1, i2)
+        if directions is None:
+            continue  # degenerate uv mapping has no defined tangent
+        sdir, tdir = directions
+        for i in (i0, i1, i2):
+            acc_t, acc_b = tan[i], bitan[i]
+            acc_t[0] += sdir[0]
+            acc_t[1] += sdir[1]
+            acc_t[2] += sdir[2]
+            acc_b[0] += tdir[0]
+            acc_b[1] += tdir[1]
+            acc_b[2] += tdir[2]
+
+    result = []
+    for (nx, ny, nz), (tx, ty, tz), bitangent in zip(iter_vectors(n, 3), tan, bitan):
+        # Gram-Schmidt orthogonalise against the normal
+        d = nx * tx + ny * ty + nz * tz
+        tx, ty, tz = tx - nx * d, ty - ny * d, tz - nz * d
+        length = math.sqrt(tx * tx + ty * ty + tz * tz)
+        if length < 1e-12:
+            # no usable uv gradient, pick any direction perpendicular to the normal
+            tx, ty, tz = (nz, 0.0, -nx) if abs(nx) > abs(ny) else (0.0, -nz, ny)
+            length = math.sqrt(tx * tx + ty * ty + tz * tz) or 1.0
+        tx, ty, tz = tx / length, ty / length, tz / length
+        # handedness, from which side of the normal-tangent plane the bitangent lies
+        result.extend((tx, ty, tz, _handedness((nx, ny, nz), (tx, ty, tz), bitangent)))
+
+    return result
+
+
+def regenerate_tangents(mesh_xml, uv_set='u0'):
+    """
+        Replaces the 'ta' stream of a mesh element with generated tangents, from the given uv set, first splitting
+        vertices along mirrored uv seams (with their skin). Meshes without normals or the uv set are left unchanged,
+        returns True if tangents were written.
+    """
+    p, n, uv, tri = [mesh_xml.get(key) for key in ('p', 'n', uv_set, 'tri')]
+    if not (p and n and uv and tri):
+        return False
+    split, order = split_mirrored_vertices(dict(mesh_xml.items()), uv_set)
+    if len(order) != len(p) // 3:
+        reorder_vertices(mesh_xml, order)
+        mesh_xml.set('tri', split['tri'])
+    mesh_xml.set('ta', generate_tangents(*[mesh_xml.get(key) for key in ('p', 'n', uv_set, 'tri')]))
+    return True
+
+
+def _face_normal_weights(p, tri, weighting='area'):
+    """
+        Returns the unit normal of each triangle and the weight of each triangle corner, for accumulating normals.
+        Weighting by 'area' gives every corner the area of its triangle, 'angle' gives the angle at the corner.
+    """
+    if weighting not in ('area', 'angle'):
+        raise NotImplementedError("Unknown normal weighting. {}".format(weighting))
+    positions = list(iter_vectors(p, 3))
+    units = []
+    weights = []
+    for i0, i1, i2 in iter_vectors(tri, 3):
+        (x0, y0, z0), (x1, y1, z1), (x2, y2, z2) = positions[i0], positions[i1], positions[i2]
+        ax, ay, az = x1 - x0, y1 - y0, z1 - z0
+        bx, by, bz = x2 - x0, y2 - y0, z2 - z0
+        cx, cy, cz = ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx
+        length = math.sqrt(cx * cx + cy * cy + cz * cz)
+        if length == 0.0:
+            units.append((0.0, 0.0, 0.0))
+            weights.extend((0.0, 0.0, 0.0))
+            continue
+        units.append((cx / length, cy / length, cz / length))
+
+        if weighting == 'area':
+            weights.extend((length, length, length))
+        else:
+            corners = ((x0, y0, z0), (x1, y1, z1), (x2, y2, z2))
+            for k in range(3):
+                (ox, oy, oz), (ux, uy, uz), (vx, vy, vz) = corners[k], corners[k - 2], corners[k - 1]
+                ux, uy, uz, vx, vy, vz = ux - ox, uy - oy, uz - oz, vx - ox, vy - oy, vz - oz
+                dot = ux * vx + uy * vy + uz * vz
+                cross = math.sqrt(
+                    (uy * vz - uz * vy) ** 2 + (uz * vx - ux * vz) ** 2 + (ux * vy - uy * vx) ** 2
+                )
+                weights.append(math.atan2(cross, dot))
+
+    return units, weights
+
+
+def _position_groups(p):
+    """
+        Returns a group index per vertex, shared by vertices at exactly the same position (eg split along uv seams).
+    """
+    lookup = dict()
+    return [lookup.setdefault(position, len(lookup)) for position in iter_vectors(p, 3)]
+
+
+def _normalize_vectors(vectors, fallback=(0.0, 1.0, 0.0)):
+    """
+        Returns a flat list of unit vectors from a list of vectors, zero length vectors are replaced by the fallback.
+    """
+    result = []
+    for x, y, z in vectors:
+        length = math.sqrt(x * x + y * y + z * z)
+        result.extend((x / length, y / length, z / length) if length > 1e-12 else fallback)
+    return result
+
+
+def generate_normals(p, tri, weighting='area'):
+    """
+        Returns a flat list of smooth normals per vertex, built from the positions and triangles of a mesh.
+        Triangle normals are summed per position with 'area' or 'angle' weighting, so vertices split along uv seams
+        still share a normal. Vertices without any triangle get an up normal.
+    """
+    units, weights = _face_normal_weights(p, tri, weighting)
+    groups = _position_groups(p)
+    sums = [[0.0, 0.0, 0.0] for _ in range(max(groups or [-1]) + 1)]
+
+    for (nx, ny, nz), corner_weights, corner_ids in zip(units, iter_vectors(weights, 3), iter_vectors(tri, 3)):
+        for weight, i in zip(corner_weights, corner_ids):
+            acc = sums[groups[i]]
+            acc[0] += nx * weight
+            acc[1] += ny * weight
+            acc[2] += nz * weight
+
+    return _normalize_vectors([sums[g] for g in groups])
+
+
+def generate_corner_normals(p, tri, weighting='area', smoothing_angle=30.0):
+    """
+        Returns a flat list of normals per triangle corner, in the order of the triangle indices. Around each vertex
+        position, a corner only averages the triangles whose normals are within the smoothing angle (in degrees) of
+        its own triangle, so edges sharper than the angle stay hard.
+    """
+    units, weights = _face_normal_weights(p, tri, weighting)
+    groups = _position_groups(p)
+    cos_limit = math.cos(math.radians(smoothing_angle))
+
+    # triangles and their corner weights around each vertex position
+    group_faces = [[] for _ in range(max(groups or [-1]) + 1)]
+    for corner, i in enumerate(tri):
+        group_faces[groups[i]].append((corner // 3, weights[corner]))
+
+    sums = []
+    for corner, i in enumerate(tri):
+        fx, fy, fz = units[corner // 3]
+        sx = sy = sz = 0.0
+        for face, weight in group_faces[groups[i]]:
+            nx, ny, nz = units[face]
+            if nx * fx + ny * fy + nz * fz >= cos_limit:
+                sx += nx * weight
+                sy += ny * weight
+                sz += nz * weight
+        sums.append((sx, sy, sz))
+
+    # only corners of degenerate triangles sum to zero, these get an up normal as they are not visible
+    return _normalize_vectors(sums)
+
+
+def rebuild_normals(mesh_xml, weighting='area', smoothing_angle=None):
+    """
+        Replaces the 'n' stream of a mesh element with generated normals, regenerating tangents if it had any and
+        has uvs to build them from.
+        With a smoothing angle, vertices along hard edges are split and every other vertex stream and the skin are
+        remapped to match, dropping any unused vertices. Returns the change in vertex count.
+    """
+    p, tri = mesh_xml.get('p'), mesh_xml.get('tri')
+    if not (p and tri):
+        return 0
+    vert_count = len(p) // 3
+
+    if smoothing_angle is None:
+        mesh_xml.set('n', generate_normals(p, tri, weighting))
+    else:
+        # gather streams per triangle corner, then weld corners back into vertices of the same source vertex, tangents
+        # are gathered too so they still match the vertices if they cannot be regenerated
+        streams = dict(
+            (key, gather_vectors(mesh_xml.get(key), size, tri))
+            for key, size in MESH_STREAMS.items() if key not in ('n', 'tri') and mesh_xml.get(key)
+        )
+        streams['n'] = generate_corner_normals(p, tri, weighting, smoothing_angle)
+        welded, remap, vert_ids = weld_vertices(streams, vertex_ids=tri)
+        for key, values in welded.items():
+            mesh_xml.set(key, values)
+        mesh_xml.set('tri', remap)
+
+        skin_xml = mesh_xml.find('skin')
+        if skin_xml is not None:
+            for key in ('ix', 'w'):
+                if skin_xml.get(key):
+                    skin_xml.set(key, gather_vectors(skin_xml.get(key), PDX_MAXSKININFS, vert_ids))
+
+    if mesh_xml.get('ta'):
+        regenerate_tangents(mesh_xml)
+    return len(mesh_xml.get('p')) // 3 - vert_count
+
+
+def pack_skin_weights(influences, vertex_ids, max_influences=PDX_MAXSKININFS):
+    """
+        Packs sparse (vertex, bone, weight) skin influences into the flat 'ix' and 'w' skin streams, with an entry for
+        each of the given vertex ids (eg the source vertex of each exported vertex).
+        Each vertex keeps its largest influences up to max_influences (at most PDX_MAXSKININFS), renormalised and sorted
+        by weight, and is padded to PDX_MAXSKININFS with -1 bone indices and zero weights.
+
+        Returns the ix and w lists and a list of ValidationIssue for vertices which lost influences or have none.
+    """
+    # the streams hold a fixed number of influences per vertex
+    max_influences = min(max_influences, PDX_MAXSKININFS)
+
+    # group non-zero influences per vertex
+    vertex_influences = dict()
+    for vertex, bone, weight in influences:
+        if weight > 0.0:
+            vertex_influences.setdefault(vertex, []).append((-weight, bone))
+
+    packed = dict()
+    truncated = 0
+    max_dropped = 0.0
+    for vertex, pairs in vertex_influences.items():
+        pairs.sort()
+        total = -sum(weight for weight, _ in pairs)
+        if len(pairs) > max_influences:
+            truncated += 1
+            max_dropped = max(max_dropped, -sum(weight for weight, _ in pairs[max_influences:]) / total)
+            pairs = pairs[:max_influences]
+            total = -sum(weight for weight, _ in pairs)
+        padding = PDX_MAXSKININFS - len(pairs)
+        packed[vertex] = (
+            [bone for _, bone in pairs] + [-1] * padding,
+            [-weight / total for weight, _ in pairs] + [0.0] * padding,
+        )
+
+    # emit the streams in the order of the requested vertices
+    unweighted = set()
+    empty = ([-1] * PDX_MAXSKININFS, [0.0] * PDX_MAXSKININFS)
+    ix, w = [], []
+    for vertex in vertex_ids:
+        bones, weights = packed.get(vertex, empty)
+        if bones is empty[0]:
+            unweighted.add(vertex)
+        ix.extend(bones)
+        w.extend(weights)
+
+    issues = []
+    if truncated:
+        issues.append(ValidationIssue('skin', 'influence_count', (
+            "{} vertices have more than {} influences, the smallest were dropped "
+            "(largest dropped weight {:.3f})".format(truncated, max_influences, max_dropped)
+        )))
+    if unweighted:
+        issues.append(ValidationIssue('skin', 'unweighted', "{} vertices have no influences".format(len(unweighted))))
+
+    return ix, w, issues
+
+
+def gather_skin(skin, order):
+    """
+        Returns a copy of a skin dictionary of 'bones', 'ix' and 'w', with the packed influences gathered into a new
+        vertex order, given as the old index of each new vertex as for reorder_streams.
+    """
+    gathered = dict(skin)
+    for key in ('ix', 'w'):
+        gathered[key] = gather_vectors(skin[key], PDX_MAXSKININFS, order)
+    return gathered
+
+
+def load_shader_streams(engine=None, settings_filepath=SETTINGS_FILE):
+    """
+        Returns the vertex streams each shader reads, from the 'streams' table of an engine in the settings file.
+        Without an engine the tables of all engines are combined, keeping every stream any engine reads for a shader.
+        Shaders which are not listed read every stream.
+    """
+    with io.open(settings_filepath, 'rt') as fp:
+        settings = json.load(fp)
+    shader_streams = dict()
+    for name, engine_settings in settings.items():
+        if engine is None or name == engine:
+            for shader, streams in engine_settings.get('streams', {}).items():
+                shader_streams.setdefault(shader, set()).update(streams)
+    return shader_streams
+
+
+def strip_streams(mesh_xml, keep):
+    """
+        Removes the vertex streams of a mesh element which are not in keep, in place, then merges any vertices left
+        identical (including their skin). Positions and triangles are always kept.
+        Returns the names of the removed streams and the change in vertex count.
+    """
+    removed = [
+        key for key in MESH_STREAMS if key not in ('p', 'tri') and key not in keep and mesh_xml.get(key) is not None
+    ]
+    if not removed:
+        return removed, 0
+    for key in removed:
+        mesh_xml.attrib.pop(key)
+
+    streams = [key for key in MESH_STREAMS if key != 'tri' and mesh_xml.get(key)]
+    keys = [iter_vectors(mesh_xml.get(key), MESH_STREAMS[key]) for key in streams]
+    skin_xml = mesh_xml.find('skin')
+    if skin_xml is not None and skin_xml.get('ix'):
+        keys.append(iter_vectors(skin_xml.get('ix'), PDX_MAXSKININFS))
+        keys.append(iter_vectors(skin_xml.get('w'), PDX_MAXSKININFS))
+    lookup = dict()
+    unique = []
+    remap = []
+    for i, key in enumerate(zip(*keys)):
+        index = lookup.get(key)
+        if index is None:
+            index = lookup[key] = len(unique)
+            unique.append(i)
+        remap.append(index)
+
+    vert_count = len(mesh_xml.get('p')) // 3
+    if len(unique) < vert_count:
+        reorder_vertices(mesh_xml, unique)
+        mesh_xml.set('tri', [remap[v] for v in mesh_xml.get('tri') or []])
+    return removed, len(unique) - vert_count
+
+
+def strip_unused_streams(tree, shader_streams):
+    """
+        Removes vertex streams which the shader of each mesh element in a mesh file tree never reads, in place, given
+        the streams read by each shader (see load_shader_streams).
+        Returns the count of mesh elements which had streams removed, and the count of vertices removed.
+    """
+    stripped = merged = 0
+    for mesh_xml in tree.iter('mesh'):
+        material_xml = mesh_xml.find('material')
+        shader = (material_xml.get('shader') or [None])[0] if material_xml is not None else None
+        if shader in shader_streams:
+            removed, vert_change = strip_streams(mesh_xml, shader_streams[shader])
+            stripped += bool(removed)
+            merged -= vert_change
+    return stripped, merged
+
+
+""" ====================================================================================================================
+    Functions for computing bounding volumes.
+========================================================================================================================
+"""
+
+
+Bounds = namedtuple('Bounds', ['min', 'max', 'center', 'radius'])
+
+
+def compute_aabb(p):
+    """
+        Returns the min and max corners of the axis aligned box around a flat list of positions, one pass per axis.
+        An empty list gives a box at the origin.
+    """
+    if not p:
+        return [0.0] * 3, [0.0] * 3
+    return [min(p[i::3]) for i in range(3)], [max(p[i::3]) for i in range(3)]
+
+
+def merge_aabbs(aabbs):
+    """
+        Returns the min and max corners of the box around a list of (min, max) boxes.
+    """
+    mins, maxs = zip(*aabbs)
+    return [min(m[i] for m in mins) for i in range(3)], [max(m[i] for m in maxs) for i in range(3)]
+
+
+def compute_bounding_sphere(p):
+    """
+        Returns the center and radius of a sphere around a flat list of positions.
+        The sphere starts between the most distant pair of extreme points along each axis and grows to include any
+        point outside it (Ritter's method). Boxy meshes are often fitted better by the center of their bounding box, so
+        the smaller sphere of the two centers is returned.
+    """
+    if not p:
+        return [0.0] * 3, 0.0
+    positions = list(iter_vectors(p, 3))
+
+    # pick the most separated pair of points at the min and max of each axis
+    def distance_sq(a, b):
+        return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+    pairs = []
+    for axis in range(3):
+        values = p[axis::3]
+        pairs.append((positions[values.index(min(values))], positions[values.index(max(values))]))
+    a, b = max(pairs, key=lambda pair: distance_sq(*pair))
+    cx, cy, cz = (a[0] + b[0]) * 0.5, (a[1] + b[1]) * 0.5, (a[2] + b[2]) * 0.5
+    radius = math.sqrt(distance_sq(a, b)) * 0.5
+
+    # grow the sphere just enough to include each point outside it
+    radius_sq = radius * radius
+    for x, y, z in positions:
+        dx, dy, dz = x - cx, y - cy, z - cz
+        dist_sq = dx * dx + dy * dy + dz * dz
+        if dist_sq > radius_sq:
+            dist = math.sqrt(dist_sq)
+            new_radius = (radius + dist) * 0.5
+            k = (new_radius - radius) / dist
+            cx, cy, cz = cx + dx * k, cy + dy * k, cz + dz * k
+            radius, radius_sq = new_radius, new_radius * new_radius
+
+    # shrink to the furthest point, and use the center of the bounding box instead if that gives a smaller sphere
+    aabb_min, aabb_max = compute_aabb(p)
+    candidates = [(cx, cy, cz), tuple((lo + hi) * 0.5 for lo, hi in zip(aabb_min, aabb_max))]
+    radius, center = min(
+        (math.sqrt(max(distance_sq(center, position) for position in positions)), center) for center in candidates
+    )
+    return list(center), radius
+
+
+def get_bounds(tree):
+    """
+        Returns an ordered dictionary of Bounds for each mesh, each shape and the whole asset in a .mesh XML hierarchy,
+        keyed by path as in validation, with the asset under 'object'. Spheres of shapes and the asset are fitted to all
+        of their positions, so they are tighter than spheres around the mesh bounds.
+    """
+    bounds = OrderedDict()
+    shapes = tree.find('object')
+    if shapes is None:
+        return bounds
+
+    asset_p = []
+    for shape_xml in shapes:
+        shape_path = 'object/{}'.format(shape_xml.tag)
+        shape_p = []
+        for i, mesh_xml in enumerate(shape_xml.findall('mesh')):
+            p = mesh_xml.get('p') or []
+            shape_p.extend(p)
+            bounds['{}/mesh[{}]'.format(shape_path, i)] = Bounds(*(compute_aabb(p) + compute_bounding_sphere(p)))
+        if shape_xml.findall('mesh'):
+            bounds[shape_path] = Bounds(*(compute_aabb(shape_p) + compute_bounding_sphere(shape_p)))
+        asset_p.extend(shape_p)
+
+    bounds['object'] = Bounds(*(compute_aabb(asset_p) + compute_bounding_sphere(asset_p)))
+    return bounds
+
+
+""" ====================================================================================================================
+    Functions for cleaning up mesh geometry.
+========================================================================================================================
+"""
+
+
+CleanupStats = namedtuple('CleanupStats', ['degenerate', 'duplicate', 'orphaned', 'empty'])
+
+
+def find_bad_triangles(p, tri, ratio=DEGENERATE_RATIO):
+    """
+        Returns the indices of triangles with repeated vertices or no area, and of triangles repeating an earlier one
+        with the same winding, as two lists. A triangle with the opposite winding is a back face and not a duplicate.
+    """
+    degenerate, duplicate = [], []
+    seen = set()
+    for t in range(len(tri) // 3):
+        a, b, c = tri[t * 3:t * 3 + 3]
+        if a == b or b == c or a == c:
+            degenerate.append(t)
+            continue
+        ax, ay, az = p[a * 3:a * 3 + 3]
+        e1 = [p[b * 3 + i] - v for i, v in enumerate((ax, ay, az))]
+        e2 = [p[c * 3 + i] - v for i, v in enumerate((ax, ay, az))]
+        cross = (e1[1] * e2[2] - e1[2] * e2[1], e1[2] * e2[0] - e1[0] * e2[2], e1[0] * e2[1] - e1[1] * e2[0])
+        longest = max(
+            sum(v * v for v in e1), sum(v * v for v in e2), sum((u - v) * (u - v) for u, v in zip(e1, e2))
+        )
+        # |cross| is the longest edge times the height to it, so |cross| / longest squared edge is their ratio
+        if sum(v * v for v in cross) <= (ratio * longest) ** 2:
+            degenerate.append(t)
+            continue
+        # rotate so the lowest index is first, keeping the winding
+        key = min((a, b, c), (b, c, a), (c, a, b))
+        if key in seen:
+            duplicate.append(t)
+        else:
+            seen.add(key)
+    return degenerate, duplicate
+
+
+def clean_mesh(mesh_xml, ratio=DEGENERATE_RATIO):
+    """
+        Removes degenerate and duplicate triangles from a mesh element in place (see find_bad_triangles), then removes
+        vertices no triangle uses, compacting the vertex streams and skin and recomputing the aabb.
+        Returns the counts of degenerate triangles, duplicate triangles and orphaned vertices removed.
+    """
+    p = mesh_xml.get('p') or []
+    tri = mesh_xml.get('tri') or []
+    degenerate, duplicate = find_bad_triangles(p, tri, ratio)
+    if degenerate or duplicate:
+        bad = set(degenerate).union(duplicate)
+        tri = [v for t in range(len(tri) // 3) if t not in bad for v in tri[t * 3:t * 3 + 3]]
+        mesh_xml.set('tri', tri)
+
+    vert_count = len(p) // 3
+    used = [False] * vert_count
+    for v in tri:
+        used[v] = True
+    order = [v for v in range(vert_count) if used[v]]
+    orphaned = vert_count - len(order)
+    if orphaned:
+        remap = dict((old, new) for new, old in enumerate(order))
+        mesh_xml.set('tri', [remap[v] for v in tri])
+        reorder_vertices(mesh_xml, order)
+        aabb_xml = mesh_xml.find('aabb')
+        if aabb_xml is not None and order:
+            aabb_min, aabb_max = compute_aabb(mesh_xml.get('p'))
+            aabb_xml.set('min', aabb_min)
+            aabb_xml.set('max', aabb_max)
+    return len(degenerate), len(duplicate), orphaned
+
+
+def clean_meshes(tree, ratio=DEGENERATE_RATIO):
+    """
+        Cleans every mesh element in a mesh file tree in place (see clean_mesh), removing any left without triangles.
+        Returns the total counts as CleanupStats.
+    """
+    totals = [0, 0, 0, 0]
+    object_xml = tree.find('object')
+    for shape_xml in (object_xml if object_xml is not None else []):
+        for mesh_xml in shape_xml.findall('mesh'):
+            for i, count in enumerate(clean_mesh(mesh_xml, ratio)):
+                totals[i] += count
+            if not mesh_xml.get('tri'):
+                shape_xml.remove(mesh_xml)
+                totals[3] += 1
+    return CleanupStats(*totals)
+
+
+""" ====================================================================================================================
+    Functions for optimising mesh data for rendering.
+========================================================================================================================
+"""
+
+
+def _tipsify(tri, cache_size):
+    """
+        Runs the Tipsify triangle ordering over a flat index list, returning the reordered triangle indices and the
+        positions in that order where the cache was flushed (where no vertex in the cache had triangles left).
+    """
+    corners = list(iter_vectors(tri, 3))
+    vert_count = max(tri) + 1 if tri else 0
+
+    # triangles using each vertex and the count of those not yet emitted
+    vert_tris = [[] for _ in range(vert_count)]
+    for t, (a, b, c) in enumerate(corners):
+        vert_tris[a].append(t)
+        vert_tris[b].append(t)
+        vert_tris[c].append(t)
+    live = [len(tris) for tris in vert_tris]
+
+    emitted = [False] * len(corners)
+    timestamps = [0] * vert_count
+    dead_end = []
+    order = []
+    flushes = []
+    stamp = cache_size + 1
+    cursor = 0
+    fan = tri[0] if tri else -1
+
+    while fan >= 0:
+        # emit every remaining triangle around the fanning vertex
+        candidates = []
+        for t in vert_tris[fan]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            order.append(t)
+            for v in corners[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if stamp - timestamps[v] > cache_size:
+                    timestamps[v] = stamp
+                    stamp += 1
+
+        # fan next around the oldest candidate which will still be in the cache after emitting its triangles
+        fan = -1
+        best = -1
+        for v in candidates:
+            if live[v]:
+                priority = stamp - timestamps[v] if stamp - timestamps[v] + 2 * live[v] <= cache_size else 0
+                if priority > best:
+                    best = priority
+                    fan = v
+
+        # otherwise continue from a recently used vertex, or the next vertex with triangles left
+        if fan < 0:
+            while dead_end:
+                v = dead_end.pop()
+                if live[v]:
+                    fan = v
+                    break
+        if fan < 0:
+            flushes.append(len(order))
+            while cursor < vert_count and not live[cursor]:
+                cursor += 1
+            fan = cursor if cursor < vert_count else -1
+
+    return [v for t in order for v in corners[t]], flushes
+
+
+def optimize_vertex_cache(tri, cache_size=VERTEX_CACHE_SIZE):
+    """
+        Returns a flat triangle index list reordered for post-transform vertex cache reuse, using the linear time
+        Tipsify algorithm (Sander, Nehab and Barczak 2007). Triangles keep their own corner order, so geometry is
+        unchanged.
+    """
+    return _tipsify(tri, cache_size)[0]
+
+
+def _cluster_triangles(tri, flushes, cache_size, threshold):
+    """
+        Splits a Tipsify ordered flat index list into clusters of triangles, returning the triangle offset each cluster
+        starts at. Clusters always start where the cache was flushed, and also wherever the running ACMR of the current
+        cluster falls below the threshold.
+    """
+    starts = [0]
+    boundaries = set(flushes)
+    cache = []
+    misses = tris = 0
+    for t, corner in enumerate(iter_vectors(tri, 3)):
+        if t and (t in boundaries or (threshold and misses < threshold * tris)):
+            # clusters are drawn in any order once sorted, so each is measured from a cold cache
+            starts.append(t)
+            cache = []
+            misses = tris = 0
+        for v in corner:
+            if v not in cache:
+                misses += 1
+                cache.append(v)
+                if len(cache) > cache_size:
+                    cache.pop(0)
+        tris += 1
+    return starts
+
+
+def optimize_overdraw(p, tri, cache_size=VERTEX_CACHE_SIZE, threshold=OVERDRAW_THRESHOLD):
+    """
+        Returns a flat triangle index list ordered for vertex cache reuse, then split into clusters which are sorted
+        so those likely to occlude the rest of the mesh draw first (Sander, Nehab and Barczak 2007). The ordering is
+        view independent, clusters facing away from the mesh centroid are assumed to occlude those facing inwards.
+        A threshold of 0.0 only splits where the cache was flushed, higher values make more and smaller clusters.
+    """
+    if not tri:
+        return []
+    tri, flushes = _tipsify(tri, cache_size)
+    starts = _cluster_triangles(tri, flushes, cache_size, threshold)
+    positions = list(iter_vectors(p, 3))
+
+    # area weighted centroid and normal of each cluster
+    clusters = []
+    mesh_center = [0.0, 0.0, 0.0]
+    mesh_area = 0.0
+    for start, end in zip(starts, starts[1:] + [len(tri) // 3]):
+        center = [0.0, 0.0, 0.0]
+        normal = [0.0, 0.0, 0.0]
+        area = 0.0
+        for i0, i1, i2 in iter_vectors(tri[start * 3:end * 3], 3):
+            (x0, y0, z0), (x1, y1, z1), (x2, y2, z2) = positions[i0], positions[i1], positions[i2]
+            ax, ay, az = x1 - x0, y1 - y0, z1 - z0
+            bx, by, bz = x2 - x0, y2 - y0, z2 - z0
+            cx, cy, cz = ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx
+            length = math.sqrt(cx * cx + cy * cy + cz * cz)
+            normal[0] += cx
+            normal[1] += cy
+            normal[2] += cz
+            center[0] += length * (x0 + x1 + x2) / 3.0
+            center[1] += length * (y0 + y1 + y2) / 3.0
+            center[2] += length * (z0 + z1 + z2) / 3.0
+            area += length
+        for k in range(3):
+            mesh_center[k] += center[k]
+        mesh_area += area
+        if area:
+            center = [value / area for value in center]
+        clusters.append((start, end, center, _normalize_vectors([normal], (0.0, 0.0, 0.0))))
+    if mesh_area:
+        mesh_center = [value / mesh_area for value in mesh_center]
+
+    # the occlusion potential of a cluster is how far it faces out from the mesh centroid
+    def occlusion(cluster):
+        _, _, center, normal = cluster
+        return sum((center[k] - mesh_center[k]) * normal[k] for k in range(3))
+
+    clusters.sort(key=occlusion, reverse=True)
+    return [v for start, end, _, _ in clusters for v in tri[start * 3:end * 3]]
+
+
+def optimize_vertex_fetch(tri, vertex_count=0):
+    """
+        Renumbers vertices in the order of their first use by a flat triangle index list, so vertex data is read
+        sequentially while drawing. Returns the remapped triangle indices and the old index of each new vertex, any
+        vertices which are not used by a triangle are kept at the end.
+    """
+    vertex_count = max(vertex_count, max(tri) + 1 if tri else 0)
+    new_index = [-1] * vertex_count
+    order = []
+    for v in tri:
+        if new_index[v] < 0:
+            new_index[v] = len(order)
+            order.append(v)
+    for v in range(vertex_count):
+        if new_index[v] < 0:
+            new_index[v] = len(order)
+            order.append(v)
+    return [new_index[v] for v in tri], order
+
+
+def reorder_streams(streams, order):
+    """
+        Returns a copy of a dictionary of flat mesh streams with the vertex streams gathered in a new vertex order,
+        given as the old index of each new vertex. Triangles and any other keys are copied unchanged.
+    """
+    return dict(
+        (key, gather_vectors(values, MESH_STREAMS[key], order) if key in MESH_STREAMS and key != 'tri' else values)
+        for key, values in streams.items()
+    )
+
+
+def reorder_vertices(mesh_xml, order):
+    """
+        Gathers the vertex streams and skin of a mesh element in place into a new vertex order, as reorder_streams.
+    """
+    for key, values in reorder_streams(dict(mesh_xml.items()), order).items():
+        mesh_xml.set(key, values)
+    skin_xml = mesh_xml.find('skin')
+    if skin_xml is not None:
+        for key in ('ix', 'w'):
+            if skin_xml.get(key):
+                skin_xml.set(key, gather_vectors(skin_xml.get(key), PDX_MAXSKININFS, order))
+
+
+def optimize_mesh(mesh_xml, cache_size=VERTEX_CACHE_SIZE, overdraw_threshold=None):
+    """
+        Reorders the triangles of a mesh element in place for vertex cache reuse, and optionally into clusters ordered
+        to reduce overdraw, then renumbers its vertices in the order they are first used by the triangles.
+    """
+    tri = mesh_xml.get('tri')
+    if not tri:
+        return
+    p = mesh_xml.get('p') or []
+    if overdraw_threshold is None:
+        tri = optimize_vertex_cache(tri, cache_size)
+    else:
+        tri = optimize_overdraw(p, tri, cache_size, overdraw_threshold)
+    tri, order = optimize_vertex_fetch(tri, len(p) // 3)
+    mesh_xml.set('tri', tri)
+    reorder_vertices(mesh_xml, order)
+
+
+""" ====================================================================================================================
+    Functions for merging and splitting mesh elements.
+========================================================================================================================
+"""
+
+
+def _mesh_merge_key(mesh_xml):
+    """
+        Returns a key shared by mesh elements which can be merged, from their material properties and vertex streams.
+    """
+    material_xml = mesh_xml.find('material')
+    material = ()
+    if material_xml is not None:
+        material = tuple(sorted(
+            (key, tuple(value) if isinstance(value, list) else value) for key, value in material_xml.items()
+        ))
+    return material, tuple(key for key in MESH_STREAMS if key != 'tri' and mesh_xml.get(key))
+
+
+def concatenate_meshes(mesh_xmls):
+    """
+        Returns a new mesh element with the vertex streams of several mesh elements concatenated and their triangle
+        indices offset to match, using the material of the first. The mesh elements should have the same streams.
+    """
+    streams = OrderedDict()
+    tri = []
+    offset = 0
+    for mesh_xml in mesh_xmls:
+        for key in MESH_STREAMS:
+            if key != 'tri' and mesh_xml.get(key):
+                streams.setdefault(key, []).extend(mesh_xml.get(key))
+        tri.extend(v + offset for v in mesh_xml.get('tri') or [])
+        offset += len(mesh_xml.get('p') or []) // 3
+
+    result_xml = Xml.Element('mesh')
+    for key, values in streams.items():
+        result_xml.set(key, values)
+    result_xml.set('tri', tri)
+    aabb_xml = Xml.SubElement(result_xml, 'aabb')
+    aabb_min, aabb_max = compute_aabb(streams.get('p'))
+    aabb_xml.set('min', aabb_min)
+    aabb_xml.set('max', aabb_max)
+    material_xml = mesh_xmls[0].find('material')
+    if material_xml is not None:
+        result_xml.append(_copy_element(material_xml))
+    return result_xml
+
+
+def merge_meshes(tree, across_shapes=True, max_vertices=PDX_MAXVERTICES):
+    """
+        Merges static mesh elements with identical material properties and streams in a mesh file tree, so they draw
+        in a single call. Positions are already exported in world space, so vertex data is concatenated as is.
+        Merged meshes take the place of the first, in its shape, and shapes left empty are removed. Skinned meshes are
+        left in their own shapes with their skeletons. Merges stop at max_vertices, to keep within 16-bit indices.
+        Returns the count of mesh elements before and after merging.
+    """
+    object_xml = tree.find('object')
+    if object_xml is None:
+        return 0, 0
+
+    # batches of (shape, mesh) pairs to merge, by merge key
+    groups = OrderedDict()
+    before = 0
+    for shape_xml in object_xml:
+        for mesh_xml in shape_xml.findall('mesh'):
+            before += 1
+            if mesh_xml.find('skin') is not None:
+                continue
+            key = (None if across_shapes else shape_xml.tag, _mesh_merge_key(mesh_xml))
+            vertex_count = len(mesh_xml.get('p') or []) // 3
+            batches = groups.setdefault(key, [])
+            if not batches or batches[-1][1] + vertex_count > max_vertices:
+                batches.append([[], 0])
+            batches[-1][0].append((shape_xml, mesh_xml))
+            batches[-1][1] += vertex_count
+
+    for batches in groups.values():
+        for pairs, _ in batches:
+            if len(pairs) < 2:
+                continue
+            merged_xml = concatenate_meshes([mesh_xml for _, mesh_xml in pairs])
+            shape_xml, first_xml = pairs[0]
+            shape_xml[list(shape_xml).index(first_xml)] = merged_xml
+            for shape_xml, mesh_xml in pairs[1:]:
+                shape_xml.remove(mesh_xml)
+
+    for shape_xml in list(object_xml):
+        if len(shape_xml) == 0:
+            object_xml.remove(shape_xml)
+
+    return before, sum(len(shape_xml.findall('mesh')) for shape_xml in object_xml)
+
+
+def _extract_submesh(mesh_xml, order, tri):
+    """
+        Returns a new mesh element with the vertex streams and skin of a mesh element gathered in a new vertex order,
+        given as the old index of each new vertex, and the given triangles using the new indices.
+        The aabb is recomputed and any other child element, eg the material, is copied.
+    """
+    skin_xml = mesh_xml.find('skin')
+    submesh_xml = Xml.Element('mesh')
+    for key, values in reorder_streams(dict(mesh_xml.items()), order).items():
+        submesh_xml.set(key, values)
+    submesh_xml.set('tri', tri)
+    for child in mesh_xml:
+        if child.tag == 'aabb':
+            aabb_xml = Xml.SubElement(submesh_xml, 'aabb')
+            aabb_min, aabb_max = compute_aabb(submesh_xml.get('p'))
+            aabb_xml.set('min', aabb_min)
+            aabb_xml.set('max', aabb_max)
+        elif child is skin_xml:
+            submesh_skin_xml = _copy_element(skin_xml)
+            for key in ('ix', 'w'):
+                if skin_xml.get(key):
+                    submesh_skin_xml.set(key, gather_vectors(skin_xml.get(key), PDX_MAXSKININFS, order))
+            submesh_xml.append(submesh_skin_xml)
+        else:
+            submesh_xml.append(_copy_element(child))
+    return submesh_xml
+
+
+def split_mesh(mesh_xml, max_vertices=PDX_MAXVERTICES):
+    """
+        Returns a list of mesh elements splitting a mesh element's triangles, in their existing order, into chunks
+        using at most max_vertices vertices each. Each chunk gathers the vertex streams and skin it uses, in the order
+        of first use, with a copy of the material. A mesh within the budget is returned as is.
+    """
+    p = mesh_xml.get('p') or []
+    tri = mesh_xml.get('tri') or []
+    if len(p) // 3 <= max_vertices:
+        return [mesh_xml]
+
+    # greedily fill chunks with whole triangles, the source vertex of each chunk vertex doubles as its stream order
+    chunks = [(OrderedDict(), [])]
+    for corner in iter_vectors(tri, 3):
+        local, local_tri = chunks[-1]
+        if len(local) + sum(1 for v in set(corner) if v not in local) > max_vertices:
+            local, local_tri = OrderedDict(), []
+            chunks.append((local, local_tri))
+        for v in corner:
+            local_tri.append(local.setdefault(v, len(local)))
+
+    return [_extract_submesh(mesh_xml, list(local), local_tri) for local, local_tri in chunks]
+
+
+def split_meshes(tree, max_vertices=PDX_MAXVERTICES):
+    """
+        Splits every mesh element in a mesh file tree using more than max_vertices vertices, in place, so all meshes
+        can use 16-bit indices. The chunks take the place of the source mesh in its shape.
+        Returns the count of mesh elements which were split.
+    """
+    split = 0
+    object_xml = tree.find('object')
+    for shape_xml in (object_xml if object_xml is not None else []):
+        for mesh_xml in shape_xml.findall('mesh'):
+            chunk_xmls = split_mesh(mesh_xml, max_vertices)
+            if len(chunk_xmls) == 1:
+                continue
+            index = list(shape_xml).index(mesh_xml)
+            shape_xml.remove(mesh_xml)
+            for offset, chunk_xml in enumerate(chunk_xmls):
+                shape_xml.insert(index + offset, chunk_xml)
+            split += 1
+    return split
+
+
+def partition_bones(mesh_xml, max_bones=PDX_MAXBONES):
+    """
+        Returns a list of (mesh element, palette) pairs partitioning a skinned mesh element's triangles so each part
+        is influenced by at most max_bones bones. The palette lists the source bone index of each local bone, and the
+        skin 'ix' of each part is remapped to local indices. Parts are filled greedily, each pass over the remaining
+        triangles in order taking every triangle whose bones still fit, so vertex cache order is mostly kept.
+        A triangle influenced by more than max_bones bones on its own is given a part of its own.
+    """
+    skin_xml = mesh_xml.find('skin')
+    tri = mesh_xml.get('tri') or []
+    if skin_xml is None or not skin_xml.get('ix'):
+        return [(mesh_xml, [])]
+    vertex_bones = [
+        frozenset(bone for bone, weight in zip(bones, weights) if bone >= 0 and weight > 0.0)
+        for bones, weights in zip(
+            iter_vectors(skin_xml.get('ix'), PDX_MAXSKININFS), iter_vectors(skin_xml.get('w'), PDX_MAXSKININFS)
+        )
+    ]
+    corners = list(iter_vectors(tri, 3))
+    remaining = [(corner, vertex_bones[corner[0]] | vertex_bones[corner[1]] | vertex_bones[corner[2]])
+                 for corner in corners]
+
+    parts = []
+    while remaining:
+        palette = set()
+        part, deferred = [], []
+        for corner, bones in remaining:
+            if len(palette | bones) <= max_bones or not part:
+                palette |= bones
+                part.append(corner)
+            else:
+                deferred.append((corner, bones))
+        parts.append((part, sorted(palette)))
+        remaining = deferred
+
+    results = []
+    for part, palette in parts:
+        local = OrderedDict()
+        local_tri = [local.setdefault(v, len(local)) for corner in part for v in corner]
+        part_xml = _extract_submesh(mesh_xml, list(local), local_tri)
+        part_skin_xml = part_xml.find('skin')
+        local_bones = dict((bone, i) for i, bone in enumerate(palette))
+        part_skin_xml.set('ix', [local_bones.get(bone, -1) for bone in part_skin_xml.get('ix')])
+        results.append((part_xml, palette))
+    return results
+
+
+def _palette_skeleton(skeleton_xml, palette):
+    """
+        Returns a new skeleton element with the bones of a palette, given as source bone indices, and every ancestor
+        of them, so animated transforms are still applied in their parent's space. Palette bones are numbered first in
+        palette order, so skin indices stay below the palette size, then ancestors in source order. Bones are listed in
+        source order so parents still come before their children, and parent indices are remapped.
+    """
+    bones = dict(((bone_xml.get('ix') or [-1])[0], bone_xml) for bone_xml in skeleton_xml)
+    local_bones = dict((bone, i) for i, bone in enumerate(palette))
+    ancestors = set()
+    for bone in palette:
+        parent = bones[bone].get('pa')
+        while parent is not None and parent[0] not in local_bones and parent[0] not in ancestors:
+            ancestors.add(parent[0])
+            parent = bones[parent[0]].get('pa')
+    source_order = [(bone_xml.get('ix') or [-1])[0] for bone_xml in skeleton_xml]
+    for bone in source_order:
+        if bone in ancestors:
+            local_bones[bone] = len(local_bones)
+
+    palette_xml = Xml.Element(skeleton_xml.tag)
+    for bone in source_order:
+        if bone not in local_bones:
+            continue
+        source_xml = bones[bone]
+        bone_xml = Xml.SubElement(palette_xml, source_xml.tag)
+        bone_xml.set('ix', [local_bones[bone]])
+        parent = source_xml.get('pa')
+        if parent is not None:
+            bone_xml.set('pa', [local_bones[parent[0]]])
+        bone_xml.set('tx', list(source_xml.get('tx')))
+    return palette_xml
+
+
+def partition_skeletons(tree, max_bones=PDX_MAXBONES):
+    """
+        Partitions the skinned meshes of every shape in a mesh file tree which are influenced by more than max_bones
+        bones, in place. Skeletons are per shape, so each part is added as a '<shape>_<n>' shape with a skeleton of
+        its palette bones, which its skin uses, and their ancestors. The source shape keeps its skeleton and every
+        other mesh. Returns the count of shapes added.
+    """
+    object_xml = tree.find('object')
+    added = 0
+    for shape_xml in list(object_xml if object_xml is not None else []):
+        skeleton_xml = shape_xml.find('skeleton')
+        if skeleton_xml is None or len(skeleton_xml) <= max_bones:
+            continue
+        parts = []
+        for mesh_xml in shape_xml.findall('mesh'):
+            if mesh_xml.find('skin') is None:
+                continue
+            mesh_parts = partition_bones(mesh_xml, max_bones)
+            if len(mesh_parts) > 1:
+                parts.extend(mesh_parts)
+                shape_xml.remove(mesh_xml)
+
+        index = list(object_xml).index(shape_xml)
+        for i, (part_xml, palette) in enumerate(parts, 1):
+            part_shape_xml = Xml.Element('{}_{}'.format(shape_xml.tag, i))
+            object_xml.insert(index + i, part_shape_xml)
+            part_shape_xml.append(part_xml)
+            part_shape_xml.append(_palette_skeleton(skeleton_xml, palette))
+        added += len(parts)
+    return added
+
+
+def get_animated_bones(anim_xml):
+    """
+        Returns the names of bones in an .anim XML hierarchy which have sampled channels, so move during the animation.
+    """
+    info_xml = anim_xml.find('info')
+    return set(bone_xml.tag for bone_xml in (info_xml if info_xml is not None else []) if bone_xml.get('sa'))
+
+
+def prune_bones(tree, ignore=(), keep=(), prune_unused=True):
+    """
+        Removes bones from the skeleton of every shape in a mesh file tree, in place. Ignored bones are always removed,
+        and with prune_unused so is any bone without skin weights which is not named by a locator, in keep (eg bones
+        referenced by animations) or the ancestor of a kept bone.
+        Bone 'ix' and 'pa' indices are compacted, children of removed bones are parented to their nearest kept
+        ancestor, and skin weights on removed bones move to that ancestor too. Returns the count of bones removed.
+    """
+    object_xml = tree.find('object')
+    locators_xml = tree.find('locator')
+    referenced = set(keep)
+    for locator_xml in (locators_xml if locators_xml is not None else []):
+        if locator_xml.get('pa'):
+            referenced.add(locator_xml.get('pa')[0])
+
+    removed = 0
+    for shape_xml in (object_xml if object_xml is not None else []):
+        skeleton_xml = shape_xml.find('skeleton')
+        if skeleton_xml is None:
+            continue
+        bones = list(skeleton_xml)
+        names = dict(((bone.get('ix') or [-1])[0], bone.tag) for bone in bones)
+        parents = dict(((bone.get('ix') or [-1])[0], (bone.get('pa') or [-1])[0]) for bone in bones)
+        skin_xmls = [
+            mesh_xml.find('skin') for mesh_xml in shape_xml.findall('mesh')
+            if mesh_xml.find('skin') is not None and mesh_xml.find('skin').get('ix')
+        ]
+        weighted = set(
+            bone for skin_xml in skin_xmls for bone, weight in zip(skin_xml.get('ix'), skin_xml.get('w'))
+            if bone >= 0 and weight > 0.0
+        )
+
+        # bones to keep, with their ancestors so the hierarchy still animates
+        kept = set()
+        for index, name in names.items():
+            if name in ignore:
+                continue
+            if not prune_unused or index in weighted or name in referenced:
+                while index in names and index not in kept:
+                    if names[index] not in ignore:
+                        kept.add(index)
+                    index = parents.get(index, -1)
+        if len(kept) == len(bones):
+            continue
+
+        def nearest_kept(index):
+            while index >= 0 and index not in kept:
+                index = parents.get(index, -1)
+            return index
+
+        # compact indices in skeleton order
+        remap = dict()
+        for bone_xml in bones:
+            index = (bone_xml.get('ix') or [-1])[0]
+            if index in kept:
+                remap[index] = len(remap)
+        for bone_xml in bones:
+            index = (bone_xml.get('ix') or [-1])[0]
+            if index not in kept:
+                skeleton_xml.remove(bone_xml)
+                continue
+            kept_xml = Xml.Element(bone_xml.tag)
+            kept_xml.set('ix', [remap[index]])
+            parent = nearest_kept(parents.get(index, -1))
+            if parent >= 0:
+                kept_xml.set('pa', [remap[parent]])
+            for key, value in bone_xml.items():
+                if key not in ('ix', 'pa'):
+                    kept_xml.set(key, value)
+            skeleton_xml[list(skeleton_xml).index(bone_xml)] = kept_xml
+        removed += len(bones) - len(kept)
+
+        for skin_xml in skin_xmls:
+            influences = []
+            for v, (ix, w) in enumerate(zip(
+                iter_vectors(skin_xml.get('ix'), PDX_MAXSKININFS), iter_vectors(skin_xml.get('w'), PDX_MAXSKININFS)
+            )):
+                for bone, weight in zip(ix, w):
+                    bone = nearest_kept(bone)
+                    if bone >= 0 and weight > 0.0:
+                        influences.append((v, remap[bone], weight))
+            # sum weights which moved onto the same ancestor
+            summed = OrderedDict()
+            for v, bone, weight in influences:
+                summed[(v, bone)] = summed.get((v, bone), 0.0) + weight
+            bones_count = (skin_xml.get('bones') or [PDX_MAXSKININFS])[0]
+            ix, w, _ = pack_skin_weights(
+                [(v, bone, weight) for (v, bone), weight in summed.items()],
+                range(len(skin_xml.get('ix')) // PDX_MAXSKININFS), bones_count
+            )
+            skin_xml.set('ix', ix)
+            skin_xml.set('w', w)
+    return removed
+
+
+""" ====================================================================================================================
+    Functions for reducing skin influences.
+========================================================================================================================
+"""
+
+
+SkinError = namedtuple('SkinError', ['vertices', 'dropped_weight', 'max_error', 'mean_error'])
+
+
+def get_anim_poses(anim_xml, skeleton_xml, max_frames=SKIN_ERROR_FRAMES):
+    """
+        Returns the skinning transforms of up to max_frames evenly spaced frames of an .anim XML hierarchy, posing the
+        bones of a skeleton element. Each pose is a list of transforms by bone index, in the bone 'tx' layout, taking a
+        bind pose position to its posed position. Bones the animation does not include keep their bind pose relative
+        to their parent.
+    """
+    bones = sorted(skeleton_xml, key=lambda bone_xml: (bone_xml.get('ix') or [-1])[0])
+    inv_bind = [list(bone_xml.get('tx')) for bone_xml in bones]
+    parents = [(bone_xml.get('pa') or [-1])[0] for bone_xml in bones]
+    bind_local = [
+        tx_multiply(tx_inverse(tx), inv_bind[parent]) if parent >= 0 else tx_inverse(tx)
+        for tx, parent in zip(inv_bind, parents)
+    ]
+
+    info = anim_xml.find('info')
+    framecount = info.get('sa')[0]
+    initial = dict((bone_xml.tag, bone_xml) for bone_xml in info)
+    samples = dict(((bone, channel), values) for bone, channel, values in iter_anim_samples(anim_xml))
+    count = min(max_frames, framecount)
+    frames = sorted(set(int(round(k * (framecount - 1) / float(max(count - 1, 1)))) for k in range(count)))
+
+    poses = []
+    for frame in frames:
+        local = []
+        for i, bone_xml in enumerate(bones):
+            if bone_xml.tag not in initial:
+                local.append(bind_local[i])
+                continue
+            channels = dict()
+            for channel, size in ANIM_CHANNELS.items():
+                values = samples.get((bone_xml.tag, channel))
+                if values:
+                    channels[channel] = values[frame * size:(frame + 1) * size]
+                else:
+                    channels[channel] = initial[bone_xml.tag].get(channel)
+            local.append(tx_compose(channels['t'], channels['q'], [channels['s'][0]] * 3))
+
+        # world transforms, resolving parents first whatever the bone order
+        world = [None] * len(bones)
+        for i in range(len(bones)):
+            chain = []
+            while i >= 0 and world[i] is None:
+                chain.append(i)
+                i = parents[i]
+            for j in reversed(chain):
+                world[j] = tx_multiply(local[j], world[parents[j]]) if parents[j] >= 0 else local[j]
+        poses.append([tx_multiply(tx, world[i]) for i, tx in enumerate(inv_bind)])
+    return poses
+
+
+def _skin_position(position, influences, pose):
+    x, y, z = position
+    result = [0.0, 0.0, 0.0]
+    for bone, weight in influences:
+        tx = pose[bone]
+        for k in range(3):
+            result[k] += weight * (x * tx[k] + y * tx[3 + k] + z * tx[6 + k] + tx[9 + k])
+    return result
+
+
+def reduce_skin_influences(mesh_xml, max_influences, poses=()):
+    """
+        Lowers the skin influences of a mesh element to max_influences per vertex, in place, dropping the smallest
+        weights and renormalising. The 'bones' count is lowered to match, the 'ix' and 'w' stride stays at
+        PDX_MAXSKININFS as the format requires, with unused slots padded.
+        Returns a SkinError with the largest fraction of weight dropped from any vertex, and the largest and mean
+        distance a vertex moves when skinned with the reduced weights, over the given poses (see get_anim_poses).
+        The bind pose itself is deformed by no bone, so gives no error.
+    """
+    skin_xml = mesh_xml.find('skin')
+    if skin_xml is None or not skin_xml.get('ix'):
+        return SkinError(0, 0.0, 0.0, 0.0)
+    ix, w = skin_xml.get('ix'), skin_xml.get('w')
+    vert_count = len(ix) // PDX_MAXSKININFS
+    influences = []
+    before = []
+    for v, (bones, weights) in enumerate(zip(iter_vectors(ix, PDX_MAXSKININFS), iter_vectors(w, PDX_MAXSKININFS))):
+        pairs = [(bone, weight) for bone, weight in zip(bones, weights) if bone >= 0 and weight > 0.0]
+        before.append(pairs)
+        influences.extend((v, bone, weight) for bone, weight in pairs)
+
+    bones_count = min((skin_xml.get('bones') or [PDX_MAXSKININFS])[0], max_influences)
+    new_ix, new_w, _ = pack_skin_weights(influences, range(vert_count), bones_count)
+    skin_xml.set('bones', [bones_count])
+    skin_xml.set('ix', new_ix)
+    skin_xml.set('w', new_w)
+
+    # only vertices which lost influences can move
+    changed = []
+    max_dropped = 0.0
+    for v, pairs in enumerate(before):
+        if len(pairs) > bones_count:
+            total = sum(weight for _, weight in pairs)
+            kept = sorted((weight for _, weight in pairs), reverse=True)[:bones_count]
+            max_dropped = max(max_dropped, 1.0 - sum(kept) / total)
+            changed.append(v)
+
+    max_error = total_error = 0.0
+    positions = list(iter_vectors(mesh_xml.get('p') or [], 3))
+    for pose in poses:
+        for v in changed:
+            start, end = v * PDX_MAXSKININFS, (v + 1) * PDX_MAXSKININFS
+            after = [(bone, weight) for bone, weight in zip(new_ix[start:end], new_w[start:end]) if bone >= 0]
+            total = sum(weight for _, weight in before[v])
+            old = _skin_position(positions[v], [(bone, weight / total) for bone, weight in before[v]], pose)
+            new = _skin_position(positions[v], after, pose)
+            error = math.sqrt(sum((a - b) ** 2 for a, b in zip(old, new)))
+            max_error = max(max_error, error)
+            total_error += error
+    samples = vert_count * len(poses)
+    return SkinError(len(changed), max_dropped, max_error, total_error / samples if samples else 0.0)
+
+
+def reduce_skin(tree, max_influences, anim_xmls=()):
+    """
+        Lowers the skin influences of every mesh element in a mesh file tree to max_influences, in place, measuring
+        the error over poses from the given .anim XML hierarchies. Returns an OrderedDict of SkinError by mesh path.
+    """
+    errors = OrderedDict()
+    object_xml = tree.find('object')
+    for shape_xml in (object_xml if object_xml is not None else []):
+        skeleton_xml = shape_xml.find('skeleton')
+        poses = []
+        if skeleton_xml is not None:
+            for anim_xml in anim_xmls:
+                poses.extend(get_anim_poses(anim_xml, skeleton_xml))
+        for i, mesh_xml in enumerate(shape_xml.findall('mesh')):
+            if mesh_xml.find('skin') is not None:
+                errors['object/{}/mesh[{}]'.format(shape_xml.tag, i)] = reduce_skin_influences(
+                    mesh_xml, max_influences, poses
+                )
+    return errors
+
+
+""" ====================================================================================================================
+    Functions for simplifying meshes into levels of detail.
+========================================================================================================================
+"""
+
+
+LodStats = namedtuple('LodStats', ['source_triangles', 'triangles', 'vertices', 'error', 'relative_error'])
+
+
+def _plane_quadric(nx, ny, nz, d, weight):
+    """
+        Returns the error quadric of a plane as its 10 unique weighted coefficients, followed by the weight.
+    """
+    return [
+        weight * nx * nx, weight * nx * ny, weight * nx * nz, weight * nx * d, weight * ny * ny,
+        weight * ny * nz, weight * ny * d, weight * nz * nz, weight * nz * d, weight * d * d, weight
+    ]
+
+
+def _quadric_error(q, x, y, z):
+    """
+        Returns the weighted mean squared distance of a point from the planes summed into a quadric.
+    """
+    a2, ab, ac, ad, b2, bc, bd, c2, cd, d2, weight = q
+    error = (
+        a2 * x * x + b2 * y * y + c2 * z * z + 2.0 * (ab * x * y + ac * x * z + bc * y * z + ad * x + bd * y + cd * z) +
+        d2
+    )
+    return max(error, 0.0) / weight if weight else 0.0
+
+
+def _quadric_minimum(q):
+    """
+        Returns the point with the smallest error for a quadric, or None when the planes do not pin down a point.
+    """
+    a2, ab, ac, ad, b2, bc, bd, c2, cd, _, _ = q
+    det = a2 * (b2 * c2 - bc * bc) - ab * (ab * c2 - bc * ac) + ac * (ab * bc - b2 * ac)
+    scale = (a2 + b2 + c2) / 3.0
+    if abs(det) <= 1e-6 * scale * scale * scale:
+        return None
+    x = (-ad * (b2 * c2 - bc * bc) + ab * (bd * c2 - bc * cd) - ac * (bd * bc - b2 * cd)) / det
+    y = (-a2 * (bd * c2 - cd * bc) + ad * (ab * c2 - bc * ac) - ac * (ab * cd - bd * ac)) / det
+    z = (-a2 * (b2 * cd - bc * bd) + ab * (ab * cd - bd * ac) - ad * (ab * bc - b2 * ac)) / det
+    return x, y, z
+
+
+def _copy_element(element):
+    """
+        Returns a deep copy of an element and its children, with copies of any list property values.
+        Used instead of copy.deepcopy, which Py2 cElementTree does not support.
+    """
+    result = Xml.Element(element.tag)
+    for key, value in element.items():
+        result.set(key, list(value) if isinstance(value, list) else value)
+    for child in element:
+        result.append(_copy_element(child))
+    return result
+
+
+def simplify_mesh(mesh_xml, ratio, attribute_weight=SIMPLIFY_ATTRIBUTE_WEIGHT, border_weight=SIMPLIFY_BORDER_WEIGHT):
+    """
+        Returns a new mesh element with roughly the given ratio of triangles, and the geometric error of the result.
+        Edges are collapsed in order of quadric error (Garland and Heckbert 1997) plus a penalty for the normal and uv
+        change, with every vertex data stream and the skin weights interpolated at the new position.
+        Vertices split along uv or normal seams are collapsed together along the seam, and open borders and seams are
+        held in place by planes through their edges. The error is the largest mean distance moved from the source
+        planes of any collapse, in mesh units.
+    """
+    p = mesh_xml.get('p') or []
+    tri = mesh_xml.get('tri') or []
+    streams = OrderedDict(
+        (key, [list(v) for v in iter_vectors(mesh_xml.get(key), size)])
+        for key, size in MESH_STREAMS.items() if key not in ('p', 'tri') and mesh_xml.get(key)
+    )
+    skin_xml = mesh_xml.find('skin')
+    skin = None
+    if skin_xml is not None and skin_xml.get('ix'):
+        skin = [
+            dict((bone, weight) for bone, weight in zip(bones, weights) if bone >= 0 and weight > 0.0)
+            for bones, weights in zip(
+                iter_vectors(skin_xml.get('ix'), PDX_MAXSKININFS), iter_vectors(skin_xml.get('w'), PDX_MAXSKININFS)
+            )
+        ]
+    # streams compared when penalising collapses, tangents follow the normals and uvs so are not included
+    attr_keys = [key for key in streams if key != 'ta']
+
+    # vertices at the same position form a group which is always moved as one
+    group = _position_groups(p)
+    group_pos = [None] * (max(group or [-1]) + 1)
+    group_verts = [set() for _ in group_pos]
+    for v, position in enumerate(iter_vectors(p, 3)):
+        group_pos[group[v]] = list(position)
+        group_verts[group[v]].add(v)
+    group_version = [0] * len(group_pos)
+
+    corners = [list(c) for c in iter_vectors(tri, 3)]
+    alive = [True] * len(corners)
+    vert_tris = [set() for _ in range(len(p) // 3)]
+    for t, corner in enumerate(corners):
+        for v in corner:
+            vert_tris[v].add(t)
+
+    def face_normal(corner):
+        (x0, y0, z0), (x1, y1, z1), (x2, y2, z2) = [group_pos[group[v]] for v in corner]
+        ax, ay, az = x1 - x0, y1 - y0, z1 - z0
+        bx, by, bz = x2 - x0, y2 - y0, z2 - z0
+        return ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx
+
+    # quadrics of the triangle planes around each group, weighted by area
+    quadrics = [[0.0] * 11 for _ in group_pos]
+    edge_count = dict()
+    for corner in corners:
+        nx, ny, nz = face_normal(corner)
+        length = math.sqrt(nx * nx + ny * ny + nz * nz)
+        if length == 0.0:
+            continue
+        nx, ny, nz = nx / length, ny / length, nz / length
+        x0, y0, z0 = group_pos[group[corner[0]]]
+        plane = _plane_quadric(nx, ny, nz, -(nx * x0 + ny * y0 + nz * z0), length * 0.5)
+        for v in corner:
+            q = quadrics[group[v]]
+            for k in range(11):
+                q[k] += plane[k]
+        for k in range(3):
+            edge = (min(corner[k - 1], corner[k]), max(corner[k - 1], corner[k]))
+            edge_count[edge] = edge_count.get(edge, 0) + 1
+
+    # edges used by one triangle only are open borders or seams, held by a plane through the edge across the face
+    for corner in corners:
+        nx, ny, nz = face_normal(corner)
+        length = math.sqrt(nx * nx + ny * ny + nz * nz)
+        if length == 0.0:
+            continue
+        for k in range(3):
+            a, b = corner[k - 1], corner[k]
+            if edge_count[(min(a, b), max(a, b))] != 1:
+                continue
+            (ax, ay, az), (bx, by, bz) = group_pos[group[a]], group_pos[group[b]]
+            ex, ey, ez = bx - ax, by - ay, bz - az
+            px, py, pz = ey * nz - ez * ny, ez * nx - ex * nz, ex * ny - ey * nx
+            plength = math.sqrt(px * px + py * py + pz * pz)
+            if plength == 0.0:
+                continue
+            px, py, pz = px / plength, py / plength, pz / plength
+            plane = _plane_quadric(
+                px, py, pz, -(px * ax + py * ay + pz * az), (ex * ex + ey * ey + ez * ez) * border_weight
+            )
+            for v in (a, b):
+                q = quadrics[group[v]]
+                for j in range(11):
+                    q[j] += plane[j]
+
+    def collapse_pairs(src, dst):
+        # every vertex of the source group must share an edge with exactly one vertex of the destination group
+        pairs = []
+        for a in group_verts[src]:
+            targets = set(c for t in vert_tris[a] for c in corners[t] if group[c] == dst)
+            if len(targets) != 1:
+                return None
+            pairs.append((a, targets.pop()))
+        return pairs
+
+    def evaluate(g, h):
+        for src, dst in ((g, h), (h, g)):
+            pairs = collapse_pairs(src, dst)
+            if pairs:
+                break
+        else:
+            return None
+        q = [a + b for a, b in zip(quadrics[src], quadrics[dst])]
+        src_pos, dst_pos = group_pos[src], group_pos[dst]
+        candidates = [dst_pos, src_pos, [(a + b) * 0.5 for a, b in zip(src_pos, dst_pos)]]
+        optimum = _quadric_minimum(q)
+        if optimum is not None:
+            # keep the optimum near the edge, so thin features do not shoot out
+            edge_length2 = sum((a - b) ** 2 for a, b in zip(src_pos, dst_pos))
+            if sum((a - b) ** 2 for a, b in zip(optimum, candidates[2])) <= edge_length2:
+                candidates.append(list(optimum))
+        error, position = min((_quadric_error(q, *c), c) for c in candidates)
+
+        penalty = 0.0
+        if attribute_weight:
+            edge_length2 = sum((a - b) ** 2 for a, b in zip(src_pos, dst_pos))
+            for a, b in pairs:
+                for key in attr_keys:
+                    penalty += sum((x - y) ** 2 for x, y in zip(streams[key][a], streams[key][b]))
+            penalty *= attribute_weight * edge_length2
+        return error + penalty, error, src, dst, position
+
+    heap = []
+
+    def push(g, h):
+        result = evaluate(g, h)
+        if result is not None:
+            cost, error, src, dst, position = result
+            heapq.heappush(heap, (cost, error, src, dst, group_version[src], group_version[dst], position))
+
+    edges = set()
+    for corner in corners:
+        for k in range(3):
+            g, h = group[corner[k - 1]], group[corner[k]]
+            if g != h:
+                edges.add((min(g, h), max(g, h)))
+    for g, h in sorted(edges):
+        push(g, h)
+
+    tri_count = sum(1 for corner in corners if len(set(group[v] for v in corner)) == 3)
+    target = int(len(corners) * ratio)
+    max_error = 0.0
+
+    while heap and tri_count > target:
+        cost, error, src, dst, src_version, dst_version, position = heapq.heappop(heap)
+        if group_version[src] != src_version or group_version[dst] != dst_version or not group_verts[src]:
+            continue
+        pairs = collapse_pairs(src, dst)
+        if not pairs:
+            continue
+
+        # triangles spanning both groups are removed, reject the collapse if any other triangle would flip over
+        around = set(t for v in group_verts[src] | group_verts[dst] for t in vert_tris[v])
+        removed = set(t for t in around if any(group[c] == src for c in corners[t]) and
+                      any(group[c] == dst for c in corners[t]))
+        before = dict((t, face_normal(corners[t])) for t in around - removed)
+        src_pos, dst_pos = group_pos[src], group_pos[dst]
+        group_pos[src] = group_pos[dst] = position
+        flipped = any(
+            sum(a * b for a, b in zip(face_normal(corners[t]), normal)) <= 0.0 for t, normal in before.items()
+        )
+        group_pos[src], group_pos[dst] = src_pos, dst_pos
+        if flipped:
+            continue
+
+        # interpolate the vertex data at the new position along the edge
+        edge = [b - a for a, b in zip(src_pos, dst_pos)]
+        edge_length2 = sum(e * e for e in edge)
+        blend = sum((x - a) * e for x, a, e in zip(position, src_pos, edge)) / edge_length2 if edge_length2 else 1.0
+        blend = min(max(blend, 0.0), 1.0)
+        for a, b in pairs:
+            for values in streams.values():
+                values[b] = [x + (y - x) * blend for x, y in zip(values[a], values[b])]
+            if skin is not None:
+                weights = dict((bone, weight * (1.0 - blend)) for bone, weight in skin[a].items())
+                for bone, weight in skin[b].items():
+                    weights[bone] = weights.get(bone, 0.0) + weight * blend
+                skin[b] = weights
+
+        # move the source group triangles onto the destination group
+        remap = dict(pairs)
+        for t in removed:
+            alive[t] = False
+            for v in corners[t]:
+                vert_tris[v].discard(t)
+        for a, b in pairs:
+            for t in vert_tris[a]:
+                corners[t] = [remap.get(v, v) for v in corners[t]]
+                vert_tris[b].add(t)
+            vert_tris[a] = set()
+        for t in removed:
+            for v in corners[t]:
+                if not vert_tris[v]:
+                    group_verts[group[v]].discard(v)
+        tri_count -= len(removed)
+        max_error = max(max_error, error)
+
+        group_verts[src] = set()
+        group_pos[dst] = position
+        quadrics[dst] = [a + b for a, b in zip(quadrics[src], quadrics[dst])]
+        group_version[src] += 1
+        group_version[dst] += 1
+        for k in set(group[c] for v in group_verts[dst] for t in vert_tris[v] for c in corners[t]) - {dst}:
+            push(dst, k)
+
+    # compact the remaining vertices, keeping their order
+    kept = sorted(set(v for t, corner in enumerate(corners) if alive[t] for v in corner))
+    remap = dict((v, i) for i, v in enumerate(kept))
+    result_xml = Xml.Element('mesh')
+    result_xml.set('p', [x for v in kept for x in group_pos[group[v]]])
+    for key, values in streams.items():
+        if key == 'n':
+            result_xml.set(key, _normalize_vectors([values[v] for v in kept]))
+        elif key == 'ta':
+            # handedness was interpolated too, so snaps to the nearer of the collapsed vertices
+            tangents = _normalize_vectors([values[v][:3] for v in kept], (1.0, 0.0, 0.0))
+            handedness = [1.0 if values[v][3] >= 0.0 else -1.0 for v in kept]
+            result_xml.set(key, [x for i, w in enumerate(handedness) for x in tangents[i * 3:i * 3 + 3] + [w]])
+        else:
+            result_xml.set(key, [x for v in kept for x in values[v]])
+    result_xml.set('tri', [remap[v] for t, corner in enumerate(corners) if alive[t] for v in corner])
+
+    for child in mesh_xml:
+        if child.tag == 'aabb':
+            aabb_xml = Xml.SubElement(result_xml, 'aabb')
+            aabb_min, aabb_max = compute_aabb(result_xml.get('p'))
+            aabb_xml.set('min', aabb_min)
+            aabb_xml.set('max', aabb_max)
+        elif child.tag == 'skin' and skin is not None:
+            bones = child.get('bones')
+            influences = [(i, bone, weight) for i, v in enumerate(kept) for bone, weight in skin[v].items()]
+            ix, w, _ = pack_skin_weights(influences, range(len(kept)), bones[0] if bones else PDX_MAXSKININFS)
+            skin_xml = Xml.SubElement(result_xml, 'skin')
+            for key, value in child.items():
+                skin_xml.set(key, value)
+            skin_xml.set('ix', ix)
+            skin_xml.set('w', w)
+        else:
+            result_xml.append(_copy_element(child))
+
+    return result_xml, math.sqrt(max_error)
+
+
+def generate_lod(tree, ratio, attribute_weight=SIMPLIFY_ATTRIBUTE_WEIGHT, border_weight=SIMPLIFY_BORDER_WEIGHT):
+    """
+        Returns a copy of a mesh file tree with every mesh simplified to the given ratio of triangles, and an
+        OrderedDict of LodStats by mesh path. The relative error is a fraction of the mesh bounding sphere radius.
+    """
+    lod_tree = _copy_element(tree)
+    stats = OrderedDict()
+    object_xml = lod_tree.find('object')
+    for shape_xml in (object_xml if object_xml is not None else []):
+        mesh_index = 0
+        for index, child in enumerate(list(shape_xml)):
+            if child.tag != 'mesh':
+                continue
+            p = child.get('p') or []
+            lod_xml, error = simplify_mesh(child, ratio, attribute_weight, border_weight)
+            shape_xml[index] = lod_xml
+
+            radius = compute_bounding_sphere(p)[1]
+            stats['object/{}/mesh[{}]'.format(shape_xml.tag, mesh_index)] = LodStats(
+                len(child.get('tri') or []) // 3,
+                len(lod_xml.get('tri')) // 3,
+                len(lod_xml.get('p')) // 3,
+                error,
+                error / radius if radius else 0.0,
+            )
+            mesh_index += 1
+    return lod_tree, stats
+
+
+def add_lod_shapes(tree, lod_tree, level):
+    """
+        Adds the shapes of a generated LOD tree to a mesh file tree, named by their source shape with a '_lod' suffix.
+    """
+    object_xml = tree.find('object')
+    for shape_xml in list(lod_tree.find('object')):
+        lod_shape_xml = _copy_element(shape_xml)
+        lod_shape_xml.tag = '{}_lod{}'.format(shape_xml.tag, level)
+        object_xml.append(lod_shape_xml)
+
+
+""" ====================================================================================================================
+    Functions for generating convex collision meshes.
+========================================================================================================================
+"""
+
+
+CollisionStats = namedtuple('CollisionStats', ['source_vertices', 'pieces', 'vertices', 'triangles'])
+
+
+def _hull_plane(points, a, b, c):
+    """
+        Returns the unit normal and offset of the plane through three points, facing the side they wind anticlockwise.
+    """
+    (ax, ay, az), (bx, by, bz), (cx, cy, cz) = points[a], points[b], points[c]
+    ux, uy, uz = bx - ax, by - ay, bz - az
+    vx, vy, vz = cx - ax, cy - ay, cz - az
+    nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+    length = math.sqrt(nx * nx + ny * ny + nz * nz) or 1.0
+    nx, ny, nz = nx / length, ny / length, nz / length
+    return nx, ny, nz, nx * ax + ny * ay + nz * az
+
+
+def convex_hull(p, max_vertices=None):
+    """
+        Builds the convex hull of a flat list of positions by quickhull, adding the furthest outside point each step so
+        stopping at max_vertices gives the closest hull of that many points. Returns the hull positions and triangles
+        as flat lists, wound so their normals face outwards, or None if the points do not span a volume.
+    """
+    points = list(OrderedDict.fromkeys(tuple(pos) for pos in iter_vectors(p, 3)))
+    if len(points) < 4:
+        return None
+    extent = max(max(axis) - min(axis) for axis in zip(*points))
+    eps = extent * 1e-6
+    if not extent:
+        return None
+
+    def distance(plane, i):
+        x, y, z = points[i]
+        return plane[0] * x + plane[1] * y + plane[2] * z - plane[3]
+
+    # initial tetrahedron from the furthest pair of axis extremes, then the points furthest from their line and plane
+    extremes = set()
+    for axis in range(3):
+        extremes.add(min(range(len(points)), key=lambda i: points[i][axis]))
+        extremes.add(max(range(len(points)), key=lambda i: points[i][axis]))
+    a, b = max(
+        ((i, j) for i in extremes for j in extremes if i < j),
+        key=lambda pair: sum((u - v) ** 2 for u, v in zip(points[pair[0]], points[pair[1]]))
+    )
+    line = [v - u for u, v in zip(points[a], points[b])]
+
+    def line_distance(i):
+        offset = [v - u for u, v in zip(points[a], points[i])]
+        cross = (
+            line[1] * offset[2] - line[2] * offset[1],
+            line[2] * offset[0] - line[0] * offset[2],
+            line[0] * offset[1] - line[1] * offset[0],
+        )
+        return sum(v * v for v in cross)
+    c = max(range(len(points)), key=line_distance)
+    base = _hull_plane(points, a, b, c)
+    d = max(range(len(points)), key=lambda i: abs(distance(base, i)))
+    if abs(distance(base, d)) <= eps or line_distance(c) <= (eps * eps) * sum(v * v for v in line):
+        return None
+    if distance(base, d) > 0:
+        b, c = c, b
+
+    # faces by id as [a, b, c, plane, outside points, (distance, index) of the furthest outside point], with each
+    # directed edge mapped to the face it belongs to
+    faces = {}
+    edges = {}
+    next_id = [0]
+    # heap of faces with outside points, by the negated distance of their furthest point, deleted faces are skipped
+    heap = []
+
+    def add_face(i, j, k):
+        face_id = next_id[0]
+        next_id[0] += 1
+        faces[face_id] = [i, j, k, _hull_plane(points, i, j, k), [], (0.0, None)]
+        for edge in ((i, j), (j, k), (k, i)):
+            edges[edge] = face_id
+        return face_id
+
+    def assign(candidates, face_ids):
+        for i in candidates:
+            for face_id in face_ids:
+                face = faces[face_id]
+                dist = distance(face[3], i)
+                if dist > eps:
+                    face[4].append(i)
+                    if dist > face[5][0]:
+                        face[5] = (dist, i)
+                    break
+        for face_id in face_ids:
+            if faces[face_id][4]:
+                heapq.heappush(heap, (-faces[face_id][5][0], face_id))
+
+    initial = [add_face(a, b, c), add_face(a, c, d), add_face(a, d, b), add_face(b, d, c)]
+    assign([i for i in range(len(points)) if i not in (a, b, c, d)], initial)
+    vertex_count = 4
+
+    while max_vertices is None or vertex_count < max_vertices:
+        # the furthest outside point of any face is added next
+        while heap and heap[0][1] not in faces:
+            heapq.heappop(heap)
+        if not heap:
+            break
+        start = heapq.heappop(heap)[1]
+        eye = faces[start][5][1]
+
+        # flood the faces the point can see, the edges from them to faces it cannot see form the horizon
+        visible = set([start])
+        stack = [start]
+        horizon = []
+        while stack:
+            face = faces[stack.pop()]
+            for edge in ((face[0], face[1]), (face[1], face[2]), (face[2], face[0])):
+                neighbour = edges[(edge[1], edge[0])]
+                if neighbour in visible:
+                    continue
+                if distance(faces[neighbour][3], eye) > eps:
+                    visible.add(neighbour)
+                    stack.append(neighbour)
+                else:
+                    horizon.append(edge)
+
+        orphans = []
+        for face_id in visible:
+            face = faces.pop(face_id)
+            for edge in ((face[0], face[1]), (face[1], face[2]), (face[2], face[0])):
+                if edges.get(edge) == face_id:
+                    del edges[edge]
+            orphans.extend(i for i in face[4] if i != eye)
+        assign(orphans, [add_face(i, j, eye) for i, j in horizon])
+        vertex_count += 1
+
+    order = []
+    new_index = {}
+    tri = []
+    for face in faces.values():
+        for i in face[:3]:
+            if i not in new_index:
+                new_index[i] = len(order)
+                order.append(i)
+            tri.append(new_index[i])
+    return [float(v) for i in order for v in points[i]], tri
+
+
+def split_parts(p, tri):
+    """
+        Groups the triangles of a mesh by the parts they form, connected through vertices sharing a position.
+        Returns a list of flat triangle index lists, one per part.
+    """
+    parent = {}
+
+    def find(key):
+        while parent.setdefault(key, key) != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    keys = [tuple(pos) for pos in iter_vectors(p, 3)]
+    for t in range(len(tri) // 3):
+        a, b, c = (find(keys[v]) for v in tri[t * 3:t * 3 + 3])
+        parent[b] = a
+        parent[find(c)] = a
+    parts = OrderedDict()
+    for t in range(len(tri) // 3):
+        parts.setdefault(find(keys[tri[t * 3]]), []).extend(tri[t * 3:t * 3 + 3])
+    return list(parts.values())
+
+
+def generate_collision(tree, max_vertices=COLLISION_MAX_VERTICES, per_part=False, from_render=False):
+    """
+        Replaces the collision meshes of each shape in a mesh file tree, in place, with the convex hull of their
+        positions, or one hull per connected part, each of at most max_vertices. Shapes without collision meshes can
+        instead be given hulls of their unskinned meshes. Parts too flat to hold a volume are dropped, and collision
+        meshes are kept if no part holds one.
+        Returns an OrderedDict of CollisionStats by shape path.
+    """
+    stats = OrderedDict()
+    object_xml = tree.find('object')
+    for shape_xml in (object_xml if object_xml is not None else []):
+        meshes = shape_xml.findall('mesh')
+        sources = []
+        for mesh_xml in meshes:
+            material_xml = mesh_xml.find('material')
+            if material_xml is not None and (material_xml.get('shader') or [None])[0] == COLLISION_SHADER:
+                sources.append(mesh_xml)
+        replace = bool(sources)
+        material_xml = None
+        if replace:
+            material_xml = _copy_element(sources[0].find('material'))
+            index = list(shape_xml).index(sources[0])
+        elif from_render:
+            sources = [mesh_xml for mesh_xml in meshes if mesh_xml.find('skin') is None]
+            index = list(shape_xml).index(meshes[-1]) + 1 if meshes else 0
+        if not sources:
+            continue
+        if material_xml is None:
+            material_xml = Xml.Element('material')
+            material_xml.set('shader', [COLLISION_SHADER])
+
+        source = concatenate_meshes(sources)
+        p, tri = source.get('p') or [], source.get('tri') or []
+        parts = split_parts(p, tri) if per_part else [tri]
+        hulls = []
+        for part in parts:
+            hull = convex_hull(gather_vectors(p, 3, sorted(set(part))), max_vertices)
+            if hull is not None:
+                hulls.append(hull)
+
+        if replace and hulls:
+            for mesh_xml in sources:
+                shape_xml.remove(mesh_xml)
+        for hull_p, hull_tri in hulls:
+            hull_xml = Xml.Element('mesh')
+            hull_xml.set('p', hull_p)
+            hull_xml.set('tri', hull_tri)
+            aabb_xml = Xml.SubElement(hull_xml, 'aabb')
+            aabb_min, aabb_max = compute_aabb(hull_p)
+            aabb_xml.set('min', aabb_min)
+            aabb_xml.set('max', aabb_max)
+            hull_xml.append(_copy_element(material_xml))
+            shape_xml.insert(index, hull_xml)
+            index += 1
+        stats['object/{}'.format(shape_xml.tag)] = CollisionStats(
+            len(p) // 3, len(hulls), sum(len(hull_p) // 3 for hull_p, _ in hulls),
+            sum(len(hull_tri) // 3 for _, hull_tri in hulls),
+        )
+    return stats
+
+
+""" ====================================================================================================================
+    Functions for compressing animation data.
+========================================================================================================================
+"""
+
+
+def _constant_value(values, size, tolerance, is_rotation=False):
+    """
+        Returns the first sample of a channel's flat list of values over all frames, if every other sample is within
+        tolerance of it, else None. Rotations match when either sign of the quaternion does.
+    """
+    if not values:
+        return None
+    first = values[:size]
+    for frame in iter_vectors(values, size):
+        if is_rotation and sum(u * v for u, v in zip(first, frame)) < 0.0:
+            frame = [-v for v in frame]
+        if any(abs(u - v) > tolerance for u, v in zip(first, frame)):
+            return None
+    return first
+
+
+def strip_constant_channels(anim_xml, tolerance=ANIM_CONSTANT_TOLERANCE):
+    """
+        Finds the sampled channels of each bone in an .anim XML hierarchy which do not change over the animation,
+        in place stores their value as the bone's initial 's', 't' or 'q', removes them from its 'sa' and rewrites the
+        interleaved samples without them. Returns an OrderedDict of the removed channels by bone name.
+    """
+    info_xml = anim_xml.find('info')
+    samples_xml = anim_xml.find('samples')
+    framecount = info_xml.get('sa')[0]
+
+    bone_samples = dict(((bone_name, channel), values) for bone_name, channel, values in iter_anim_samples(anim_xml))
+    removed = OrderedDict()
+    for bone_xml in info_xml:
+        channels = bone_xml.get('sa')[0]
+        for channel in channels:
+            value = _constant_value(
+                bone_samples.get((bone_xml.tag, channel)), ANIM_CHANNELS[channel], tolerance, channel == 'q'
+            )
+            if value is not None:
+                bone_xml.set(channel, value)
+                removed[bone_xml.tag] = removed.get(bone_xml.tag, '') + channel
+        if bone_xml.tag in removed:
+            bone_xml.set('sa', [''.join(c for c in channels if c not in removed[bone_xml.tag])])
+    if not removed:
+        return removed
+
+    samples = interleave_anim_samples(info_xml, framecount, bone_samples)
+    for channel in ANIM_CHANNELS:
+        if channel in samples:
+            samples_xml.set(channel, samples[channel])
+        elif samples_xml.get(channel) is not None:
+            samples_xml.attrib.pop(channel)
+    return removed
+
+
+""" ====================================================================================================================
+    Functions for analysing how efficiently meshes render.
+========================================================================================================================
+"""
+
+
+MeshStats = namedtuple('MeshStats', ['triangles', 'vertices', 'acmr', 'atvr', 'fetch_efficiency', 'overdraw'])
+
+
+def analyze_vertex_cache(tri, cache_size=VERTEX_CACHE_SIZE, lru=False):
+    """
+        Simulates a FIFO (or LRU) post-transform vertex cache over a flat triangle index list, returning the average
+        cache miss ratio per triangle (ACMR) and the average transforms per used vertex (ATVR). Both are 0.0 for no
+        triangles, the best possible values approach 0.5 and 1.0 respectively.
+    """
+    if not tri:
+        return 0.0, 0.0
+    cache = []
+    cached = set()
+    misses = 0
+    for v in tri:
+        if v in cached:
+            if lru:
+                cache.remove(v)
+                cache.append(v)
+            continue
+        misses += 1
+        cache.append(v)
+        cached.add(v)
+        if len(cache) > cache_size:
+            cached.discard(cache.pop(0))
+    return misses / (len(tri) / 3.0), misses / float(len(set(tri)))
+
+
+def analyze_vertex_fetch(tri, vertex_size, cache_line=VERTEX_FETCH_LINE, cache_lines=VERTEX_FETCH_LINES):
+    """
+        Simulates fetching vertex data through a small LRU cache of memory lines, returning the ratio of the vertex
+        data used to the data loaded (1.0 when every loaded byte is used once).
+    """
+    if not tri or not vertex_size:
+        return 1.0
+    lines = OrderedDict()
+    loaded = 0
+    for v in tri:
+        for line in range(v * vertex_size // cache_line, ((v + 1) * vertex_size - 1) // cache_line + 1):
+            if line in lines:
+                del lines[line]
+            else:
+                loaded += cache_line
+                if len(lines) >= cache_lines:
+                    lines.popitem(last=False)
+            lines[line] = True
+    return len(set(tri)) * vertex_size / float(loaded)
+
+
+def analyze_overdraw(p, tri, resolution=OVERDRAW_RESOLUTION):
+    """
+        Estimates overdraw independently of the view, by rasterising front facing triangles in draw order with a depth
+        test along both directions of each axis. Returns the ratio of pixels shaded to pixels covered, averaged over the
+        six views (1.0 when no pixel is shaded twice).
+    """
+    if not tri:
+        return 1.0
+    positions = list(iter_vectors(p, 3))
+    aabb_min, aabb_max = compute_aabb(p)
+    shaded_total = covered_total = 0
+
+    for axis in range(3):
+        # cyclic axis order, so the projected triangle area is the normal along the view axis
+        u_axis, v_axis = (axis + 1) % 3, (axis + 2) % 3
+        extent = max(aabb_max[u_axis] - aabb_min[u_axis], aabb_max[v_axis] - aabb_min[v_axis]) or 1.0
+        scale = (resolution - 1) / extent
+        # project every vertex onto the pixel grid of this axis once
+        us = [(pos[u_axis] - aabb_min[u_axis]) * scale for pos in positions]
+        vs = [(pos[v_axis] - aabb_min[v_axis]) * scale for pos in positions]
+        ws = [pos[axis] for pos in positions]
+
+        for sign in (1.0, -1.0):
+            depth = dict()
+            shaded = 0
+            for a, b, c in iter_vectors(tri, 3):
+                ax, ay, bx, by, cx, cy = us[a], vs[a], us[b], vs[b], us[c], vs[c]
+                area = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+                if area * sign <= 0.0:
+                    continue  # back facing or edge on
+                if area < 0.0:
+                    # counter clockwise on the pixel grid, so the edge functions below are positive inside
+                    b, c = c, b
+                    bx, by, cx, cy = cx, cy, bx, by
+                    area = -area
+                # pixels exactly on an edge belong to one side of it only, so shared edges are not shaded twice
+                a_owns = (cy - by) > 0.0 or (cy == by and cx > bx)
+                b_owns = (ay - cy) > 0.0 or (ay == cy and ax > cx)
+                c_owns = (by - ay) > 0.0 or (by == ay and bx > ax)
+                # nearer pixels have a smaller depth
+                az, bz, cz = -sign * ws[a], -sign * ws[b], -sign * ws[c]
+                for y in range(int(math.ceil(min(ay, by, cy))), int(math.floor(max(ay, by, cy))) + 1):
+                    for x in range(int(math.ceil(min(ax, bx, cx))), int(math.floor(max(ax, bx, cx))) + 1):
+                        # edge functions of the pixel center
+                        ea = (cx - bx) * (y - by) - (cy - by) * (x - bx)
+                        eb = (ax - cx) * (y - cy) - (ay - cy) * (x - cx)
+                        ec = (bx - ax) * (y - ay) - (by - ay) * (x - ax)
+                        if ea < 0.0 or eb < 0.0 or ec < 0.0:
+                            continue
+                        if (ea == 0.0 and not a_owns) or (eb == 0.0 and not b_owns) or (ec == 0.0 and not c_owns):
+                            continue
+                        z = (ea * az + eb * bz + ec * cz) / area
+                        pixel = (x, y)
+                        if z <= depth.get(pixel, z):
+                            depth[pixel] = z
+                            shaded += 1
+            shaded_total += shaded
+            covered_total += len(depth)
+
+    return shaded_total / float(covered_total) if covered_total else 1.0
+
+
+def analyze_mesh(mesh_xml, cache_size=VERTEX_CACHE_SIZE, lru=False, overdraw=True):
+    """
+        Returns the MeshStats of a mesh element, the overdraw estimate is the slowest part and can be skipped.
+    """
+    p = mesh_xml.get('p') or []
+    tri = mesh_xml.get('tri') or []
+    acmr, atvr = analyze_vertex_cache(tri, cache_size, lru)
+    vertex_size = get_vertex_size(dict(mesh_xml.items()))
+    skin_xml = mesh_xml.find('skin')
+    if skin_xml is not None and skin_xml.get('ix'):
+        # 4 byte bone index and weight per influence
+        vertex_size += 8 * (skin_xml.get('bones') or [PDX_MAXSKININFS])[0]
+    return MeshStats(
+        len(tri) // 3,
+        len(p) // 3,
+        acmr,
+        atvr,
+        analyze_vertex_fetch(tri, vertex_size),
+        analyze_overdraw(p, tri) if overdraw else None,
+    )
+
+
+def analyze_files(path, cache_size=VERTEX_CACHE_SIZE, lru=False, overdraw=True):
+    """
+        Analyses a single .mesh file, or every .mesh file in a directory tree.
+        Returns a list of (filepath, mesh path, MeshStats) tuples, with mesh paths as in validation.
+    """
+    report = []
+    for filepath in iter_asset_files(path, ('.mesh',)):
+        tree = read_meshfile(filepath)
+        shapes = tree.find('object')
+        for shape_xml in (shapes if shapes is not None else []):
+            for i, mesh_xml in enumerate(shape_xml.findall('mesh')):
+                mesh_path = 'object/{}/mesh[{}]'.format(shape_xml.tag, i)
+                report.append((filepath, mesh_path, analyze_mesh(mesh_xml, cache_size, lru, overdraw)))
+    return report
+
+
+""" ====================================================================================================================
+    Functions for validating mesh and animation data.
+========================================================================================================================
+"""
+
+
+ValidationIssue = namedtuple('ValidationIssue', ['path', 'check', 'message'])
+
+
+def _validate_mesh(mesh_xml, path, bone_count, tolerance, issues):
+    def issue(check, message, *args):
+        issues.append(ValidationIssue(path, check, message.format(*args)))
+
+    p = mesh_xml.get('p') or []
+    tri = mesh_xml.get('tri') or []
+    if len(p) % 3:
+        issue('stream_length', "'p' length {} is not a multiple of 3", len(p))
+    vert_count = len(p) // 3
+
+    # vertex streams must all describe the same vertices
+    for key, size in MESH_STREAMS.items():
+        stream = mesh_xml.get(key)
+        if stream is None or key == 'tri':
+            continue
+        if len(stream) != vert_count * size:
+            issue(
+                'stream_length', "'{}' has {} values, expected {} for {} vertices",
+                key, len(stream), vert_count * size, vert_count,
+            )
+        non_finite = count_non_finite(stream)
+        if non_finite:
+            issue('non_finite', "'{}' has {} NaN or Inf values", key, non_finite)
+
+    # triangles
+    if len(tri) % 3:
+        issue('stream_length', "'tri' length {} is not a multiple of 3", len(tri))
+    if tri and (min(tri) < 0 or max(tri) >= vert_count):
+        bad = sum(1 for i in tri if i < 0 or i >= vert_count)
+        issue('tri_range', "'tri' has {} indices outside the range of {} vertices", bad, vert_count)
+    if vert_count > PDX_MAXVERTICES:
+        issue('vertex_count', "{} vertices is more than {} addressable by 16-bit indices", vert_count, PDX_MAXVERTICES)
+
+    # normals and tangents should be unit length, tangent handedness is +1 or -1
+    for key, size in [('n', 3), ('ta', 4)]:
+        stream = mesh_xml.get(key)
+        if stream and len(stream) == vert_count * size:
+            bad = sum(1 for length in vector_lengths(stream, size, 3) if abs(length - 1.0) > tolerance)
+            if bad:
+                issue('unit_length', "'{}' has {} vectors that are not unit length", key, bad)
+    ta = mesh_xml.get('ta')
+    if ta and len(ta) == vert_count * 4:
+        bad = sum(1 for w in ta[3::4] if abs(abs(w) - 1.0) > tolerance)
+        if bad:
+            issue('tangent_sign', "'ta' has {} tangents without a handedness of +1 or -1", bad)
+
+    # bounding box
+    aabb_xml = mesh_xml.find('aabb')
+    if aabb_xml is not None and p and len(p) % 3 == 0:
+        p_min, p_max = compute_aabb(p)
+        aabb_min, aabb_max = aabb_xml.get('min') or [], aabb_xml.get('max') or []
+        if len(aabb_min) != 3 or len(aabb_max) != 3:
+            issue('aabb', "'aabb' min and max must have 3 values")
+        elif any(abs(a - b) > tolerance for a, b in zip(p_min + p_max, aabb_min + aabb_max)):
+            issue('aabb', "'aabb' {} {} does not match vertex bounds {} {}", aabb_min, aabb_max, p_min, p_max)
+
+    # skinning
+    skin_xml = mesh_xml.find('skin')
+    if skin_xml is not None:
+        bones = (skin_xml.get('bones') or [0])[0]
+        ix, w = skin_xml.get('ix') or [], skin_xml.get('w') or []
+        if not 0 < bones <= PDX_MAXSKININFS:
+            issue('skin_bones', "'bones' influence count {} is not between 1 and {}", bones, PDX_MAXSKININFS)
+        stride = PDX_MAXSKININFS
+        if len(ix) != len(w) or len(ix) != vert_count * stride:
+            issue(
+                'stream_length', "skin 'ix' and 'w' have {} and {} values, expected {}",
+                len(ix), len(w), vert_count * stride,
+            )
+        else:
+            bad = count_non_finite(w)
+            if bad:
+                issue('non_finite', "skin 'w' has {} NaN or Inf values", bad)
+            if bone_count is None:
+                issue('skin_bones', "mesh is skinned but its shape has no skeleton")
+            elif ix and (min(ix) < -1 or max(ix) >= bone_count):
+                bad = sum(1 for i in ix if i < -1 or i >= bone_count)
+                issue('skin_index', "skin 'ix' has {} indices outside the range of {} bones", bad, bone_count)
+            weights = [w[i::stride] for i in range(stride)]
+            bad = sum(1 for vert in zip(*weights) if abs(sum(vert) - 1.0) > tolerance)
+            if bad:
+                issue('skin_weights', "{} vertices have skin weights that do not sum to 1", bad)
+            bad = sum(1 for vert in zip(*weights) if sum(1 for v in vert if v != 0.0) > bones)
+            if bad:
+                issue('skin_influences', "{} vertices have more than {} influences", bad, bones)
+            bad = sum(1 for i, v in zip(ix, w) if i == -1 and v != 0.0)
+            if bad:
+                issue('skin_index', "{} unused influences have non-zero weight", bad)
+
+
+def _validate_skeleton(skeleton_xml, path, tolerance, issues):
+    def issue(check, message, *args):
+        issues.append(ValidationIssue(path, check, message.format(*args)))
+
+    bone_count = len(skeleton_xml)
+    indices = [(bone.get('ix') or [-1])[0] for bone in skeleton_xml]
+    if sorted(indices) != list(range(bone_count)):
+        issue('bone_index', "bone 'ix' values {} are not unique indices from 0 to {}", indices, bone_count - 1)
+    # parents must be listed before their children, so every bone's ancestor chain ends at a root
+    seen = set()
+    for bone in skeleton_xml:
+        parent = bone.get('pa')
+        if parent is not None and not 0 <= parent[0] < bone_count:
+            issue('bone_parent', "bone '{}' parent index {} is out of range", bone.tag, parent[0])
+        elif parent is not None and parent[0] not in seen:
+            issue('bone_parent', "bone '{}' parent index {} is not listed before it", bone.tag, parent[0])
+        seen.add((bone.get('ix') or [-1])[0])
+        tx = bone.get('tx') or []
+        if len(tx) != 12:
+            issue('stream_length', "bone '{}' 'tx' has {} values, expected 12", bone.tag, len(tx))
+        elif count_non_finite(tx):
+            issue('non_finite', "bone '{}' 'tx' has NaN or Inf values", bone.tag)
+    return bone_count
+
+
+def _validate_anim(anim_xml, tolerance, issues):
+    def issue(path, check, message, *args):
+        issues.append(ValidationIssue(path, check, message.format(*args)))
+
+    info = anim_xml.find('info')
+    samples = anim_xml.find('samples')
+    framecount = (info.get('sa') or [0])[0]
+    if info.get('j') and info.get('j')[0] != len(info):
+        issue('info', 'bone_count', "'j' bone count {} does not match {} bones", info.get('j')[0], len(info))
+
+    for bone in info:
+        bone_path = 'info/{}'.format(bone.tag)
+        channels = (bone.get('sa') or [''])[0]
+        if set(channels) - set(ANIM_CHANNELS):
+            issue(bone_path, 'anim_channels', "'sa' {} has unknown channels", channels)
+        for key, size in ANIM_CHANNELS.items():
+            values = bone.get(key) or []
+            if len(values) != size:
+                issue(bone_path, 'stream_length', "'{}' has {} values, expected {}", key, len(values), size)
+            elif count_non_finite(values):
+                issue(bone_path, 'non_finite', "'{}' has NaN or Inf values", key)
+        q = bone.get('q') or []
+        if len(q) == 4 and abs(math.sqrt(sum(v * v for v in q)) - 1.0) > tolerance:
+            issue(bone_path, 'unit_length', "'q' is not a unit quaternion")
+
+    # samples are interleaved per frame, per animated bone, per channel
+    for key, size in ANIM_CHANNELS.items():
+        animated = sum(1 for bone in info if key in (bone.get('sa') or [''])[0])
+        values = (samples.get(key) if samples is not None else None) or []
+        expected = framecount * animated * size
+        if len(values) != expected:
+            issue('samples', 'sample_count', "'{}' has {} values, expected {} ({} frames * {} bones * {})",
+                  key, len(values), expected, framecount, animated, size)
+        else:
+            bad = count_non_finite(values)
+            if bad:
+                issue('samples', 'non_finite', "'{}' has {} NaN or Inf values", key, bad)
+            if key == 'q':
+                bad = sum(1 for length in vector_lengths(values, 4) if abs(length - 1.0) > tolerance)
+                if bad:
+                    issue('samples', 'unit_length', "'q' has {} samples that are not unit quaternions", bad)
+
+
+def validate(tree, tolerance=1e-3):
+    """
+        Checks a .mesh or .anim XML hierarchy for data which will break in game, returns a list of ValidationIssue.
+        Checks are done on whole streams at once, so whole directories of files can be validated quickly.
+    """
+    issues = []
+
+    # animation files
+    if tree.find('info') is not None:
+        _validate_anim(tree, tolerance, issues)
+        return issues
+
+    # mesh files
+    shapes = tree.find('object')
+    for shape_xml in (shapes if shapes is not None else []):
+        shape_path = 'object/{}'.format(shape_xml.tag)
+        bone_count = None
+        skeleton_xml = shape_xml.find('skeleton')
+        if skeleton_xml is not None:
+            bone_count = _validate_skeleton(skeleton_xml, shape_path + '/skeleton', tolerance, issues)
+        for i, mesh_xml in enumerate(shape_xml.findall('mesh')):
+            _validate_mesh(mesh_xml, '{}/mesh[{}]'.format(shape_path, i), bone_count, tolerance, issues)
+
+    locators = tree.find('locator')
+    for locator_xml in (locators if locators is not None else []):
+        locator_path = 'locator/{}'.format(locator_xml.tag)
+        for key, size in [('p', 3), ('q', 4)]:
+            values = locator_xml.get(key) or []
+            if len(values) != size:
+                issues.append(ValidationIssue(
+                    locator_path, 'stream_length', "'{}' has {} values, expected {}".format(key, len(values), size)
+                ))
+            elif count_non_finite(values):
+                issues.append(ValidationIssue(locator_path, 'non_finite', "'{}' has NaN or Inf values".format(key)))
+
+    return issues
+
+
+def validate_files(path, tolerance=1e-3):
+    """
+        Validates a single file, or every .mesh and .anim file in a directory tree.
+        Returns an ordered dictionary of {filepath: list of ValidationIssue}.
+        Files that fail to read have a single issue.
+    """
+    report = OrderedDict()
+    for filepath in iter_asset_files(path):
+        try:
+            report[filepath] = validate(read_meshfile(filepath), tolerance)
+        except Exception as err:
+            report[filepath] = [ValidationIssue('', 'read', "failed to read file. {}".format(err))]
+    return report
+
+
+""" ====================================================================================================================
+    Main.
+========================================================================================================================
+"""
+
+
+def cmd_dump(args):
+    dump_meshfile(args.file, max_values=args.max_values, summary=args.summary)
+
+
+def cmd_convert(args):
+    convert_meshfile(args.src, args.dst, to_text=(args.command == 'totext'))
+    print("[io_pdx_mesh] converted {} -> {}".format(args.src, args.dst))
+
+
+def cmd_togltf(args):
+    # convert a single file, or every .mesh file in a directory tree to a matching output tree
+    if os.path.isfile(args.src):
+        convert_to_gltf(args.src, args.dst, args.anim)
+        print("[io_pdx_mesh] converted {} -> {}".format(args.src, args.dst))
+        return
+    for mesh_filepath in iter_asset_files(args.src, ('.mesh',)):
+        relpath = os.path.relpath(os.path.splitext(mesh_filepath)[0], args.src)
+        gltf_filepath = os.path.join(args.dst, relpath + '.glb')
+        if not os.path.isdir(os.path.dirname(gltf_filepath)):
+            os.makedirs(os.path.dirname(gltf_filepath))
+        convert_to_gltf(mesh_filepath, gltf_filepath)
+        print("[io_pdx_mesh] converted {} -> {}".format(mesh_filepath, gltf_filepath))
+
+
+def cmd_fromgltf(args):
+    convert_from_gltf(args.src, args.dst, args.anim, args.index)
+    print("[io_pdx_mesh] converted {} -> {}".format(args.src, ', '.join(f for f in [args.dst, args.anim] if f)))
+
+
+def cmd_validate(args):
+    report = validate_files(args.path, args.tolerance)
+    failed = 0
+    for filepath, issues in report.items():
+        if issues:
+            failed += 1
+            print(filepath)
+            for issue in issues:
+                print("    [{}] {}: {}".format(issue.check, issue.path, issue.message))
+    print("[io_pdx_mesh] validated {} files, {} with issues".format(len(report), failed))
+    return 1 if failed else 0
+
+
+def cmd_tangents(args):
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        mesh_file = read_meshfile(mesh_filepath)
+        count = sum(regenerate_tangents(mesh_xml, args.uv_set) for mesh_xml in mesh_file.iter('mesh'))
+        write_meshfile(mesh_filepath, mesh_file)
+        print("[io_pdx_mesh] regenerated tangents of {} meshes in {}".format(count, mesh_filepath))
+
+
+def cmd_normals(args):
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        mesh_file = read_meshfile(mesh_filepath)
+        count = added = 0
+        for mesh_xml in mesh_file.iter('mesh'):
+            n = mesh_xml.get('n')
+            # keep any valid normals when only fixing missing or broken streams
+            if args.broken and n and len(n) == len(mesh_xml.get('p') or []) and not count_non_finite(n):
+                if min(vector_lengths(n) or [1.0]) > 0.5:
+                    continue
+            added += rebuild_normals(mesh_xml, args.weighting, args.angle)
+            count += 1
+        if count:
+            write_meshfile(mesh_filepath, mesh_file)
+        print("[io_pdx_mesh] rebuilt normals of {} meshes in {} ({} vertices added)".format(
+            count, mesh_filepath, added
+        ))
+
+
+def cmd_probe(args):
+    def format_vector(values):
+        return '({})'.format(', '.join('{:.4f}'.format(v) for v in values))
+
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        print(mesh_filepath)
+        for path, bounds in get_bounds(read_meshfile(mesh_filepath)).items():
+            print("    {}: aabb {} {} sphere {} {:.4f}".format(
+                path, format_vector(bounds.min), format_vector(bounds.max), format_vector(bounds.center), bounds.radius
+            ))
+
+
+def cmd_optimize(args):
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        mesh_file = read_meshfile(mesh_filepath)
+        meshes = list(mesh_file.iter('mesh'))
+        for mesh_xml in meshes:
+            optimize_mesh(mesh_xml, args.cache_size, args.overdraw)
+        write_meshfile(mesh_filepath, mesh_file)
+        print("[io_pdx_mesh] optimised {} meshes in {}".format(len(meshes), mesh_filepath))
+
+
+def cmd_split(args):
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        mesh_file = read_meshfile(mesh_filepath)
+        split = split_meshes(mesh_file, args.max_vertices)
+        if split:
+            write_meshfile(mesh_filepath, mesh_file)
+            print("[io_pdx_mesh] split {} meshes in {}".format(split, mesh_filepath))
+
+
+def cmd_palette(args):
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        mesh_file = read_meshfile(mesh_filepath)
+        added = partition_skeletons(mesh_file, args.max_bones)
+        if added:
+            write_meshfile(mesh_filepath, mesh_file)
+            print("[io_pdx_mesh] added {} shapes partitioning bones in {}".format(added, mesh_filepath))
+
+
+def cmd_prune(args):
+    keep = set(args.keep)
+    for anim_filepath in (iter_asset_files(args.anim, ('.anim',)) if args.anim else []):
+        keep.update(get_animated_bones(read_meshfile(anim_filepath)))
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        mesh_file = read_meshfile(mesh_filepath)
+        removed = prune_bones(mesh_file, keep=keep)
+        if removed:
+            write_meshfile(mesh_filepath, mesh_file)
+            print("[io_pdx_mesh] removed {} unused bones in {}".format(removed, mesh_filepath))
+
+
+def cmd_influences(args):
+    anim_xmls = [read_meshfile(filepath) for filepath in iter_asset_files(args.anim, ('.anim',))] if args.anim else []
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        mesh_file = read_meshfile(mesh_filepath)
+        errors = reduce_skin(mesh_file, args.max_influences, anim_xmls)
+        if not errors:
+            continue
+        write_meshfile(mesh_filepath, mesh_file)
+        print(mesh_filepath)
+        for path, error in errors.items():
+            print("    {}: {} vertices reduced, dropped weight {:.3f}, error max {:.5f} mean {:.5f}".format(
+                path, error.vertices, error.dropped_weight, error.max_error, error.mean_error
+            ))
+
+
+def cmd_strip(args):
+    shader_streams = load_shader_streams(args.engine)
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        mesh_file = read_meshfile(mesh_filepath)
+        size = os.path.getsize(mesh_filepath)
+        stripped, merged = strip_unused_streams(mesh_file, shader_streams)
+        if not stripped:
+            continue
+        write_meshfile(mesh_filepath, mesh_file)
+        print("[io_pdx_mesh] {}: stripped {} meshes, merged {} vertices, {} -> {} bytes".format(
+            mesh_filepath, stripped, merged, size, os.path.getsize(mesh_filepath)
+        ))
+
+
+def cmd_clean(args):
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        mesh_file = read_meshfile(mesh_filepath)
+        stats = clean_meshes(mesh_file, args.ratio)
+        if any(stats):
+            write_meshfile(mesh_filepath, mesh_file)
+            print("[io_pdx_mesh] {}: removed {} degenerate and {} duplicate triangles, {} vertices, {} meshes".format(
+                mesh_filepath, *stats
+            ))
+
+
+def cmd_collision(args):
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        mesh_file = read_meshfile(mesh_filepath)
+        stats = generate_collision(mesh_file, args.max_vertices, args.parts, args.from_render)
+        if not stats:
+            continue
+        write_meshfile(mesh_filepath, mesh_file)
+        print(mesh_filepath)
+        for path, shape_stats in stats.items():
+            print("    {}: {} source vertices -> {} pieces, {} vertices, {} triangles".format(path, *shape_stats))
+
+
+def cmd_channels(args):
+    for anim_filepath in iter_asset_files(args.path, ('.anim',)):
+        anim_file = read_meshfile(anim_filepath)
+        size = os.path.getsize(anim_filepath)
+        removed = strip_constant_channels(anim_file, args.tolerance)
+        if not removed:
+            continue
+        write_animfile(anim_filepath, anim_file)
+        print("[io_pdx_mesh] {}: removed {} constant channels from {} bones, {} -> {} bytes".format(
+            anim_filepath, sum(len(channels) for channels in removed.values()), len(removed), size,
+            os.path.getsize(anim_filepath)
+        ))
+
+
+def cmd_merge(args):
+    saved = 0
+    for mesh_filepath in iter_asset_files(args.path, ('.mesh',)):
+        mesh_file = read_meshfile(mesh_filepath)
+        before, after = merge_meshes(mesh_file, not args.within_shapes)
+        if after < before:
+            write_meshfile(mesh_filepath, mesh_file)
+        saved += before - after
+        print("[io_pdx_mesh] {}: {} -> {} meshes, saved {} draw calls".format(
+            mesh_filepath, before, after, before - after
+        ))
+    print("[io_pdx_mesh] saved {} draw calls in total".format(saved))
+
+
+def cmd_lod(args):
+    mesh_filepaths = [
+        filepath for filepath in iter_asset_files(args.path, ('.mesh',))
+        if not os.path.splitext(filepath)[0].rpartition('_lod')[2].isdigit()  # skip previously generated files
+    ]
+    for mesh_filepath in mesh_filepaths:
+        mesh_file = read_meshfile(mesh_filepath)
+        # every level is simplified from the source meshes, before any lod shapes are added
+        lods = [generate_lod(mesh_file, ratio, args.attribute_weight) for ratio in args.ratios]
+        for level, (lod_tree, stats) in enumerate(lods, 1):
+            for path, lod_stats in stats.items():
+                print("[io_pdx_mesh] lod{} {}: {} -> {} tris, {} verts, error {:.5f} ({:.2%})".format(
+                    level, path, lod_stats.source_triangles, lod_stats.triangles, lod_stats.vertices,
+                    lod_stats.error, lod_stats.relative_error
+                ))
+            if args.shapes:
+                add_lod_shapes(mesh_file, lod_tree, level)
+            else:
+                lod_filepath = '{}_lod{}.mesh'.format(os.path.splitext(mesh_filepath)[0], level)
+                write_meshfile(lod_filepath, lod_tree)
+                print("[io_pdx_mesh] wrote {}".format(lod_filepath))
+        if args.shapes:
+            write_meshfile(mesh_filepath, mesh_file)
+            print("[io_pdx_mesh] added {} lod shapes to {}".format(len(args.ratios), mesh_filepath))
+
+
+def cmd_analyze(args):
+    report = analyze_files(args.path, args.cache_size, args.lru, not args.no_overdraw)
+    report.sort(key=lambda row: getattr(row[2], args.sort) or 0.0, reverse=(args.sort != 'fetch_efficiency'))
+
+    columns = ('tris', 'verts', 'acmr', 'atvr', 'fetch', 'overdraw', 'mesh')
+    print("{:>8} {:>8} {:>6} {:>6} {:>6} {:>8}  {}".format(*columns))
+    for filepath, mesh_path, stats in report:
+        print("{:>8} {:>8} {:>6.3f} {:>6.3f} {:>6.3f} {:>8}  {}:{}".format(
+            stats.triangles, stats.vertices, stats.acmr, stats.atvr, stats.fetch_efficiency,
+            '-' if stats.overdraw is None else '{:.3f}'.format(stats.overdraw), filepath, mesh_path
+        ))
+
+    # fail when used as a check, eg in CI
+    if args.max_acmr is not None and any(stats.acmr > args.max_acmr for _, _, stats in report):
+        return 1
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='pdx_data', description="Paradox asset file tools.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    dump_parser = subparsers.add_parser('dump', help="print the structure and contents of a .mesh or .anim file")
+    dump_parser.add_argument('file')
+    dump_parser.add_argument('-m', '--max-values', type=int, default=None, help="truncate arrays to this many values")
+    dump_parser.add_argument('-s', '--summary', action='store_true', help="print min, max and mean of arrays")
+    dump_parser.set_defaults(func=cmd_dump)
+
+    convert_commands = [('totext', "convert a binary file to text"), ('tobinary', "convert a text file to binary")]
+    for command, help_text in convert_commands:
+        convert_parser = subparsers.add_parser(command, help=help_text)
+        convert_parser.add_argument('src')
+        convert_parser.add_argument('dst')
+        convert_parser.set_defaults(func=cmd_convert)
+
+    togltf_parser = subparsers.add_parser('togltf', help="convert a .mesh file, or directory of files, to glTF")
+    togltf_parser.add_argument('src')
+    togltf_parser.add_argument('dst', help="output .glb or .gltf file, or directory")
+    togltf_parser.add_argument('-a', '--anim', action='append', default=[], help="include an .anim file")
+    togltf_parser.set_defaults(func=cmd_togltf)
+
+    fromgltf_parser = subparsers.add_parser('fromgltf', help="convert a glTF file to .mesh and/or .anim")
+    fromgltf_parser.add_argument('src')
+    fromgltf_parser.add_argument('dst', nargs='?', default=None, help="output .mesh file")
+    fromgltf_parser.add_argument('-a', '--anim', default=None, help="output .anim file")
+    fromgltf_parser.add_argument('-i', '--index', type=int, default=0, help="animation index to convert")
+    fromgltf_parser.set_defaults(func=cmd_fromgltf)
+
+    validate_parser = subparsers.add_parser('validate', help="check a file, or directory of files, for broken data")
+    validate_parser.add_argument('path')
+    validate_parser.add_argument('-t', '--tolerance', type=float, default=1e-3)
+    validate_parser.set_defaults(func=cmd_validate)
+
+    tangents_parser = subparsers.add_parser('tangents', help="regenerate tangents of a .mesh file, or directory")
+    tangents_parser.add_argument('path')
+    tangents_parser.add_argument('-u', '--uv-set', default='u0', help="uv set to build tangents from")
+    tangents_parser.set_defaults(func=cmd_tangents)
+
+    normals_parser = subparsers.add_parser('normals', help="rebuild normals of a .mesh file, or directory")
+    normals_parser.add_argument('path')
+    normals_parser.add_argument('-w', '--weighting', choices=['area', 'angle'], default='area')
+    normals_parser.add_argument('-a', '--angle', type=float, default=None, help="smoothing angle, splits hard edges")
+    normals_parser.add_argument('-b', '--broken', action='store_true', help="only rebuild missing or broken normals")
+    normals_parser.set_defaults(func=cmd_normals)
+
+    probe_parser = subparsers.add_parser('probe', help="print the bounds of a .mesh file, or directory")
+    probe_parser.add_argument('path')
+    probe_parser.set_defaults(func=cmd_probe)
+
+    optimize_parser = subparsers.add_parser('optimize', help="optimise a .mesh file, or directory, for rendering")
+    optimize_parser.add_argument('path')
+    optimize_parser.add_argument('-c', '--cache-size', type=int, default=VERTEX_CACHE_SIZE)
+    optimize_parser.add_argument(
+        '-o', '--overdraw', type=float, nargs='?', const=OVERDRAW_THRESHOLD, default=None, metavar='THRESHOLD',
+        help="also order triangle clusters to reduce overdraw, splitting below this cluster ACMR"
+    )
+    optimize_parser.set_defaults(func=cmd_optimize)
+
+    split_parser = subparsers.add_parser(
+        'split', help="split meshes over a vertex budget in a .mesh file, or directory"
+    )
+    split_parser.add_argument('path')
+    split_parser.add_argument('-m', '--max-vertices', type=int, default=PDX_MAXVERTICES)
+    split_parser.set_defaults(func=cmd_split)
+
+    palette_parser = subparsers.add_parser(
+        'palette', help="partition skinned meshes over a bone limit in a .mesh file, or directory"
+    )
+    palette_parser.add_argument('path')
+    palette_parser.add_argument('-b', '--max-bones', type=int, default=PDX_MAXBONES)
+    palette_parser.set_defaults(func=cmd_palette)
+
+    prune_parser = subparsers.add_parser('prune', help="remove unused bones in a .mesh file, or directory")
+    prune_parser.add_argument('path')
+    prune_parser.add_argument('-k', '--keep', nargs='+', default=[], help="bone names to keep")
+    prune_parser.add_argument('-a', '--anim', help="keep bones animated in an .anim file, or directory")
+    prune_parser.set_defaults(func=cmd_prune)
+
+    influences_parser = subparsers.add_parser(
+        'influences', help="reduce skin influences per vertex in a .mesh file, or directory"
+    )
+    influences_parser.add_argument('path')
+    influences_parser.add_argument('-n', '--max-influences', type=int, default=2, choices=range(1, PDX_MAXSKININFS + 1))
+    influences_parser.add_argument('-a', '--anim', help="measure error over poses from an .anim file, or directory")
+    influences_parser.set_defaults(func=cmd_influences)
+
+    strip_parser = subparsers.add_parser(
+        'strip', help="remove vertex streams shaders do not read in a .mesh file, or directory"
+    )
+    strip_parser.add_argument('path')
+    strip_parser.add_argument('-e', '--engine', help="engine in the settings file, by default all engines")
+    strip_parser.set_defaults(func=cmd_strip)
+
+    clean_parser = subparsers.add_parser(
+        'clean', help="remove degenerate and duplicate triangles and unused vertices in a .mesh file, or directory"
+    )
+    clean_parser.add_argument('path')
+    clean_parser.add_argument(
+        '-r', '--ratio', type=float, default=DEGENERATE_RATIO, help="height to longest edge ratio of degenerates"
+    )
+    clean_parser.set_defaults(func=cmd_clean)
+
+    collision_parser = subparsers.add_parser(
+        'collision', help="replace collision meshes with convex hulls in a .mesh file, or directory"
+    )
+    collision_parser.add_argument('path')
+    collision_parser.add_argument('-v', '--max-vertices', type=int, default=COLLISION_MAX_VERTICES)
+    collision_parser.add_argument('-p', '--parts', action='store_true', help="build a hull per connected part")
+    collision_parser.add_argument(
+        '--from-render', action='store_true', help="build hulls of unskinned meshes in shapes without collision"
+    )
+    collision_parser.set_defaults(func=cmd_collision)
+
+    channels_parser = subparsers.add_parser(
+        'channels', help="remove animation channels which never change from an .anim file, or directory"
+    )
+    channels_parser.add_argument('path')
+    channels_parser.add_argument('-t', '--tolerance', type=float, default=ANIM_CONSTANT_TOLERANCE)
+    channels_parser.set_defaults(func=cmd_channels)
+
+    merge_parser = subparsers.add_parser(
+        'merge', help="merge static meshes sharing a material in a .mesh file, or directory"
+    )
+    merge_parser.add_argument('path')
+    merge_parser.add_argument('--within-shapes', action='store_true', help="only merge meshes within the same shape")
+    merge_parser.set_defaults(func=cmd_merge)
+
+    lod_parser = subparsers.add_parser('lod', help="generate simplified levels of detail of a .mesh file, or directory")
+    lod_parser.add_argument('path')
+    lod_parser.add_argument('-r', '--ratios', type=float, nargs='+', default=LOD_RATIOS, help="triangle ratio per lod")
+    lod_parser.add_argument('-a', '--attribute-weight', type=float, default=SIMPLIFY_ATTRIBUTE_WEIGHT)
+    lod_parser.add_argument('--shapes', action='store_true', help="add lods as shapes instead of separate files")
+    lod_parser.set_defaults(func=cmd_lod)
+
+    analyze_parser = subparsers.add_parser('analyze', help="report rendering efficiency of a .mesh file, or directory")
+    analyze_parser.add_argument('path')
+    analyze_parser.add_argument('-c', '--cache-size', type=int, default=VERTEX_CACHE_SIZE)
+    analyze_parser.add_argument('--lru', action='store_true', help="simulate an LRU instead of a FIFO vertex cache")
+    analyze_parser.add_argument('--no-overdraw', action='store_true', help="skip the slower overdraw estimate")
+    analyze_parser.add_argument('-s', '--sort', default='acmr', choices=MeshStats._fields)
+    analyze_parser.add_argument('--max-acmr', type=float, default=None, help="exit with an error above this ACMR")
+    analyze_parser.set_defaults(func=cmd_analyze)
+
+    # a bare file path is dumped, as before subcommands existed
+    if argv and argv[0] not in subparsers.choices and argv[0] not in ('-h', '--help'):
+        argv = ['dump'] + list(argv)
+
+    args = parser.parse_args(argv)
+    if not hasattr(args, 'func'):
+        parser.print_help()
+        return
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    """
+       When called from the command line we provide tools to inspect and convert .mesh or .anim files
+    """
+    sys.exit(main(sys.argv[1:]))
+
+
+"""
+General binary format is:
+    data description
+    data type
+    depth of data
+    data content
+
+
+.mesh text format
+========================================================================================================================
+    header    @@t@ on the first line, followed by one object or property per line
+    objects    written as in the binary format, '[' per level of depth then the object name
+    properties    !name type count, followed by lines of values (json quoted for strings), '#' lines are comments
 
 
 .mesh file format
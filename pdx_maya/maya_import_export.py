@@ -9,7 +9,7 @@
 
 import os
 import time
-from collections import OrderedDict, namedtuple
+from collections import OrderedDict
 
 try:
     import xml.etree.cElementTree as Xml
@@ -43,6 +43,8 @@ SPACE_MATRIX = MMatrix((
     (0, 0, -1, 0), 
     (0, 0, 0, 1) 
 )) 
+# the same conversion as SPACE_MATRIX, as the source axis and sign of each axis, used for flat data streams
+SPACE_AXES = ((0, 1), (1, 1), (2, -1))
 
 
 """ ====================================================================================================================
@@ -93,13 +95,6 @@ def connect_nodeplugs(source_mobject, source_mplug, dest_mobject, dest_mplug):
 """
 
 
-def util_round(data, ndigits=0):
-    """
-        Element-wise rounding to a given precision in decimal digits. (reimplementing pmc.util.round for speed)
-    """
-    return data.__class__(round(x, ndigits) for x in data)
-
-
 def clean_imported_name(name):
     # strip any namespace names, taking the final name only
     clean_name = name.split(':')[-1]
@@ -182,11 +177,12 @@ def get_material_textures(maya_material):
     return texture_dict
 
 
-def get_mesh_info(maya_mesh, skip_merge_vertices=False, round_data=False):
+def get_mesh_info(maya_mesh, skip_merge_vertices=False, round_data=False, weld_nearby=False):
     """
         Returns a dictionary of mesh information neccessary to the exporter.
         By default this merges vertices across triangles where normal and UV data is shared, otherwise each tri-vert is
-        exported separately!
+        exported separately! Optionally vertices which are only different within a small tolerance are also merged.
+        Also returns the source vertex id and the packed skin (or None) of the unique verts.
     """
     start = time.time()
     # get references to MeshFace and Mesh types
@@ -199,10 +195,6 @@ def get_mesh_info(maya_mesh, skip_merge_vertices=False, round_data=False):
     else:
         raise NotImplementedError("Unsupported mesh type encountered. {}".format(type(maya_mesh)))
 
-    # we will need to test vertices for equality based on their attributes
-    # critically: whether per-face vertices (sharing an object-relative vert id) share normals and uvs
-    UniqueVertex = namedtuple('UniqueVertex', ['id', 'p', 'n', 'uv'])
-
     # API mesh function set
     mesh_obj = get_MObject(mesh.name())
     mFn_Mesh = OpenMaya.MFnMesh(mesh_obj)
@@ -216,14 +208,10 @@ def get_mesh_info(maya_mesh, skip_merge_vertices=False, round_data=False):
     for i, uv_set in enumerate(uv_setnames):
         _u, _v = mesh.getUVs(uvSet=uv_set)
         uv_coords[i] = zip(_u, _v)
-    if uv_setnames:
-        tangents = mesh.getTangents(space='world', uvSet=uv_setnames[0])
 
-    # build a blank dictionary of mesh information for the exporter
-    mesh_dict = {x: [] for x in ['p', 'n', 'ta', 'u0', 'u1', 'u2', 'u3', 'tri', 'min', 'max']}
-
-    # collect all unique verts in the order that we process them
-    unique_verts = []
+    # build a blank dictionary of tri-vertex information, these are merged into unique verts afterwards
+    tri_vert_dict = {x: [] for x in ['p', 'n', 'u0', 'u1', 'u2', 'u3']}
+    tri_vert_id_list = []
 
     for face in meshfaces:
         face_vert_ids = face.getVertices()  # vertices making this face
@@ -233,87 +221,84 @@ def get_mesh_info(maya_mesh, skip_merge_vertices=False, round_data=False):
         for tri in xrange(0, num_triangles):
             tri_vert_ids = mesh.getPolygonTriangleVertices(face.index(), tri)  # vertices making this triangle
 
-            dict_vert_idx = []
-
             # loop over tri verts
             for vert_id in tri_vert_ids:
                 _local_id = face_vert_ids.index(vert_id)  # face relative vertex index
+                tri_vert_id_list.append(vert_id)
 
                 # position
-                _position = vertices[vert_id]
-                _position = swap_coord_space(_position)  # convert to Game space
-                if round_data:
-                    _position = util_round(list(_position), PDX_DECIMALPTS)
+                tri_vert_dict['p'].extend(list(vertices[vert_id])[:3])
 
                 # normal
                 vert_norm_id = face.normalIndex(_local_id)
-                _normal = list(normals[vert_norm_id])
-                _normal = swap_coord_space(_normal)  # convert to Game space
-                if round_data:
-                    _normal = util_round(list(_normal), PDX_DECIMALPTS)
+                tri_vert_dict['n'].extend(list(normals[vert_norm_id]))
 
                 # uv
-                _uv_coords = {}
                 for i, uv_set in enumerate(uv_setnames):
                     try:
                         vert_uv_id = face.getUVIndex(_local_id, uv_set)
                         uv = uv_coords[i][vert_uv_id]
-                        uv = swap_coord_space(uv)  # convert to Game space
-                        if round_data:
-                            uv = util_round(list(uv), PDX_DECIMALPTS)
                     # case where verts are unmapped, eg when two meshes are merged with different UV set counts
                     except RuntimeError:
-                        uv = (0.0, 0.0)
-                    _uv_coords[i] = uv
-
-                # tangent (omitted if there were no UVs)
-                if uv_setnames and tangents:
-                    vert_tangent_id = mesh.getTangentId(face.index(), vert_id)
-                    _tangent = list(tangents[vert_tangent_id])
-                    _tangent = swap_coord_space(_tangent)  # convert to Game space
-                    if round_data:
-                        _tangent = util_round(list(_tangent), PDX_DECIMALPTS)
-
-                # check if this tri vert is new and unique, or can just reference an existing vertex
-                new_vert = UniqueVertex(vert_id, _position, _normal, _uv_coords)
-                # test if we have already stored this vertex
-                try:
-                    # no data needs to be added to the dict, the tri can just reference an existing vertex
-                    i = unique_verts.index(new_vert)
-                except ValueError:
-                    i = None
-                if i is None or skip_merge_vertices:
-                    # new unique vertex, collect it and add the vert data to the dict
-                    unique_verts.append(new_vert)
-                    mesh_dict['p'].extend(_position)
-                    mesh_dict['n'].extend(_normal)
-                    for i, uv_set in enumerate(uv_setnames):
-                        mesh_dict['u' + str(i)].extend(_uv_coords[i])
-                    if uv_setnames:
-                        mesh_dict['ta'].extend(_tangent)
-                        mesh_dict['ta'].append(1.0)
-                    i = len(unique_verts) - 1  # the tri will reference the last added vertex
-
-                # store the tri vert reference
-                dict_vert_idx.append(i)
-
-            # tri-faces
-            mesh_dict['tri'].extend(
-                [dict_vert_idx[0], dict_vert_idx[2], dict_vert_idx[1]]  # convert handedness to Game space
-            )
+                        uv = (0.0, 1.0)  # flipped to (0.0, 0.0) in Game space
+                    tri_vert_dict['u' + str(i)].extend(uv)
+
+    # convert each stream to Game space in a single pass
+    tri_vert_dict['p'] = pdx_data.convert_vectors(tri_vert_dict['p'], SPACE_AXES)
+    tri_vert_dict['n'] = pdx_data.convert_vectors(tri_vert_dict['n'], SPACE_AXES)
+    for i in xrange(len(uv_setnames)):
+        tri_vert_dict['u' + str(i)] = pdx_data.flip_uvs(tri_vert_dict['u' + str(i)])
+
+    # quantise all streams together before merging, so verts which only differ by float noise also merge
+    if round_data:
+        tri_vert_dict, rounded = pdx_data.quantize_streams(tri_vert_dict, PDX_DECIMALPTS, tri_vert_id_list)
+        print "[io_pdx_mesh] rounding merged {} vertices".format(rounded)
+
+    # merge tri-verts which share a vertex id, position, normal and uvs into unique verts
+    # critically: whether per-face vertices (sharing an object-relative vert id) share normals and uvs
+    mesh_dict, tri_vert_remap, vert_id_list = pdx_data.weld_vertices(
+        tri_vert_dict, vertex_ids=tri_vert_id_list, skip_merge=skip_merge_vertices
+    )
+
+    # pack the skin once, it is gathered again by vertex id as vertices are merged or split below
+    skin_info_dict = get_mesh_skin_info(maya_mesh.node(), vert_id_list)
+    skin_indices = dict((vert_id, i) for i, vert_id in enumerate(vert_id_list))
+
+    # optionally merge unique verts which only differ by float noise, eg from transforming to world space
+    if weld_nearby and not skip_merge_vertices:
+        vert_count = len(vert_id_list)
+        # vertices with different skin weights must stay separate, as the skin is gathered by the kept vertex ids
+        skin = (skin_info_dict['ix'], skin_info_dict['w']) if skin_info_dict else None
+        mesh_dict, nearby_remap, vert_id_list = pdx_data.weld_nearby_vertices(
+            mesh_dict, vertex_ids=vert_id_list, skin=skin
+        )
+        tri_vert_remap = [nearby_remap[i] for i in tri_vert_remap]
+        saved = vert_count - len(vert_id_list)
+        print "[io_pdx_mesh] welded {} nearby vertices ({} bytes saved)".format(
+            saved, saved * pdx_data.get_vertex_size(mesh_dict)
+        )
+
+    # tri-faces
+    mesh_dict['tri'] = pdx_data.flip_winding(tri_vert_remap)  # convert handedness to Game space
+
+    # tangents, with handedness for mirrored uvs (omitted if there were no UVs)
+    mesh_dict['ta'] = []
+    if mesh_dict['u0']:
+        # vertices shared by mirrored and unmirrored triangles are split, so each side of a seam has its handedness
+        mesh_dict, vert_order = pdx_data.split_mirrored_vertices(mesh_dict)
+        vert_id_list = [vert_id_list[i] for i in vert_order]  # so skin data is gathered for the split vertices
+        mesh_dict['ta'] = pdx_data.generate_tangents(mesh_dict['p'], mesh_dict['n'], mesh_dict['u0'], mesh_dict['tri'])
+        if round_data:
+            mesh_dict['ta'] = pdx_data.quantize_values(mesh_dict['ta'], PDX_DECIMALPTS)
 
     # calculate min and max bounds of mesh
-    x_VtxPos = set([mesh_dict['p'][i] for i in xrange(0, len(mesh_dict['p']), 3)])
-    y_VtxPos = set([mesh_dict['p'][i + 1] for i in xrange(0, len(mesh_dict['p']), 3)])
-    z_VtxPos = set([mesh_dict['p'][i + 2] for i in xrange(0, len(mesh_dict['p']), 3)])
-    mesh_dict['min'] = [min(x_VtxPos), min(y_VtxPos), min(z_VtxPos)]
-    mesh_dict['max'] = [max(x_VtxPos), max(y_VtxPos), max(z_VtxPos)]
+    mesh_dict['min'], mesh_dict['max'] = pdx_data.compute_aabb(mesh_dict['p'])
 
-    # create an ordered list of vertex ids that we have gathered into the mesh dict
-    vert_id_list = [vert.id for vert in unique_verts]
+    if skin_info_dict:
+        skin_info_dict = pdx_data.gather_skin(skin_info_dict, [skin_indices[vert_id] for vert_id in vert_id_list])
 
     print "[debug] {} ({})".format(mesh.name(), time.time() - start)
-    return mesh_dict, vert_id_list
+    return mesh_dict, vert_id_list, skin_info_dict
 
 
 def get_mesh_skin_info(maya_mesh, vertex_ids=None):
@@ -328,36 +313,25 @@ def get_mesh_skin_info(maya_mesh, vertex_ids=None):
     skin_dict = {x: [] for x in ['bones', 'ix', 'w']}
 
     # set number of joint influences per vert
-    skin_dict['bones'].append(skin.getMaximumInfluences())
+    skin_dict['bones'].append(min(skin.getMaximumInfluences(), PDX_MAXSKININFS))
 
-    # find influence bones
-    # TODO: skip bone if it has the PDX_IGNOREJOINT attribute
+    # find influence bones, weights on ignored bones are moved to a parent when the skeleton is pruned
     bones = skin.getInfluence()
 
     # parse all verts in order if we didn't supply a subset of vert ids
     if vertex_ids is None:
         vertex_ids = range(len(maya_mesh.verts))
 
-    # iterate over influences to find weights, per vertex
-    vert_weights = {v: {} for v in vertex_ids}
+    # gather sparse influences, per bone
+    influences = []
     for bone_index in xrange(len(bones)):
-        # TODO: skip bone if it has the PDX_IGNOREJOINT attribute
-        vert_id = 0
-        for weight in skin.getWeights(maya_mesh, influenceIndex=bone_index):
-            # store any non-zero weights, by influence, per vertex
-            if weight != 0.0:
-                vert_weights[vert_id][bone_index] = weight
-            vert_id += 1
-
-    # collect data from the weights dict into the skin dict
-    for vtx in vertex_ids:
-        for influence, weight in vert_weights[vtx].iteritems():
-            skin_dict['ix'].append(influence)
-            skin_dict['w'].append(weight)
-        if len(vert_weights[vtx]) < PDX_MAXSKININFS:  # pad out with null data to fill container
-            padding = PDX_MAXSKININFS - len(vert_weights[vtx])
-            skin_dict['ix'].extend([-1] * padding)
-            skin_dict['w'].extend([0.0] * padding)
+        weights = skin.getWeights(maya_mesh, influenceIndex=bone_index)
+        influences.extend((vert_id, bone_index, weight) for vert_id, weight in enumerate(weights) if weight != 0.0)
+
+    # pack the strongest influences per vertex into the skin dict
+    skin_dict['ix'], skin_dict['w'], issues = pdx_data.pack_skin_weights(influences, vertex_ids)
+    for issue in issues:
+        print "[io_pdx_mesh] {}".format(issue.message)
 
     return skin_dict
 
@@ -375,7 +349,10 @@ def get_mesh_skeleton_info(maya_mesh):
     # build a list of bone information dictionaries for the exporter
     bone_list = [{'name': x.name()} for x in bones]
     for i, bone in enumerate(bones):
-        # TODO: skip bone if it has the PDX_IGNOREJOINT attribute
+        # bones marked to be ignored are exported, then removed when the skeleton is pruned
+        if bone.hasAttr(PDX_IGNOREJOINT) and getattr(bone, PDX_IGNOREJOINT).get():
+            bone_list[i]['ignore'] = True
+
         # bone index
         bone_list[i]['ix'] = [i]
 
@@ -384,12 +361,13 @@ def get_mesh_skeleton_info(maya_mesh):
             bone_list[i]['pa'] = [bones.index(bone.getParent())]
 
         # bone inverse world-space transform
-        mat = list(swap_coord_space(bone.getMatrix(worldSpace=True)).inverse())
-        bone_list[i]['tx'] = []
-        bone_list[i]['tx'].extend(mat[0:3])
-        bone_list[i]['tx'].extend(mat[4:7])
-        bone_list[i]['tx'].extend(mat[8:11])
-        bone_list[i]['tx'].extend(mat[12:15])
+        mat = list(MMatrix(bone.getMatrix(worldSpace=True)).inverse())
+        bone_list[i]['tx'] = mat[0:3] + mat[4:7] + mat[8:11] + mat[12:15]
+
+    # convert all bone transforms to Game space in a single pass
+    bone_tx = pdx_data.convert_transforms([v for bone in bone_list for v in bone['tx']], SPACE_AXES)
+    for i, bone in enumerate(bone_list):
+        bone['tx'] = bone_tx[i * 12 : (i + 1) * 12]
 
     return bone_list
 
@@ -687,8 +665,7 @@ def create_mesh(PDX_mesh, name=None):
     # vertices
     numVertices = 0
     vertexArray = OpenMaya.MFloatPointArray()  # array of points
-    for i in xrange(0, len(verts), 3):
-        _verts = swap_coord_space([verts[i], verts[i + 1], verts[i + 2]])  # convert coords to Maya space
+    for _verts in pdx_data.iter_vectors(pdx_data.convert_vectors(verts, SPACE_AXES), 3):  # convert coords to Maya space
         v = OpenMaya.MFloatPoint(_verts[0], _verts[1], _verts[2])
         vertexArray.append(v)
         numVertices += 1
@@ -700,20 +677,19 @@ def create_mesh(PDX_mesh, name=None):
         polygonCounts.append(3)
 
     # vert connections
+    tris = pdx_data.flip_winding(tris)  # convert handedness to Maya space
     polygonConnects = OpenMaya.MIntArray()
-    for i in range(0, len(tris), 3):
-        polygonConnects.append(tris[i + 2])  # convert handedness to Maya space
-        polygonConnects.append(tris[i + 1])
-        polygonConnects.append(tris[i])
+    for i in tris:
+        polygonConnects.append(i)
 
     # default UVs
     uArray = OpenMaya.MFloatArray()
     vArray = OpenMaya.MFloatArray()
     if uv_Ch.get(0):
-        uv_data = uv_Ch[0]
+        uv_data = pdx_data.flip_uvs(uv_Ch[0])  # flip the UV coords in V!
         for i in xrange(0, len(uv_data), 2):
             uArray.append(uv_data[i])
-            vArray.append(1 - uv_data[i + 1])  # flip the UV coords in V!
+            vArray.append(uv_data[i + 1])
 
     """ ================================================================================================================
         create the new mesh """
@@ -733,8 +709,7 @@ def create_mesh(PDX_mesh, name=None):
     # apply the vertex normal data
     if norms:
         normalsIn = OpenMaya.MVectorArray()  # array of vectors
-        for i in xrange(0, len(norms), 3):
-            _norms = swap_coord_space([norms[i], norms[i + 1], norms[i + 2]])  # convert vector to Maya space
+        for _norms in pdx_data.iter_vectors(pdx_data.convert_vectors(norms, SPACE_AXES), 3):  # convert to Maya space
             n = OpenMaya.MVector(_norms[0], _norms[1], _norms[2])
             normalsIn.append(n)
         vertexList = OpenMaya.MIntArray()  # matches normal to vert by index
@@ -746,11 +721,9 @@ def create_mesh(PDX_mesh, name=None):
     uvCounts = OpenMaya.MIntArray()
     for i in range(0, numPolygons):
         uvCounts.append(3)
-    uvIds = OpenMaya.MIntArray()
-    for i in range(0, len(tris), 3):
-        uvIds.append(tris[i + 2])  # convert handedness to Maya space
-        uvIds.append(tris[i + 1])
-        uvIds.append(tris[i])
+    uvIds = OpenMaya.MIntArray()  # matches the converted handedness of the vert connections
+    for i in tris:
+        uvIds.append(i)
 
     # note we don't call setUVs before assignUVs for the default UV set, this was done during creation!
     if uv_Ch.get(0):
@@ -765,9 +738,10 @@ def create_mesh(PDX_mesh, name=None):
 
             uArray = OpenMaya.MFloatArray()
             vArray = OpenMaya.MFloatArray()
+            uv_data = pdx_data.flip_uvs(uv_data)  # flip the UV coords in V!
             for i in xrange(0, len(uv_data), 2):
                 uArray.append(uv_data[i])
-                vArray.append(1 - uv_data[i + 1])  # flip the UV coords in V!
+                vArray.append(uv_data[i + 1])
 
             mFn_Mesh.createUVSetWithName(uvSetName)
             mFn_Mesh.setUVs(uArray, vArray, uvSetName)
@@ -861,8 +835,8 @@ def create_anim_keys(joint_name, key_dict, timestart):
         z_rot_data = OpenMaya.MDoubleArray()
 
         for quat_data in key_dict['q']:
-            # convert to Game space
-            q = swap_coord_space(MQuaternion(*quat_data))
+            # already converted to Maya space
+            q = MQuaternion(*quat_data)
             # convert from quaternion to euler, this gives values in radians (which Maya uses internally)
             euler_data = q.asEulerRotation()
             x_rot_data.append(euler_data.x)
@@ -888,8 +862,8 @@ def create_anim_keys(joint_name, key_dict, timestart):
         z_trans_data = OpenMaya.MDoubleArray()
 
         for trans_data in key_dict['t']:
-            # convert to Game space
-            t = swap_coord_space(MVector(*trans_data))
+            # already converted to Maya space
+            t = trans_data
             x_trans_data.append(t[0])
             y_trans_data.append(t[1])
             z_trans_data.append(t[2])
@@ -991,7 +965,11 @@ def import_meshfile(meshpath, imp_mesh=True, imp_skel=True, imp_locs=True, progr
         progress.finished()
 
 
-def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge_verts=True, progress_fn=None):
+def export_meshfile(
+    meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge_verts=True, weld_verts=False, optimize_mesh=False,
+    optimize_overdraw=False, merge_objects=False, split_bones=False, prune_bones=False, shader_streams=None,
+    progress_fn=None
+):
     start = time.time()
     print "[io_pdx_mesh] exporting {}".format(meshpath)
 
@@ -1007,6 +985,7 @@ def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge
     object_xml = Xml.SubElement(root_xml, 'object')
 
     # populate object data
+    ignored_bones = set()
     maya_meshes = [mesh for mesh in pmc.ls(shapes=True) if type(mesh) == pmc.nt.Mesh and check_mesh_material(mesh)]
     for shape in maya_meshes:
         print "[io_pdx_mesh] writing node - {}".format(shape.name())
@@ -1036,7 +1015,21 @@ def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge
                 mesh = [m for m in group.members(flatten=True) if m.node() == shape][0]
 
                 # get all necessary info about this set of faces and determine which unique verts they include
-                mesh_info_dict, vert_ids = get_mesh_info(mesh, not merge_verts, True)
+                mesh_info_dict, vert_ids, skin_info_dict = get_mesh_info(mesh, not merge_verts, True, weld_verts)
+
+                # optionally reorder triangles for reuse of transformed vertices on the GPU, then vertices to match
+                if optimize_mesh or optimize_overdraw:
+                    if optimize_overdraw:
+                        # clusters of triangles likely to occlude others draw first, at some cost to cache reuse
+                        tri = pdx_data.optimize_overdraw(mesh_info_dict['p'], mesh_info_dict['tri'])
+                    else:
+                        tri = pdx_data.optimize_vertex_cache(mesh_info_dict['tri'])
+                    tri, vert_order = pdx_data.optimize_vertex_fetch(tri, len(vert_ids))
+                    mesh_info_dict = pdx_data.reorder_streams(mesh_info_dict, vert_order)
+                    mesh_info_dict['tri'] = tri
+                    vert_ids = [vert_ids[i] for i in vert_order]
+                    if skin_info_dict:
+                        skin_info_dict = pdx_data.gather_skin(skin_info_dict, vert_order)
 
                 # populate mesh attributes
                 for key in ['p', 'n', 'ta', 'u0', 'u1', 'u2', 'u3', 'tri']:
@@ -1061,7 +1054,6 @@ def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge
                     materialnode_xml.set(slot, [os.path.split(texture)[1]])
 
                 # create parent element for skin data, if the mesh is skinned
-                skin_info_dict = get_mesh_skin_info(shape, vert_ids)
                 if exp_skel and skin_info_dict:
                     print "[io_pdx_mesh] writing skinning data -"
                     if progress_fn:
@@ -1085,6 +1077,8 @@ def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge
                 for key in ['ix', 'pa', 'tx']:
                     if key in bone_info_dict and bone_info_dict[key]:
                         bonenode_xml.set(key, bone_info_dict[key])
+                if bone_info_dict.get('ignore'):
+                    ignored_bones.add(bone_info_dict['name'])
 
     # create root element for locators
     locator_xml = Xml.SubElement(root_xml, 'locator')
@@ -1102,6 +1096,36 @@ def export_meshfile(meshpath, exp_mesh=True, exp_skel=True, exp_locs=True, merge
             if loc.getParent():
                 locnode_xml.set('pa', [loc.getParent().name()])
 
+    # remove degenerate and duplicate triangles, and any vertices left unused
+    stats = pdx_data.clean_meshes(root_xml)
+    if any(stats):
+        print "[io_pdx_mesh] removed {} degenerate and {} duplicate triangles, {} vertices, {} meshes".format(*stats)
+
+    # drop vertex streams which the assigned shaders never read
+    if shader_streams:
+        stripped, merged = pdx_data.strip_unused_streams(root_xml, shader_streams)
+        print "[io_pdx_mesh] stripped unused streams from {} meshes, merged {} vertices".format(stripped, merged)
+
+    # optionally combine static meshes sharing a material, so they draw in a single call
+    if merge_objects:
+        before, after = pdx_data.merge_meshes(root_xml)
+        print "[io_pdx_mesh] merged meshes sharing materials, saved {} draw calls".format(before - after)
+
+    # remove ignored bones, and optionally bones without weights which no locator references
+    removed = pdx_data.prune_bones(root_xml, ignored_bones, prune_unused=prune_bones)
+    if removed:
+        print "[io_pdx_mesh] removed {} bones from skeletons".format(removed)
+
+    # optionally partition skinned meshes so each draw uses no more bones than skinned shaders support
+    if split_bones:
+        added = pdx_data.partition_skeletons(root_xml)
+        print "[io_pdx_mesh] added {} shapes to keep within {} bones".format(added, pdx_data.PDX_MAXBONES)
+
+    # split any mesh over the 16-bit index budget, as larger meshes break on some engine paths
+    split = pdx_data.split_meshes(root_xml)
+    if split:
+        print "[io_pdx_mesh] split {} meshes over {} vertices".format(split, pdx_data.PDX_MAXVERTICES)
+
     # write the binary file from our XML structure
     pdx_data.write_meshfile(meshpath, root_xml)
 
@@ -1200,6 +1224,13 @@ def import_animfile(animpath, timestart=1.0, progress_fn=None):
         for sample_type in bone.attrib['sa'][0]:
             key_data[sample_type] = []
 
+    # convert the sample streams to Maya space in a single pass each
+    sample_data = {
+        's': samples.attrib.get('s', []),
+        'q': pdx_data.convert_quaternions(samples.attrib.get('q', []), SPACE_AXES),
+        't': pdx_data.convert_vectors(samples.attrib.get('t', []), SPACE_AXES),
+    }
+
     # then traverse the samples data to store keys per bone
     s_index, q_index, t_index = 0, 0, 0
     for f in range(0, framecount):
@@ -1207,13 +1238,13 @@ def import_animfile(animpath, timestart=1.0, progress_fn=None):
             bone_key_data = all_bone_keyframes[bone_name]
 
             if 's' in bone_key_data:
-                bone_key_data['s'].append(samples.attrib['s'][s_index : s_index + 1])
+                bone_key_data['s'].append(sample_data['s'][s_index : s_index + 1])
                 s_index += 1
             if 'q' in bone_key_data:
-                bone_key_data['q'].append(samples.attrib['q'][q_index : q_index + 4])
+                bone_key_data['q'].append(sample_data['q'][q_index : q_index + 4])
                 q_index += 4
             if 't' in bone_key_data:
-                bone_key_data['t'].append(samples.attrib['t'][t_index : t_index + 3])
+                bone_key_data['t'].append(sample_data['t'][t_index : t_index + 3])
                 t_index += 3
 
     for bone_name in all_bone_keyframes:
@@ -19,7 +19,7 @@ except ImportError:
     from PySide import QtGui as QtWidgets
     from shiboken import wrapInstance
 
-from io_pdx_mesh.pdx_data import PDXData
+from io_pdx_mesh.pdx_data import PDXData, load_shader_streams
 
 try:
     import maya_import_export
@@ -254,6 +254,13 @@ class PDXmaya_ui(QtWidgets.QDialog):
                 exp_skel=export_opts.chk_skeleton.isChecked(),
                 exp_locs=export_opts.chk_locators.isChecked(),
                 merge_verts=export_opts.chk_merge_vtx.isChecked(),
+                weld_verts=export_opts.chk_weld_vtx.isChecked(),
+                optimize_mesh=export_opts.chk_optimize.isChecked(),
+                optimize_overdraw=export_opts.chk_overdraw.isChecked(),
+                merge_objects=export_opts.chk_merge_obj.isChecked(),
+                split_bones=export_opts.chk_split_bones.isChecked(),
+                prune_bones=export_opts.chk_prune_bones.isChecked(),
+                shader_streams=load_shader_streams(export_opts.setup_engine.currentText()),
                 progress_fn=MayaProgress
             )
             QtWidgets.QMessageBox.information(self, 'Success', 'Mesh export finished!\n\n{}'.format(meshpath))
@@ -321,7 +328,12 @@ class export_controls(QtWidgets.QWidget):
         self.chk_locators = QtWidgets.QCheckBox('Export locators')
         self.chk_animation = QtWidgets.QCheckBox('Export animations')
         self.chk_merge_vtx = QtWidgets.QCheckBox('Merge vertices')
+        self.chk_weld_vtx = QtWidgets.QCheckBox('Weld nearby vertices')
+        self.chk_optimize = QtWidgets.QCheckBox('Optimise for GPU')
+        self.chk_overdraw = QtWidgets.QCheckBox('Optimise for overdraw')
         self.chk_merge_obj = QtWidgets.QCheckBox('Merge objects')
+        self.chk_prune_bones = QtWidgets.QCheckBox('Prune unused bones')
+        self.chk_split_bones = QtWidgets.QCheckBox('Split by bone limit')
         for ctrl in [self.chk_mesh, self.chk_skeleton, self.chk_locators, self.chk_merge_vtx]:
             ctrl.setChecked(True)
         # self.chk_create = QtWidgets.QCheckBox('Create .gfx and .asset')
@@ -343,7 +355,6 @@ class export_controls(QtWidgets.QWidget):
         self.btn_anim_create.setDisabled(True)
         self.btn_anim_edit.setDisabled(True)
         self.chk_animation.setDisabled(True)
-        self.chk_merge_obj.setDisabled(True)
 
         # create layouts
         main_layout = QtWidgets.QHBoxLayout()
@@ -416,7 +427,12 @@ class export_controls(QtWidgets.QWidget):
         grp_export_layout.addWidget(self.chk_animation)
         grp_export_layout.addWidget(h_line())
         grp_export_layout.addWidget(self.chk_merge_vtx)
+        grp_export_layout.addWidget(self.chk_weld_vtx)
+        grp_export_layout.addWidget(self.chk_optimize)
+        grp_export_layout.addWidget(self.chk_overdraw)
         grp_export_layout.addWidget(self.chk_merge_obj)
+        grp_export_layout.addWidget(self.chk_prune_bones)
+        grp_export_layout.addWidget(self.chk_split_bones)
         grp_export_layout.addWidget(h_line())
         # grp_export_layout.addWidget(self.chk_create)
         # grp_export_layout.addWidget(self.chk_preview)
@@ -0,0 +1,416 @@
+"""
+    Behaviour tests for the DCC independent processing in pdx_data, run with "python -m pytest tests" or
+    "python -m unittest discover tests" from the repository root.
+"""
+
+import math
+import os
+import random
+import sys
+import unittest
+import xml.etree.ElementTree as Xml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pdx_data  # noqa: E402
+
+
+""" ====================================================================================================================
+    Helper functions.
+========================================================================================================================
+"""
+
+
+def make_mesh_file(p, tri, skin=None, bone_parents=None, shape_name='shape'):
+    """
+        Returns a mesh file tree with one shape holding one mesh, optionally skinned with (ix, w) lists to a skeleton
+        with one bone per entry of bone_parents, the parent index of each bone or None.
+    """
+    root_xml = Xml.Element('File')
+    root_xml.set('pdxasset', [1, 0])
+    object_xml = Xml.SubElement(root_xml, 'object')
+    add_shape(object_xml, shape_name, p, tri, skin, bone_parents)
+    Xml.SubElement(root_xml, 'locator')
+    return root_xml
+
+
+def add_shape(object_xml, shape_name, p, tri, skin=None, bone_parents=None):
+    shape_xml = Xml.SubElement(object_xml, shape_name)
+    mesh_xml = Xml.SubElement(shape_xml, 'mesh')
+    mesh_xml.set('p', p)
+    mesh_xml.set('tri', tri)
+    aabb_xml = Xml.SubElement(mesh_xml, 'aabb')
+    aabb_min, aabb_max = pdx_data.compute_aabb(p)
+    aabb_xml.set('min', aabb_min)
+    aabb_xml.set('max', aabb_max)
+    Xml.SubElement(mesh_xml, 'material').set('shader', ['PdxMeshStandard'])
+    if skin is not None:
+        skin_xml = Xml.SubElement(mesh_xml, 'skin')
+        skin_xml.set('bones', [pdx_data.PDX_MAXSKININFS])
+        skin_xml.set('ix', skin[0])
+        skin_xml.set('w', skin[1])
+    if bone_parents is not None:
+        skeleton_xml = Xml.SubElement(shape_xml, 'skeleton')
+        for i, parent in enumerate(bone_parents):
+            bone_xml = Xml.SubElement(skeleton_xml, 'bone{}'.format(i))
+            bone_xml.set('ix', [i])
+            if parent is not None:
+                bone_xml.set('pa', [parent])
+            bone_xml.set('tx', [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, -float(i), 0.0, 0.0])
+    return shape_xml
+
+
+def bone_strip(bone_count):
+    """
+        Returns positions, triangles and skin of a strip with one triangle per bone, each rigidly skinned to its bone.
+    """
+    p, tri, ix, w = [], [], [], []
+    for bone in range(bone_count):
+        p += [float(bone), 0.0, 0.0, float(bone), 1.0, 0.0, float(bone), 0.0, 1.0]
+        tri += [bone * 3, bone * 3 + 1, bone * 3 + 2]
+        for _ in range(3):
+            ix += [bone, -1, -1, -1]
+            w += [1.0, 0.0, 0.0, 0.0]
+    return p, tri, (ix, w)
+
+
+def uv_sphere(radius, rings, segments):
+    """
+        Returns positions and outward wound triangles of a sphere with a single vertex at each pole.
+    """
+    p = []
+    for r in range(1, rings):
+        theta = math.pi * r / rings
+        for s in range(segments):
+            phi = 2.0 * math.pi * s / segments
+            ring = radius * math.sin(theta)
+            p += [ring * math.cos(phi), radius * math.cos(theta), ring * math.sin(phi)]
+    top, bottom = len(p) // 3, len(p) // 3 + 1
+    p += [0.0, radius, 0.0, 0.0, -radius, 0.0]
+
+    def vertex(r, s):
+        return (r - 1) * segments + s % segments
+
+    tri = []
+    for s in range(segments):
+        tri += [top, vertex(1, s + 1), vertex(1, s), bottom, vertex(rings - 1, s), vertex(rings - 1, s + 1)]
+    for r in range(1, rings - 1):
+        for s in range(segments):
+            a, b, c, d = vertex(r, s), vertex(r, s + 1), vertex(r + 1, s), vertex(r + 1, s + 1)
+            tri += [a, b, c, b, d, c]
+    return p, tri
+
+
+def grid_streams(size):
+    """
+        Returns position, normal and uv streams of a flat grid of size by size quads, with a separate vertex for every
+        triangle corner as before welding.
+    """
+    streams = {'p': [], 'n': [], 'u0': []}
+    for j in range(size):
+        for i in range(size):
+            for x, z in ((i, j), (i, j + 1), (i + 1, j), (i + 1, j), (i, j + 1), (i + 1, j + 1)):
+                streams['p'] += [float(x), 0.0, float(z)]
+                streams['n'] += [0.0, 1.0, 0.0]
+                streams['u0'] += [x / float(size), z / float(size)]
+    return streams
+
+
+""" ====================================================================================================================
+    Tests.
+========================================================================================================================
+"""
+
+
+class TestPartitionSkeletons(unittest.TestCase):
+
+    def test_mesh_within_palette_is_unchanged(self):
+        p, tri, skin = bone_strip(41)
+        root_xml = make_mesh_file(p, tri, skin, [None] + list(range(59)))
+        self.assertEqual(pdx_data.partition_skeletons(root_xml, 50), 0)
+        self.assertEqual(len(root_xml.find('object/shape/skeleton')), 60)
+        self.assertEqual(pdx_data.validate(root_xml), [])
+
+    def test_parts_reference_at_most_max_bones(self):
+        max_bones = 3
+        root_xml = Xml.Element('File')
+        object_xml = Xml.SubElement(root_xml, 'object')
+        for shape_name in ('shape1', 'shape2'):
+            p, tri, skin = bone_strip(8)
+            add_shape(object_xml, shape_name, p, tri, skin, [None] + list(range(7)))
+        add_shape(object_xml, 'shape3', [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0], [0, 1, 2])
+
+        self.assertEqual(pdx_data.partition_skeletons(root_xml, max_bones), 6)
+        self.assertEqual(
+            [shape_xml.tag for shape_xml in object_xml],
+            ['shape1', 'shape1_1', 'shape1_2', 'shape1_3', 'shape2', 'shape2_1', 'shape2_2', 'shape2_3', 'shape3'],
+        )
+        self.assertEqual(pdx_data.validate(root_xml), [])
+        for shape_xml in object_xml:
+            if '_' not in shape_xml.tag:
+                continue
+            skeleton_xml = shape_xml.find('skeleton')
+            ix = shape_xml.find('mesh/skin').get('ix')
+            palette = set(i for i in ix if i >= 0)
+            self.assertLess(max(ix), max_bones)
+            # the palette bones and each of their ancestors, back to the single root
+            names = dict((bone_xml.get('ix')[0], bone_xml.tag) for bone_xml in skeleton_xml)
+            deepest = max(int(names[i][len('bone'):]) for i in palette)
+            self.assertEqual(len(skeleton_xml), deepest + 1)
+            self.assertEqual([bone_xml.tag for bone_xml in skeleton_xml if bone_xml.get('pa') is None], ['bone0'])
+            # every vertex is still skinned to the bone of the same name
+            for v, bone in enumerate(ix[::4]):
+                self.assertEqual(names[bone], 'bone{}'.format(int(shape_xml.find('mesh').get('p')[v * 3])))
+
+
+class TestTangents(unittest.TestCase):
+
+    def mirrored_quads(self):
+        # two quads either side of x = 0 sharing the seam vertices 1 and 4, with u mirrored across the seam
+        p = [-1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, -1.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 0.0, 1.0]
+        n = [0.0, 1.0, 0.0] * 6
+        u0 = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 1.0, 1.0, 0.0, 1.0, 1.0, 1.0]
+        tri = [0, 3, 1, 1, 3, 4, 1, 4, 2, 2, 4, 5]
+        return {'p': p, 'n': n, 'u0': u0, 'tri': tri}
+
+    def test_mirrored_seam_is_split(self):
+        streams, order = pdx_data.split_mirrored_vertices(self.mirrored_quads())
+        self.assertEqual(len(order), 8)
+        self.assertEqual(sorted(order[6:]), [1, 4])
+        ta = list(pdx_data.iter_vectors(pdx_data.generate_tangents(
+            streams['p'], streams['n'], streams['u0'], streams['tri']
+        ), 4))
+        # every corner of a triangle has the tangent of its own side, left of the seam u increases along -x
+        handedness = []
+        for t, corner in enumerate(pdx_data.iter_vectors(streams['tri'], 3)):
+            for v in corner:
+                self.assertAlmostEqual(ta[v][0], -1.0 if t < 2 else 1.0)
+            self.assertEqual(len(set(ta[v][3] for v in corner)), 1)
+            handedness.append(ta[corner[0]][3])
+        self.assertEqual(handedness[0], handedness[1])
+        self.assertEqual(handedness[2], handedness[3])
+        self.assertNotEqual(handedness[0], handedness[2])
+
+    def test_regenerate_tangents_splits_skin(self):
+        streams = self.mirrored_quads()
+        skin = ([v for i in range(6) for v in (i, -1, -1, -1)], [v for _ in range(6) for v in (1.0, 0.0, 0.0, 0.0)])
+        root_xml = make_mesh_file(streams['p'], streams['tri'], skin, [None] * 6)
+        mesh_xml = root_xml.find('object/shape/mesh')
+        mesh_xml.set('n', streams['n'])
+        mesh_xml.set('u0', streams['u0'])
+        self.assertTrue(pdx_data.regenerate_tangents(mesh_xml))
+        self.assertEqual(len(mesh_xml.get('ta')), 32)
+        self.assertEqual(mesh_xml.find('skin').get('ix')[24::4], [1, 4])
+        self.assertEqual(pdx_data.validate(root_xml), [])
+
+
+class TestSimplifyMesh(unittest.TestCase):
+
+    def test_simplified_mesh_hits_target_ratio(self):
+        p, tri = uv_sphere(1.0, 12, 16)
+        mesh_xml = Xml.Element('mesh')
+        mesh_xml.set('p', p)
+        mesh_xml.set('n', list(p))
+        mesh_xml.set('tri', tri)
+        source_count = len(tri) // 3
+        for ratio in (0.5, 0.25):
+            lod_xml, error = pdx_data.simplify_mesh(mesh_xml, ratio)
+            lod_tri = lod_xml.get('tri')
+            self.assertAlmostEqual(len(lod_tri) // 3, ratio * source_count, delta=0.02 * source_count)
+            self.assertLess(max(lod_tri), len(lod_xml.get('p')) // 3)
+            # the sphere keeps its size, so vertices stay near the surface
+            self.assertLess(error, 0.1)
+            for position in pdx_data.iter_vectors(lod_xml.get('p'), 3):
+                self.assertAlmostEqual(math.sqrt(sum(v * v for v in position)), 1.0, delta=0.1)
+
+
+class TestConvexHull(unittest.TestCase):
+
+    def hull_planes(self, hull_p, hull_tri):
+        positions = list(pdx_data.iter_vectors(hull_p, 3))
+        for i0, i1, i2 in pdx_data.iter_vectors(hull_tri, 3):
+            a, b, c = positions[i0], positions[i1], positions[i2]
+            u = [b[k] - a[k] for k in range(3)]
+            v = [c[k] - a[k] for k in range(3)]
+            normal = [u[1] * v[2] - u[2] * v[1], u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0]]
+            length = math.sqrt(sum(n * n for n in normal))
+            normal = [n / length for n in normal]
+            yield normal, sum(normal[k] * a[k] for k in range(3))
+
+    def test_points_are_inside_hull(self):
+        p, tri = uv_sphere(1.0, 8, 12)
+        # interior points which must not become hull vertices
+        p += [0.1, 0.2, -0.3, -0.5, 0.0, 0.4, 0.0, 0.0, 0.0]
+        hull_p, hull_tri = pdx_data.convex_hull(p)
+        self.assertEqual(len(hull_p), len(p) - 9)
+        planes = list(self.hull_planes(hull_p, hull_tri))
+        self.assertEqual(len(planes), 2 * len(hull_p) // 3 - 4)
+        for position in pdx_data.iter_vectors(p, 3):
+            for normal, offset in planes:
+                self.assertLessEqual(sum(normal[k] * position[k] for k in range(3)) - offset, 1e-6)
+
+    def test_vertex_cap_holds(self):
+        p, tri = uv_sphere(1.0, 8, 12)
+        for max_vertices in (4, 12, 32):
+            hull_p, hull_tri = pdx_data.convex_hull(p, max_vertices)
+            self.assertEqual(len(hull_p) // 3, max_vertices)
+            self.assertEqual(len(hull_tri) // 3, 2 * max_vertices - 4)
+            # hull vertices are source points, and every face is wound outwards from the hull centroid
+            source = set(pdx_data.iter_vectors(p, 3))
+            self.assertTrue(all(position in source for position in pdx_data.iter_vectors(hull_p, 3)))
+            center = [sum(hull_p[k::3]) / max_vertices for k in range(3)]
+            for normal, offset in self.hull_planes(hull_p, hull_tri):
+                self.assertGreater(offset - sum(normal[k] * center[k] for k in range(3)), 0.0)
+
+    def test_flat_points_have_no_hull(self):
+        self.assertIsNone(pdx_data.convex_hull([0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 1.0, 0.0, 1.0]))
+
+
+class TestOptimizeVertexCache(unittest.TestCase):
+
+    def test_acmr_is_not_worse(self):
+        p, tri = uv_sphere(1.0, 16, 24)
+        triangles = list(pdx_data.iter_vectors(tri, 3))
+        random.Random(0).shuffle(triangles)
+        shuffled = [v for corner in triangles for v in corner]
+        for source in (tri, shuffled):
+            optimized = pdx_data.optimize_vertex_cache(source)
+            # the same triangles, each with its own corner order
+            self.assertEqual(sorted(pdx_data.iter_vectors(optimized, 3)), sorted(pdx_data.iter_vectors(source, 3)))
+            acmr = pdx_data.analyze_vertex_cache(optimized)[0]
+            self.assertLessEqual(acmr, pdx_data.analyze_vertex_cache(source)[0])
+            self.assertLess(acmr, 0.8)
+
+
+class TestOptimizeOverdraw(unittest.TestCase):
+
+    def test_occluding_clusters_draw_first(self):
+        # a sphere inside a larger one, with the hidden inner sphere drawn first
+        inner_p, inner_tri = uv_sphere(0.5, 12, 16)
+        outer_p, outer_tri = uv_sphere(1.0, 12, 16)
+        offset = len(inner_p) // 3
+        p = inner_p + outer_p
+        tri = inner_tri + [v + offset for v in outer_tri]
+
+        optimized = pdx_data.optimize_overdraw(p, tri)
+        self.assertEqual(sorted(pdx_data.iter_vectors(optimized, 3)), sorted(pdx_data.iter_vectors(tri, 3)))
+        # the outer clusters face further out from the centroid, so all of them draw before the inner sphere
+        self.assertTrue(all(v >= offset for v in optimized[:len(outer_tri)]))
+        overdraw = pdx_data.analyze_overdraw(p, optimized)
+        self.assertLess(overdraw, pdx_data.analyze_overdraw(p, tri))
+        self.assertAlmostEqual(overdraw, 1.0)
+
+
+class TestTreeTokens(unittest.TestCase):
+
+    def test_properties_are_written_in_a_fixed_order(self):
+        root_xml = Xml.Element('File')
+        root_xml.set('pdxasset', [1, 0])
+        info_xml = Xml.SubElement(root_xml, 'info')
+        for prop, value in reversed([('fps', [15.0]), ('sa', [2]), ('j', [1])]):
+            info_xml.set(prop, value)
+        bone_xml = Xml.SubElement(info_xml, 'bone')
+        for prop, value in reversed([('sa', ['q']), ('t', [0.0] * 3), ('q', [0.0, 0.0, 0.0, 1.0]), ('s', [1.0])]):
+            bone_xml.set(prop, value)
+        bone_xml.set('extra', [0])
+
+        properties = [(token, name) for token, name, _ in pdx_data.iter_tree_tokens(root_xml)]
+        self.assertEqual(properties, [
+            ('property', 'pdxasset'),
+            ('object', 'info'), ('property', 'fps'), ('property', 'sa'), ('property', 'j'),
+            ('object', 'bone'), ('property', 'sa'), ('property', 't'), ('property', 'q'), ('property', 's'),
+            ('property', 'extra'),
+        ])
+
+
+class TestPackSkinWeights(unittest.TestCase):
+
+    def test_influences_are_capped_to_the_stream_stride(self):
+        influences = [(0, bone, float(bone + 1)) for bone in range(6)] + [(1, 2, 0.5)]
+        ix, w, issues = pdx_data.pack_skin_weights(influences, [0, 1], pdx_data.PDX_MAXSKININFS + 2)
+        self.assertEqual(len(ix), 2 * pdx_data.PDX_MAXSKININFS)
+        self.assertEqual(len(w), 2 * pdx_data.PDX_MAXSKININFS)
+        self.assertEqual(ix, [5, 4, 3, 2, 2, -1, -1, -1])
+        self.assertAlmostEqual(sum(w[:4]), 1.0)
+        self.assertEqual(w[4:], [1.0, 0.0, 0.0, 0.0])
+        self.assertEqual([issue.check for issue in issues], ['influence_count'])
+
+
+class TestQuantizeStreams(unittest.TestCase):
+
+    def test_merge_count_of_rounded_noise(self):
+        streams = grid_streams(4)
+        rnd = random.Random(0)
+        streams['p'] = [v + rnd.uniform(-1e-6, 1e-6) for v in streams['p']]
+        corner_count = len(streams['p']) // 3
+
+        quantized, merged = pdx_data.quantize_streams(streams, 4)
+        self.assertEqual(merged, corner_count - 25)
+        self.assertEqual(len(pdx_data.weld_vertices(quantized)[0]['p']) // 3, 25)
+        # only the noisy positions needed rounding to merge
+        quantized, merged = pdx_data.quantize_streams(streams, {'p': 4})
+        self.assertEqual(merged, corner_count - 25)
+        self.assertIs(quantized['u0'], streams['u0'])
+        quantized, merged = pdx_data.quantize_streams(streams, {'u0': 4})
+        self.assertEqual(merged, 0)
+
+    def test_vertex_ids_keep_sources_apart(self):
+        streams = {'p': [0.0, 0.0, 0.0, 1e-7, 0.0, 0.0, -1e-7, 0.0, 0.0]}
+        self.assertEqual(pdx_data.quantize_streams(streams, 4)[1], 2)
+        self.assertEqual(pdx_data.quantize_streams(streams, 4, vertex_ids=[0, 0, 1])[1], 1)
+
+
+class TestWeldVertices(unittest.TestCase):
+
+    def test_identical_vertices_merge(self):
+        streams = grid_streams(4)
+        welded, remap, welded_ids = pdx_data.weld_vertices(streams)
+        self.assertEqual(len(welded['p']) // 3, 25)
+        self.assertEqual(pdx_data.count_unique_vertices(streams), 25)
+        self.assertEqual(welded_ids, [remap.index(index) for index in range(25)])
+
+    def test_vertex_ids_keep_sources_apart(self):
+        streams = {'p': [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]}
+        welded, remap, welded_ids = pdx_data.weld_vertices(streams, vertex_ids=[7, 7, 8])
+        self.assertEqual(remap, [0, 0, 1])
+        self.assertEqual(welded_ids, [7, 8])
+        self.assertEqual(pdx_data.count_unique_vertices(streams, vertex_ids=[7, 7, 8]), 2)
+
+
+class TestWeldNearbyVertices(unittest.TestCase):
+
+    def test_noisy_vertices_merge(self):
+        streams = grid_streams(8)
+        rnd = random.Random(0)
+        streams['p'] = [v + rnd.uniform(-1e-5, 1e-5) for v in streams['p']]
+        self.assertEqual(pdx_data.count_unique_vertices(streams), len(streams['p']) // 3)
+
+        welded, remap, welded_ids = pdx_data.weld_nearby_vertices(streams)
+        self.assertEqual(len(welded['p']) // 3, 81)
+        self.assertEqual(len(remap), len(streams['p']) // 3)
+        # the first corner of each merged group keeps its id
+        self.assertEqual(welded_ids, [remap.index(index) for index in range(81)])
+        # each corner maps to a welded vertex at its own position
+        for i, index in enumerate(remap):
+            for a, b in zip(streams['p'][i * 3:i * 3 + 3], welded['p'][index * 3:index * 3 + 3]):
+                self.assertAlmostEqual(a, b, delta=1e-4)
+
+    def test_vertices_outside_tolerance_stay_apart(self):
+        streams = {'p': [0.0, 0.0, 0.0, 3e-4, 0.0, 0.0, 0.0, 0.0, 5e-5], 'u0': [0.0, 0.0, 0.0, 0.0, 0.5, 0.0]}
+        welded, remap, _ = pdx_data.weld_nearby_vertices(streams)
+        # the third vertex is close enough in position but on the other side of a uv seam
+        self.assertEqual(remap, [0, 1, 2])
+        streams['u0'][4] = 0.0
+        welded, remap, _ = pdx_data.weld_nearby_vertices(streams)
+        self.assertEqual(remap, [0, 1, 0])
+        skin = ([0, -1, -1, -1, 0, -1, -1, -1, 1, -1, -1, -1], [1.0, 0.0, 0.0, 0.0] * 3)
+        welded, remap, _ = pdx_data.weld_nearby_vertices(streams, skin=skin)
+        self.assertEqual(remap, [0, 1, 2])
+
+    def test_zero_position_tolerance_raises(self):
+        streams = {'p': [0.0, 0.0, 0.0, 1.0, 0.0, 0.0]}
+        with self.assertRaises(ValueError):
+            pdx_data.weld_nearby_vertices(streams, tolerances={'p': 0.0})
+
+
+if __name__ == '__main__':
+    unittest.main()